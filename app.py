@@ -1,27 +1,169 @@
-from flask import Flask, render_template, request, jsonify
-from models import db, Customer, WeightTicket
+# First, so startup timings include the imports below
+from startup import StartupTracker
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
+from models import db, Customer, WeightTicket, WeightTrace, PrintJob
 from rfid_reader import RFIDReader
-from printer import TicketPrinter
+from printer import TicketPrinter, FakeCupsConnection
+from print_spooler import PrintSpooler
+from migrations import configure_sqlite, upgrade
+from scale import ScaleReader, make_transport
+from rfid_events import ScanLog, MAX_SCAN_AGE
+from customer_cache import CustomerCache
+from export import export_tickets, FORMATS as EXPORT_FORMATS
+from reports import track_rollups, rebuild_rollups, summary as tonnage_summary
+from weighing import WeighingWorkflow, WeighingError, receipt_data
+from broker import HardwareBroker, BrokerClient, RemoteScale, RemoteScanLog, RemoteWeighing
+from lanes import Lane, Lanes, lane_configs
+from customer_import import parse_import, import_customers, ImportFormatError
+from assets import Assets, conditional
+from sync import SyncShipper, track_sync, backfill as sync_backfill
+import weight_trace
+import metrics
+import click
+import functools
+import os
+import socket
 import threading
-import queue
-import random  # Temporary for weight simulation
 from werkzeug.exceptions import HTTPException
+from werkzeug.datastructures import MultiDict
+from sqlalchemy.orm import joinedload
+from sqlalchemy import text
+import time
 import traceback
 from datetime import datetime, timedelta
 
+boot = StartupTracker()
+boot.mark('imports')
+
 app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///weight_system.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Scale indicator: serial device, pty path or socket://host:port; None simulates
+app.config['SCALE_PORT'] = None
+app.config['SCALE_BAUDRATE'] = 9600
+app.config['PRINTER_NAME'] = 'EndustryPrinter'
+# Weighbridge lanes, each with its own scale, RFID readers and receipt printer, e.g.
+# {"inbound": {"scale_port": "/dev/ttyUSB0", "printer": "Gatehouse",
+#              "readers": ["/dev/input/by-path/platform-fd500000.pcie-usb-0:1.1:1.0-event-kbd"]},
+#  "outbound": {"scale_port": "/dev/ttyUSB1", "readers": ["Outbound RFID"]}}
+# None is a single lane, 'main', using SCALE_PORT, PRINTER_NAME and every reader.
+# From the environment as JSON: FLASK_LANES='{"inbound": {...}, "outbound": {...}}'
+app.config['LANES'] = None
+# 'cups', or 'fake' to keep print jobs in memory when no printer is attached
+app.config['PRINTER_BACKEND'] = 'cups'
+# Closed tickets per page on /tickets and /api/tickets
+app.config['TICKETS_PAGE_SIZE'] = 50
+# Seconds a card tap waits for a stable weight, and the lightest reading accepted
+# (kg; below it the deck is empty, whatever the indicator's noise)
+app.config['WEIGHING_STABLE_TIMEOUT'] = 5.0
+app.config['WEIGHING_MIN_WEIGHT'] = 200.0
+# Seconds a ticket must be open before a tap closes it, so a double tap cannot
+# close it straight away
+app.config['WEIGHING_MIN_OPEN_SECONDS'] = 30.0
+# Seconds of scale readings stored with each weighing for disputes (0 turns it off;
+# at most the scale's 60 s buffer), thinned to this many samples per second
+# (None keeps the indicator's full rate). About 0.5 KB per ticket at the defaults.
+app.config['TRACE_SECONDS'] = 20.0
+app.config['TRACE_MAX_HZ'] = 5.0
+# Unix socket of the hardware broker ('flask run-broker'). When set, this process
+# uses the broker's scale, readers and printer and can run under gunicorn with
+# threaded workers (gunicorn.conf.py; SSE clients each hold a thread).
+# Overridable from the environment, e.g. FLASK_HARDWARE_BROKER=/run/endustry/hardware.sock
+app.config['HARDWARE_BROKER'] = None
+# Card cache entry lifetime in seconds. Only this process's commits drop entries;
+# this bounds how long a change from another process ('flask import-customers',
+# another worker) can go unseen. None keeps entries until a local commit (broker
+# mode always uses a TTL).
+app.config['CUSTOMER_CACHE_TTL'] = 5.0
+# Log requests slower than this many milliseconds; None turns the log off
+app.config['SLOW_REQUEST_MS'] = 1000
+# Head-office endpoint that closed tickets and customer changes are shipped to
+# (sync_receiver.py is a local stand-in). None turns journaling and shipping off;
+# run 'flask sync-backfill' once after switching it on to send existing data.
+app.config['SYNC_URL'] = None
+# This site's name in shipped batches, and the bearer token sent with them
+app.config['SYNC_SITE'] = socket.gethostname()
+app.config['SYNC_TOKEN'] = None
+app.config['SYNC_BATCH_SIZE'] = 500
+app.config.from_prefixed_env()
 
 db.init_app(app)
+configure_sqlite(app)
+metrics.init_app(app, db, slow_request_ms=app.config['SLOW_REQUEST_MS'])
+assets = Assets(app)
+
+def make_printers():
+    # One TicketPrinter per CUPS queue; the default printer comes first
+    names = [app.config['PRINTER_NAME']] + [config.printer for config in lane_configs(app.config)]
+    fake = app.config['PRINTER_BACKEND'] == 'fake'
+    return {name: TicketPrinter(name, connection=FakeCupsConnection() if fake else None)
+            for name in dict.fromkeys(names)}
+
+def make_lanes(make_scale, make_scans):
+    return Lanes([Lane(config, make_scale(config), make_scans(config)) for config in lane_configs(app.config)])
+
+def local_lanes():
+    return make_lanes(lambda config: ScaleReader(make_transport(config.scale_port, config.scale_baudrate)),
+                      lambda config: ScanLog())
 
-# Initialize RFID reader and printer
-rfid_reader = RFIDReader()
-printer = TicketPrinter()
-rfid_queue = queue.Queue()
+def attach_weighing(lanes, spooler, customers):
+    # One workflow per lane; the shared lock keeps decisions serialized across lanes
+    lock = threading.Lock()
+    for lane in lanes:
+        lane.weighing = WeighingWorkflow(lane.scale, spooler, customers,
+                                         stable_timeout=app.config['WEIGHING_STABLE_TIMEOUT'],
+                                         min_weight=app.config['WEIGHING_MIN_WEIGHT'],
+                                         lane=lane.name, printer=lane.printer, lock=lock,
+                                         trace_seconds=app.config['TRACE_SECONDS'],
+                                         trace_max_hz=app.config['TRACE_MAX_HZ'],
+                                         min_open_seconds=app.config['WEIGHING_MIN_OPEN_SECONDS'])
 
-def rfid_callback(card_id):
-    rfid_queue.put(card_id)
+# Initialize RFID reader, scales and printers (here, or in the broker process)
+printers = make_printers()
+printer = printers[app.config['PRINTER_NAME']]
+if app.config['HARDWARE_BROKER']:
+    hardware = BrokerClient(app.config['HARDWARE_BROKER'])
+    rfid_reader = None
+    spooler = PrintSpooler(app, printer, notify=hardware.wake_printer, printers=printers)
+    lanes = make_lanes(lambda config: RemoteScale(hardware, config.name),
+                       lambda config: RemoteScanLog(hardware, config.name))
+    for lane in lanes:
+        lane.weighing = RemoteWeighing(hardware, app.config['WEIGHING_STABLE_TIMEOUT'], lane.name)
+    customer_cache = CustomerCache(ttl=app.config['CUSTOMER_CACHE_TTL'] or 5.0)
+else:
+    lanes = local_lanes()
+    rfid_reader = RFIDReader(match=lanes.matches)
+    spooler = PrintSpooler(app, printer, printers=printers)
+    customer_cache = CustomerCache(ttl=app.config['CUSTOMER_CACHE_TTL'])
+    attach_weighing(lanes, spooler, customer_cache)
+customer_cache.watch()
+track_rollups()
+# Every process journals its own writes; only the one owning the hardware ships them
+sync_shipper = None
+if app.config['SYNC_URL']:
+    track_sync()
+    sync_shipper = SyncShipper(app, app.config['SYNC_URL'], app.config['SYNC_SITE'],
+                               batch_size=app.config['SYNC_BATCH_SIZE'], token=app.config['SYNC_TOKEN'])
+
+def rfid_callback(card_id, device):
+    lanes.publish(card_id, device)
+
+def queued_print_jobs():
+    # Read at scrape time, inside the /metrics request
+    return PrintJob.query.filter_by(status='queued').count()
+
+metrics.REGISTRY.gauge('endustry_print_jobs_queued', 'Print jobs waiting for the printer.', queued_print_jobs)
+metrics.REGISTRY.gauge('endustry_scale_connected', 'Whether the scale is sending readings.',
+                       lambda: {(lane.name,): int(bool(lane.scale.status()['connected'])) for lane in lanes},
+                       labels=('lane',))
+metrics.REGISTRY.gauge('endustry_rfid_last_seq', 'Sequence number of the last card read.',
+                       lambda: {(lane.name,): lane.scans.last_seq for lane in lanes}, labels=('lane',))
+metrics.REGISTRY.gauge('endustry_sync_pending', 'Changes in the outbox waiting for head office.',
+                       lambda: sync_shipper.pending() if sync_shipper else None)
+metrics.REGISTRY.gauge('endustry_customer_cache_hits', 'Card lookups served from memory.',
+                       lambda: customer_cache.stats()['hits'])
+metrics.REGISTRY.gauge('endustry_customer_cache_misses', 'Card lookups that went to the database.',
+                       lambda: customer_cache.stats()['misses'])
 
 @app.errorhandler(Exception)
 def handle_error(error):
@@ -39,31 +181,282 @@ def handle_error(error):
     # For now, let's return the error directly, which Werkzeug should handle
     return error
 
+def lane_route(rule, **options):
+    # Registers /api<rule> for the default lane and /api/lanes/<name><rule> for
+    # any lane; the view gets the Lane as its first argument
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(lane_name=None, **kwargs):
+            lane = lanes.get(lane_name)
+            if lane is None:
+                return jsonify({"error": f"Unknown lane {lane_name!r}"}), 404
+            return view(lane, **kwargs)
+        app.add_url_rule('/api' + rule, view_func=wrapper, **options)
+        app.add_url_rule('/api/lanes/<lane_name>' + rule, view_func=wrapper, **options)
+        return wrapper
+    return decorator
+
+@app.context_processor
+def lane_context():
+    # Kiosk pages opened with ?lane=<name> follow that lane's scale and readers
+    lane = lanes.get(request.args['lane']) if request.args.get('lane') else None
+    return {
+        'lane': lane.name if lane else None,
+        'lane_api': f'/api/lanes/{lane.name}' if lane else '/api',
+        'lane_names': [lane.name for lane in lanes] if len(lanes) > 1 else [],
+    }
+
 @app.route('/')
+@conditional
 def index():
     return render_template('index.html')
 
 @app.route('/customers')
+@conditional
 def customers():
     customers_list = Customer.query.all()
     return render_template('customers.html', customers=customers_list)
 
+def parse_date_range(args):
+    # 'from'/'to' as YYYY-MM-DD; 'to' is inclusive of the whole day
+    from_date = None
+    to_date = None
+    
+    if args.get('from'):
+        try:
+            from_date = datetime.strptime(args['from'], '%Y-%m-%d')
+        except ValueError:
+            raise ValueError("Invalid 'from' date format. Use YYYY-MM-DD")
+    
+    if args.get('to'):
+        try:
+            to_date = datetime.strptime(args['to'], '%Y-%m-%d')
+            # Set to end of day
+            to_date = to_date + timedelta(days=1, microseconds=-1)
+        except ValueError:
+            raise ValueError("Invalid 'to' date format. Use YYYY-MM-DD")
+    
+    return from_date, to_date
+
+def filtered_tickets_query(args):
+    # Status/customer/date filters applied in SQL, customers joined in the same query
+    return apply_ticket_filters(WeightTicket.query.options(joinedload(WeightTicket.customer)), args)
+
+def apply_ticket_filters(query, args):
+    status = args.get('status')
+    if status in ('open', 'closed'):
+        query = query.filter(WeightTicket.status == status)
+    
+    customer_id = args.get('customer_id', type=int)
+    if customer_id:
+        query = query.filter(WeightTicket.customer_id == customer_id)
+    
+    if args.get('lane'):
+        query = query.filter(WeightTicket.lane == args['lane'])
+    
+    from_date, to_date = parse_date_range(args)
+    if from_date:
+        query = query.filter(WeightTicket.created_at >= from_date)
+    if to_date:
+        query = query.filter(WeightTicket.created_at <= to_date)
+    
+    return query
+
+def ticket_page(query, before=None, limit=None):
+    # Keyset pagination on id (newest first): cost stays flat however deep the page.
+    # Clamped to 1..500: SQLite reads a negative LIMIT as no limit at all
+    limit = max(1, min(limit or app.config['TICKETS_PAGE_SIZE'], 500))
+    if before:
+        query = query.filter(WeightTicket.id < before)
+    tickets = query.order_by(WeightTicket.id.desc()).limit(limit + 1).all()
+    next_cursor = tickets[limit - 1].id if len(tickets) > limit else None
+    return tickets[:limit], next_cursor
+
 @app.route('/tickets')
+@conditional
 def tickets():
-    tickets_list = WeightTicket.query.all()
-    customers_list = Customer.query.all()  # Added for manual ticket creation
-    return render_template('tickets.html', tickets=tickets_list, customers=customers_list)
+    filters = request.args.copy()
+    filters['status'] = 'closed'
+    # On the page ?lane= picks the kiosk's lane; trucks close on any lane
+    filters.pop('lane', None)
+    try:
+        closed_query = filtered_tickets_query(filters)
+    except ValueError:
+        # Ignore malformed dates on the page instead of failing it
+        closed_query = filtered_tickets_query(MultiDict({'status': 'closed'}))
+    
+    open_tickets = WeightTicket.query.options(joinedload(WeightTicket.customer)) \
+        .filter(WeightTicket.status == 'open') \
+        .order_by(WeightTicket.created_at).all()
+    
+    closed_tickets, next_cursor = ticket_page(closed_query)
+    customers_list = Customer.query.order_by(Customer.name).all()  # Added for manual ticket creation
+    return render_template('tickets.html', open_tickets=open_tickets, closed_tickets=closed_tickets,
+                           next_cursor=next_cursor, customers=customers_list, filters=request.args)
+
+@app.route('/api/tickets', methods=['GET'])
+@conditional
+def list_tickets():
+    try:
+        query = filtered_tickets_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        tickets, next_cursor = ticket_page(query, request.args.get('before', type=int),
+                                           request.args.get('limit', type=int))
+        return jsonify({
+            "tickets": [ticket.to_dict(include_customer=True) for ticket in tickets],
+            "next_cursor": next_cursor
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/tickets/export', methods=['GET'])
+def export_tickets_api():
+    # Streams every matching ticket in fixed-size chunks; memory stays flat for any range
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported format. Use one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    try:
+        query = apply_ticket_filters(WeightTicket.query, request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    filename = f"tickets-{request.args.get('from', 'all')}-{request.args.get('to', 'now')}.{fmt}"
+    if compress:
+        filename += '.gz'
+    body = export_tickets(query, fmt, compress)
+    return Response(stream_with_context(body),
+                    mimetype='application/gzip' if compress else EXPORT_FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"',
+                             'X-Accel-Buffering': 'no'})
+
+@app.route('/api/reports/summary', methods=['GET'])
+@conditional
+def report_summary():
+    # Tonnage totals from the daily rollups; never scans weight_ticket
+    try:
+        from_date, to_date = parse_date_range(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    group_by = request.args.get('group_by')
+    if group_by not in (None, 'customer', 'day'):
+        return jsonify({"error": "group_by must be 'customer' or 'day'"}), 400
+    
+    try:
+        return jsonify(tonnage_summary(from_date.date() if from_date else None,
+                                       to_date.date() if to_date else None,
+                                       request.args.get('customer_id', type=int), group_by))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def check_component(components, name, probe):
+    # A probe that raises is reported as that component being down, never as a failed check
+    try:
+        components[name] = probe()
+    except Exception as e:
+        components[name] = {'ok': False, 'error': str(e)}
+
+def hardware_health(lanes, reader, spooler):
+    # Keyed 'scale:<lane>', 'rfid:<lane>' and 'printer:<queue>' (needs an app context)
+    components = {}
+    for lane in lanes:
+        check_component(components, f'scale:{lane.name}', lane.scale.health)
+    try:
+        readers = lanes.reader_health(reader)
+    except Exception as e:
+        readers = {lane.name: {'ok': False, 'error': str(e)} for lane in lanes}
+    components.update((f'rfid:{name}', health) for name, health in readers.items())
+    for name, queue in printers.items():
+        check_component(components, f'printer:{name}', queue.health)
+    check_component(components, 'print_spooler', spooler.health)
+    if sync_shipper is not None:
+        check_component(components, 'sync', sync_shipper.health)
+    return components
 
-@app.route('/api/weight/read')
-def read_weight():
+def database_health():
+    started = time.perf_counter()
+    db.session.execute(text('SELECT 1'))
+    return {'ok': True, 'latency_ms': round((time.perf_counter() - started) * 1000, 2)}
+
+@app.route('/healthz')
+def healthz():
+    # Per-device state; 503 only when the database is unusable, peripherals just degrade
+    components = {}
+    check_component(components, 'database', database_health)
+    if app.config['HARDWARE_BROKER']:
+        try:
+            components.update(hardware.health())
+        except Exception as e:
+            components['broker'] = {'ok': False, 'error': str(e)}
+    else:
+        components.update(hardware_health(lanes, rfid_reader, spooler))
+    
+    if not components['database']['ok']:
+        status = 'down'
+    elif all(component.get('ok') for component in components.values()):
+        status = 'ok'
+    else:
+        status = 'degraded'
+    return jsonify({"status": status, "startup": boot.report(), "components": components}), \
+        503 if status == 'down' else 200
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # Prometheus text format. Counters are per process: behind a broker, the broker's
+    # (print queue, weighing, sync) are merged in with process="broker" and this
+    # worker's carry process="web-<pid>". Each scrape reaches one worker; aggregate
+    # with sum without (process) (rate(...)).
+    if not app.config['HARDWARE_BROKER']:
+        return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+    try:
+        broker_metrics = hardware.call('metrics')
+    except Exception as e:
+        print(f"Error reading broker metrics: {e}")
+        broker_metrics = []
+    return Response(metrics.REGISTRY.render(label=f'process="web-{os.getpid()}"', extra=broker_metrics),
+                    mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/lanes')
+@conditional
+def list_lanes():
     try:
-        # TODO: Replace with actual weight reading from hardware
-        # This is just a simulation for testing
-        weight = random.uniform(3000, 4500)
-        return jsonify({"weight": weight})
+        return jsonify([lane.to_dict() for lane in lanes])
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@lane_route('/weight/read')
+def read_weight(lane):
+    try:
+        # Latest sample from the background reader; never touches the port
+        return jsonify(lane.scale.status())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@lane_route('/events')
+def live_events(lane):
+    # Server-Sent Events: weight changes and card scans, pushed as they happen
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    return Response(lane.live.stream(last_event_id), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@lane_route('/events/poll')
+def live_events_poll(lane):
+    # Long-poll fallback for clients that cannot keep an EventSource open
+    try:
+        cursor = lane.live.decode_cursor(request.args.get('cursor'))
+    except (ValueError, KeyError, TypeError):
+        return jsonify({"error": "Invalid cursor"}), 400
+    timeout = min(request.args.get('timeout', 25.0, type=float), 60.0)
+    events = lane.live.next_events(cursor, timeout)
+    return jsonify({
+        "events": [{"event": name, "data": data} for name, data in events],
+        "cursor": lane.live.encode_cursor(cursor)
+    })
+
 @app.route('/api/customers', methods=['POST'])
 def add_customer():
     try:
@@ -74,6 +467,10 @@ def add_customer():
         if not data.get('name') or not data.get('rfid_card'):
             return jsonify({"error": "Name and RFID card are required"}), 400
             
+        owner = Customer.query.filter_by(rfid_card=data['rfid_card']).first()
+        if owner:
+            return jsonify({"error": f"RFID card already assigned to {owner.name}", "customer_id": owner.id}), 409
+            
         customer = Customer(name=data['name'], rfid_card=data['rfid_card'])
         db.session.add(customer)
         db.session.commit()
@@ -82,18 +479,77 @@ def add_customer():
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/rfid/read')
-def read_rfid():
+@app.route('/api/customers/import', methods=['POST'])
+def import_customers_api():
+    # CSV or JSON body, or a multipart 'file' upload; ?dry_run=1 validates without writing
     try:
-        card_id = rfid_queue.get_nowait()
-        return jsonify({"card_id": card_id})
-    except queue.Empty:
-        return jsonify({"card_id": None})
+        upload = request.files.get('file')
+        if upload:
+            data = upload.read()
+            fmt = 'json' if upload.filename.lower().endswith('.json') else 'csv'
+        elif request.is_json:
+            data = request.get_json()
+            fmt = 'json'
+        else:
+            data = request.get_data()
+            fmt = request.args.get('format', 'csv')
+        rows = parse_import(data, fmt)
+    except ImportFormatError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        dry_run = request.args.get('dry_run', '').lower() in ('1', 'true', 'yes')
+        report = import_customers(rows, dry_run=dry_run)
+        # Bulk statements bypass the session hooks the card cache listens to
+        customer_cache.clear()
+        return jsonify(report)
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/customers/by-rfid/<card_id>', methods=['GET'])
+def get_customer_by_rfid(card_id):
+    try:
+        # Served from the card cache; the database is only hit on a miss
+        entry = customer_cache.lookup(card_id)
+        if entry is None:
+            return jsonify({"error": "Customer not found"}), 404
+        return jsonify(entry)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/tickets', methods=['POST'])
-def create_ticket():
+@lane_route('/rfid/read')
+def read_rfid(lane):
+    try:
+        # Each client follows the lane's scan log with its own cursor
+        scan_log = lane.scans
+        since = request.args.get('since', type=int)
+        if since is None and 'timeout' not in request.args:
+            # Old pollers send no cursor: answer with the latest recent scan (every
+            # poller sees it; they dedupe by seq) instead of null forever
+            event = scan_log.latest()
+            return jsonify({
+                "card_id": event['card_id'] if event else None,
+                "events": [event] if event else [],
+                "last_seq": scan_log.last_seq,
+                "oldest_seq": scan_log.oldest_seq()
+            })
+        if since is None:
+            # Waiting without a cursor: from now, so old scans are not replayed
+            since = scan_log.last_seq
+        timeout = min(request.args.get('timeout', 0.0, type=float), 60.0)
+        events = scan_log.wait(since, timeout) if timeout > 0 else scan_log.since(since)
+        return jsonify({
+            "card_id": events[-1]['card_id'] if events else None,
+            "events": events,
+            "last_seq": events[-1]['seq'] if events else scan_log.last_seq,
+            "oldest_seq": scan_log.oldest_seq()
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@lane_route('/tickets', methods=['POST'])
+def create_ticket(lane):
     try:
         if not request.is_json:
             return jsonify({"error": "Request must be JSON"}), 400
@@ -102,13 +558,14 @@ def create_ticket():
         if not data.get('rfid_card') or 'gross_weight' not in data:
             return jsonify({"error": "RFID card and gross weight are required"}), 400
             
-        customer = Customer.query.filter_by(rfid_card=data['rfid_card']).first()
-        if not customer:
+        entry = customer_cache.lookup(data['rfid_card'])
+        if not entry:
             return jsonify({"error": "Customer not found"}), 404
         
         ticket = WeightTicket(
-            customer_id=customer.id,
-            gross_weight=data['gross_weight']
+            customer_id=entry['customer']['id'],
+            gross_weight=data['gross_weight'],
+            lane=lane.name
         )
         db.session.add(ticket)
         db.session.commit()
@@ -117,6 +574,51 @@ def create_ticket():
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
+@lane_route('/weighings', methods=['POST'])
+def create_weighing(lane):
+    # One card tap on a lane: opens the customer's ticket with that lane's scale,
+    # or closes the open one (from any lane) and queues the receipt on its printer
+    try:
+        if not request.is_json:
+            return jsonify({"error": "Request must be JSON"}), 400
+        
+        data = request.json
+        card_id = data.get('rfid_card')
+        scan_seq = data.get('scan_seq')
+        if scan_seq is not None and not isinstance(scan_seq, int):
+            return jsonify({"error": "scan_seq must be an integer"}), 400
+        scan = None
+        if scan_seq is not None:
+            events = lane.scans.since(scan_seq - 1, limit=1)
+            if events and events[0]['seq'] == scan_seq:
+                scan = events[0]
+        if scan and time.time() - scan['timestamp'] > MAX_SCAN_AGE:
+            # Replayed to a reconnecting kiosk; the truck on the deck now may not be this card's
+            return jsonify({"error": f"Card scan is {time.time() - scan['timestamp']:.0f} s old; "
+                                     f"tap the card again"}), 409
+        if not card_id and scan:
+            # Resolve the card from the scan log
+            card_id = scan['card_id']
+        if not card_id:
+            return jsonify({"error": "RFID card or a known scan_seq is required"}), 400
+        
+        result = lane.weighing.weigh(card_id, scan_seq)
+        if scan and not result['replayed']:
+            metrics.SCAN_TO_TICKET_SECONDS.observe(time.time() - scan['timestamp'], lane.name, result['action'])
+        return jsonify(result)
+    except WeighingError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        db.session.rollback()
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+def ticket_printer(ticket):
+    # Receipts print at the ticket's lane; None (the default printer) for untagged
+    # tickets or lanes no longer configured
+    lane = lanes.get(ticket.lane) if ticket.lane else None
+    return lane.printer if lane else None
+
 @app.route('/api/tickets/<int:ticket_id>/close', methods=['POST'])
 def close_ticket(ticket_id):
     try:
@@ -133,19 +635,13 @@ def close_ticket(ticket_id):
             return jsonify({"error": "Ticket is not open"}), 400
         
         ticket.close_ticket(data['tare_weight'])
-        db.session.commit()
         
-        # Print ticket
-        ticket_data = {
-            'id': ticket.id,
-            'customer_name': ticket.customer.name,
-            'gross_weight': ticket.gross_weight,
-            'tare_weight': ticket.tare_weight,
-            'net_weight': ticket.net_weight
-        }
-        printer.print_ticket(ticket_data)
+        # Queue the receipt in the same transaction as the close
+        job = spooler.submit_ticket(receipt_data(ticket), commit=False, printer=ticket_printer(ticket))
+        db.session.commit()
+        spooler.wake()
         
-        return jsonify({"success": True})
+        return jsonify({"success": True, "print_job_id": job.id})
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
@@ -161,36 +657,22 @@ def print_customer_label(customer_id):
             'name': customer.name,
             'rfid_card': customer.rfid_card
         }
-        printer.print_customer_label(customer_data)
+        job = spooler.submit_customer_label(customer_data)
         
-        return jsonify({"success": True})
+        return jsonify({"success": True, "print_job_id": job.id})
     except Exception as e:
+        db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/customers/<int:customer_id>/tickets', methods=['GET'])
+@conditional
 def get_customer_tickets(customer_id):
     try:
         # Get date range from query parameters
-        date_from = request.args.get('from', None)
-        date_to = request.args.get('to', None)
-        
-        # Parse dates if provided
-        from_date = None
-        to_date = None
-        
-        if date_from:
-            try:
-                from_date = datetime.strptime(date_from, '%Y-%m-%d')
-            except ValueError:
-                return jsonify({"error": "Invalid 'from' date format. Use YYYY-MM-DD"}), 400
-        
-        if date_to:
-            try:
-                to_date = datetime.strptime(date_to, '%Y-%m-%d')
-                # Set to end of day
-                to_date = to_date + timedelta(days=1, microseconds=-1)
-            except ValueError:
-                return jsonify({"error": "Invalid 'to' date format. Use YYYY-MM-DD"}), 400
+        try:
+            from_date, to_date = parse_date_range(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
         # Query for tickets with optional date filtering
         query = WeightTicket.query.filter_by(customer_id=customer_id)
@@ -205,18 +687,7 @@ def get_customer_tickets(customer_id):
         tickets = query.order_by(WeightTicket.created_at.desc()).all()
         
         # Format tickets for JSON response
-        ticket_list = []
-        for ticket in tickets:
-            ticket_dict = {
-                'id': ticket.id,
-                'gross_weight': ticket.gross_weight,
-                'tare_weight': ticket.tare_weight,
-                'net_weight': ticket.net_weight,
-                'status': ticket.status,
-                'created_at': ticket.created_at.isoformat(),
-                'closed_at': ticket.closed_at.isoformat() if ticket.closed_at else None
-            }
-            ticket_list.append(ticket_dict)
+        ticket_list = [ticket.to_dict() for ticket in tickets]
             
         return jsonify(ticket_list)
         
@@ -231,23 +702,39 @@ def print_ticket_receipt_api(ticket_id):
         if ticket.status != 'closed':
             return jsonify({"error": "Cannot print receipt for an open ticket"}), 400
             
-        ticket_data = {
-            'id': ticket.id,
-            'customer_name': ticket.customer.name,
-            'gross_weight': ticket.gross_weight,
-            'tare_weight': ticket.tare_weight,
-            'net_weight': ticket.net_weight,
-            # Add date/time if needed by the printer function
-            'closed_at': ticket.closed_at 
-        }
-        printer.print_ticket(ticket_data)
+        job = spooler.submit_ticket(receipt_data(ticket), printer=ticket_printer(ticket))
         
-        return jsonify({"success": True, "message": f"Ticket #{ticket_id} sent to printer."})
+        return jsonify({"success": True, "print_job_id": job.id, "message": f"Ticket #{ticket_id} queued for printing."})
     except Exception as e:
+        db.session.rollback()
         # Log the detailed error
         traceback.print_exc() 
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/tickets/<int:ticket_id>/trace', methods=['GET'])
+def get_ticket_trace(ticket_id):
+    # Streams the scale readings stored with the ticket's weighings, for plotting
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported format. Use one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    try:
+        query = WeightTrace.query.filter_by(ticket_id=ticket_id)
+        if request.args.get('phase'):
+            query = query.filter(WeightTrace.phase == request.args['phase'])
+        traces = query.order_by(WeightTrace.id).all()
+        if not traces:
+            if db.session.get(WeightTicket, ticket_id) is None:
+                return jsonify({"error": "Ticket not found"}), 404
+            return jsonify({"error": "No weight trace recorded for this ticket"}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    filename = f"ticket-{ticket_id}-trace.{fmt}" + ('.gz' if compress else '')
+    return Response(weight_trace.stream(traces, fmt, compress),
+                    mimetype='application/gzip' if compress else EXPORT_FORMATS[fmt],
+                    headers={'Content-Disposition': f'inline; filename="{filename}"'})
+
 @app.route('/api/tickets/<int:ticket_id>', methods=['DELETE'])
 def delete_ticket_api(ticket_id):
     try:
@@ -267,8 +754,129 @@ def delete_ticket_api(ticket_id):
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/print-jobs', methods=['GET'])
+@conditional
+def list_print_jobs():
+    try:
+        query = PrintJob.query
+        status = request.args.get('status')
+        if status:
+            query = query.filter(PrintJob.status.in_(status.split(',')))
+        limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+        jobs = query.order_by(PrintJob.id.desc()).limit(limit).all()
+        return jsonify([job.to_dict() for job in jobs])
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/print-jobs/<int:job_id>', methods=['GET'])
+def get_print_job(job_id):
+    try:
+        job = PrintJob.query.get_or_404(job_id)
+        return jsonify(job.to_dict())
+    except HTTPException:
+        raise
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/print-jobs/<int:job_id>/retry', methods=['POST'])
+def retry_print_job(job_id):
+    try:
+        job = PrintJob.query.get_or_404(job_id)
+        if job.status != 'failed':
+            return jsonify({"error": "Only failed jobs can be retried"}), 400
+        spooler.retry(job)
+        return jsonify(job.to_dict())
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+@app.cli.command('upgrade-db')
+def upgrade_db_command():
+    """Create missing tables and apply pending schema migrations."""
+    print(f"Database at schema version {upgrade(app)}")
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Recompute the daily tonnage rollups from all closed tickets."""
+    with db.engine.begin() as conn:
+        print(f"Rebuilt {rebuild_rollups(conn)} rollup rows")
+
+@app.cli.command('import-customers')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--dry-run', is_flag=True, help='Validate and report without writing.')
+def import_customers_command(path, dry_run):
+    """Create or update customers from a CSV or JSON file."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    try:
+        rows = parse_import(data, 'json' if path.lower().endswith('.json') else 'csv')
+    except ImportFormatError as e:
+        raise click.ClickException(str(e))
+    report = import_customers(rows, dry_run=dry_run)
+    for result in report['rows']:
+        if result['status'] == 'error':
+            print(f"Row {result['row']}: {result['error']}")
+    print(', '.join(f"{count} {status}" for status, count in report['summary'].items()) +
+          (' (dry run, nothing written)' if dry_run else ''))
+
+@app.cli.command('sync-backfill')
+def sync_backfill_command():
+    """Journal every customer and closed ticket for shipping to SYNC_URL."""
+    if not app.config['SYNC_URL']:
+        raise click.ClickException("Set SYNC_URL (or FLASK_SYNC_URL) first")
+    print(f"Journaled {sync_backfill()} rows for head office")
+
+@app.cli.command('run-broker')
+def run_broker_command():
+    """Own the scale, RFID readers and printer, serving web workers over HARDWARE_BROKER."""
+    path = app.config['HARDWARE_BROKER']
+    if not path:
+        raise SystemExit("Set HARDWARE_BROKER (or FLASK_HARDWARE_BROKER) to the socket path")
+    upgrade(app)
+    boot.mark('database')
+    broker_lanes = local_lanes()
+    broker_spooler = PrintSpooler(app, printer, printers=printers)
+    broker_cache = CustomerCache(ttl=app.config['CUSTOMER_CACHE_TTL'] or 5.0)
+    broker_cache.watch()
+    attach_weighing(broker_lanes, broker_spooler, broker_cache)
+    reader = RFIDReader(match=broker_lanes.matches)
+    broker = HardwareBroker(path, app, broker_lanes, broker_spooler,
+                            health=lambda: hardware_health(broker_lanes, reader, broker_spooler))
+    start_hardware(broker_lanes, reader, broker_spooler, broker_lanes.publish)
+    try:
+        broker.serve_forever()
+    finally:
+        reader.stop()
+        broker_spooler.stop()
+        for lane in broker_lanes:
+            lane.scale.stop()
+        for queue in printers.values():
+            queue.stop()
+        if sync_shipper is not None:
+            sync_shipper.stop()
+
+def start_hardware(lanes, reader, spooler, on_card):
+    # Everything starts in the background; the web server does not wait for devices
+    starters = {f'printer:{name}': queue.start for name, queue in printers.items()}
+    starters.update((f'scale:{lane.name}', lane.scale.start) for lane in lanes)
+    starters['print_spooler'] = spooler.start
+    starters['rfid'] = lambda: reader.start(on_card)
+    if sync_shipper is not None:
+        starters['sync'] = sync_shipper.start
+    boot.start_components(starters)
+    
+    checks = {f'printer:{name}': (lambda queue=queue: queue.health()['ok']) for name, queue in printers.items()}
+    checks.update((f'scale:{lane.name}', lambda lane=lane: lane.scale.health()['ok']) for lane in lanes)
+    checks.update((f'rfid:{lane.name}', lambda lane=lane: lanes.reader_health(reader)[lane.name]['ok'])
+                  for lane in lanes)
+    boot.watch(checks)
+
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
-    rfid_reader.start(rfid_callback)
+    upgrade(app)
+    boot.mark('database')
+    if not app.config['HARDWARE_BROKER']:
+        start_hardware(lanes, rfid_reader, spooler, rfid_callback)
+    boot.mark('web')
     app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
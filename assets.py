@@ -0,0 +1,132 @@
+import functools
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+
+from flask import Response, abort, current_app, make_response, request
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Served under content-hashed names, so a URL's bytes never change
+CACHE_FOREVER = 'public, max-age=31536000, immutable'
+# Extensions fingerprinted and compressed (images are already compressed)
+TEXT_EXTENSIONS = ('.js', '.css', '.svg')
+# Compression runs on the first request for each asset, not at startup; quality 11
+# is several times slower and the first kiosk to load a page would wait for it
+BROTLI_QUALITY = 5
+
+
+class Asset:
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.mtime = os.stat(path).st_mtime
+        with open(path, 'rb') as f:
+            data = f.read()
+        self.digest = hashlib.sha256(data).hexdigest()[:12]
+        base, ext = os.path.splitext(name)
+        self.hashed_name = f'{base}.{self.digest}{ext}'
+        self.mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        self.bodies = {'identity': data}
+        self.lock = threading.Lock()
+
+    def body(self, encoding):
+        # Compressed once, on first use, instead of at startup or on every request
+        with self.lock:
+            if encoding not in self.bodies:
+                data = self.bodies['identity']
+                if encoding == 'br':
+                    self.bodies['br'] = brotli.compress(data, quality=BROTLI_QUALITY)
+                else:
+                    self.bodies['gzip'] = gzip.compress(data, 9, mtime=0)
+            return self.bodies[encoding]
+
+    def stale(self):
+        try:
+            return os.stat(self.path).st_mtime != self.mtime
+        except OSError:
+            return True
+
+
+class Assets:
+    """Build-free asset pipeline for the shared JS and CSS.
+
+    Files in ``static/`` are fingerprinted with a content hash and served
+    from ``/assets/<name>.<hash>.<ext>`` with an immutable cache header, so
+    kiosks download each version once and never revalidate it. gzip (and
+    brotli, when the module is installed) variants are built on first request.
+    Templates use ``asset_url('tickets.js')``. In debug mode edited files
+    are picked up on the next page render.
+    """
+
+    def __init__(self, app=None, directory=None, url_prefix='/assets'):
+        self.directory = directory
+        self.url_prefix = url_prefix
+        self.assets = {}
+        self.by_hashed_name = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.directory = self.directory or app.static_folder
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(TEXT_EXTENSIONS):
+                self._load(name)
+        app.add_url_rule(f'{self.url_prefix}/<path:hashed_name>', 'asset', self.serve)
+        app.jinja_env.globals['asset_url'] = self.url
+
+    def _load(self, name):
+        asset = Asset(name, os.path.join(self.directory, name))
+        previous = self.assets.get(name)
+        if previous is not None:
+            self.by_hashed_name.pop(previous.hashed_name, None)
+        self.assets[name] = asset
+        self.by_hashed_name[asset.hashed_name] = asset
+        return asset
+
+    def url(self, name):
+        asset = self.assets.get(name)
+        if asset is None or (current_app.debug and asset.stale()):
+            asset = self._load(name)
+        return f'{self.url_prefix}/{asset.hashed_name}'
+
+    def serve(self, hashed_name):
+        asset = self.by_hashed_name.get(hashed_name)
+        if asset is None:
+            abort(404)
+        etag = f'"{asset.digest}"'
+        if etag in request.headers.get('If-None-Match', ''):
+            response = Response(status=304)
+        else:
+            accepted = request.accept_encodings
+            encodings = ('br', 'gzip') if brotli is not None else ('gzip',)
+            encoding = next((enc for enc in encodings if accepted[enc]), 'identity')
+            response = Response(asset.body(encoding), mimetype=asset.mimetype)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = CACHE_FOREVER
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+
+def conditional(view):
+    """ETag the view's response; a client holding the same version gets a bodyless 304.
+
+    ``no-cache`` makes browsers revalidate every time, which costs one
+    round trip but no body when nothing changed.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        response = make_response(view(*args, **kwargs))
+        if request.method in ('GET', 'HEAD') and response.status_code == 200 and not response.is_streamed:
+            response.add_etag()
+            response.headers['Cache-Control'] = 'no-cache'
+            response = response.make_conditional(request)
+        return response
+    return wrapper
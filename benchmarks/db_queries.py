@@ -0,0 +1,182 @@
+"""Query latency for the ticket history at realistic size.
+
+Builds a throwaway SQLite database with N tickets, then times the queries
+the app runs most often twice: on the baseline schema (no indexes, default
+pragmas) and after migrations.upgrade() plus the tuned pragma profile.
+
+Run from the repository root:
+
+    python -m benchmarks.db_queries --tickets 100000 --json
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask
+from sqlalchemy.orm import joinedload
+
+from models import db, Customer, WeightTicket
+from migrations import configure_sqlite, upgrade, LATEST_VERSION
+
+
+def make_app(path, tuned):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    if tuned:
+        configure_sqlite(app)
+    return app
+
+
+def populate(app, tickets, customers, open_tickets, seed):
+    rng = random.Random(seed)
+    with app.app_context():
+        # Baseline schema: tables only, as db.create_all() produced before indexes
+        with db.engine.begin() as conn:
+            for table in (Customer.__table__, WeightTicket.__table__):
+                table.create(conn)
+                for index in list(table.indexes):
+                    index.drop(conn, checkfirst=True)
+
+        start = datetime.utcnow() - timedelta(days=365)
+        db.session.execute(db.insert(Customer), [
+            {'id': i, 'name': f'Customer {i}', 'rfid_card': f'{i:010d}', 'created_at': start}
+            for i in range(1, customers + 1)
+        ])
+        rows = []
+        step = timedelta(days=365) / tickets
+        for i in range(1, tickets + 1):
+            created = start + step * i
+            gross = rng.uniform(8000, 40000)
+            tare = rng.uniform(3000, 7000)
+            rows.append({
+                'id': i, 'customer_id': rng.randint(1, customers), 'gross_weight': gross,
+                'tare_weight': tare, 'net_weight': gross - tare, 'status': 'closed',
+                'created_at': created, 'closed_at': created + timedelta(minutes=30)
+            })
+            if len(rows) == 10000:
+                db.session.execute(db.insert(WeightTicket), rows)
+                rows = []
+        if rows:
+            db.session.execute(db.insert(WeightTicket), rows)
+        # A few trucks currently on site
+        open_rows = [{'id': tickets + n, 'customer_id': (n % customers) + 1, 'gross_weight': 20000.0,
+                      'status': 'open', 'created_at': datetime.utcnow()}
+                     for n in range(1, open_tickets + 1)]
+        if open_rows:
+            db.session.execute(db.insert(WeightTicket), open_rows)
+        db.session.commit()
+
+
+def queries(customers, seed):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+
+    def customer_range():
+        customer_id = rng.randint(1, customers)
+        return WeightTicket.query.filter(
+            WeightTicket.customer_id == customer_id,
+            WeightTicket.created_at >= now - timedelta(days=90),
+            WeightTicket.created_at <= now
+        ).order_by(WeightTicket.created_at.desc()).all()
+
+    def open_for_card():
+        card = f'{rng.randint(1, customers):010d}'
+        return WeightTicket.query.join(Customer).filter(
+            Customer.rfid_card == card, WeightTicket.status == 'open').first()
+
+    def closed_first_page():
+        return WeightTicket.query.options(joinedload(WeightTicket.customer)).filter(
+            WeightTicket.status == 'closed').order_by(WeightTicket.id.desc()).limit(50).all()
+
+    def closed_deep_page():
+        return WeightTicket.query.options(joinedload(WeightTicket.customer)).filter(
+            WeightTicket.status == 'closed', WeightTicket.id < 5000).order_by(WeightTicket.id.desc()).limit(50).all()
+
+    def open_tickets():
+        return WeightTicket.query.options(joinedload(WeightTicket.customer)).filter(
+            WeightTicket.status == 'open').order_by(WeightTicket.created_at).all()
+
+    return {
+        'customer_tickets_90d': customer_range,
+        'open_ticket_for_card': open_for_card,
+        'closed_page_first': closed_first_page,
+        'closed_page_deep': closed_deep_page,
+        'open_tickets': open_tickets,
+    }
+
+
+def time_queries(app, customers, iterations, seed):
+    results = {}
+    with app.app_context():
+        for name, run in queries(customers, seed).items():
+            run()  # Warm the page cache
+            samples = []
+            for _ in range(iterations):
+                started = time.perf_counter()
+                run()
+                samples.append((time.perf_counter() - started) * 1000)
+                db.session.expire_all()
+            samples.sort()
+            results[name] = {
+                'p50_ms': round(statistics.median(samples), 3),
+                'p99_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 3),
+                'mean_ms': round(statistics.fmean(samples), 3),
+            }
+        db.session.remove()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tickets', type=int, default=100000)
+    parser.add_argument('--customers', type=int, default=300)
+    parser.add_argument('--open', type=int, default=30, help='open tickets (trucks on site)')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        started = time.perf_counter()
+        populate(make_app(path, tuned=False), args.tickets, args.customers, args.open, args.seed)
+        build_seconds = time.perf_counter() - started
+
+        baseline = time_queries(make_app(path, tuned=False), args.customers, args.iterations, args.seed)
+
+        tuned_app = make_app(path, tuned=True)
+        with contextlib.redirect_stdout(sys.stderr):
+            upgrade(tuned_app)
+        tuned = time_queries(tuned_app, args.customers, args.iterations, args.seed)
+
+    report = {
+        'tickets': args.tickets,
+        'customers': args.customers,
+        'iterations': args.iterations,
+        'schema_version': LATEST_VERSION,
+        'build_seconds': round(build_seconds, 2),
+        'baseline': baseline,
+        'tuned': tuned,
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{args.tickets} tickets, {args.customers} customers, {args.iterations} runs per query")
+    print(f"{'query':<24}{'baseline p50':>14}{'tuned p50':>12}{'baseline p99':>14}{'tuned p99':>12}")
+    for name in baseline:
+        print(f"{name:<24}{baseline[name]['p50_ms']:>12.3f}ms{tuned[name]['p50_ms']:>10.3f}ms"
+              f"{baseline[name]['p99_ms']:>12.3f}ms{tuned[name]['p99_ms']:>10.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
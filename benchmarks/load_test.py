@@ -0,0 +1,340 @@
+"""Load test of the ticket lifecycle against simulated hardware.
+
+Starts the real app on a local port with a throwaway database, a fake RFID
+reader per worker (rfid_reader.FakeInputDevice), an in-memory printer
+(printer.FakeCupsConnection) and a scale fed with a steady load. Each worker
+then drives trucks through: card scan -> customer lookup -> open ticket ->
+close ticket -> receipt printed, and the run reports throughput and
+per-step latency.
+
+Run from the repository root:
+
+    python -m benchmarks.load_test --concurrency 8 --trucks 400 --json
+
+--flow weighings exercises POST /api/weighings (two taps per truck)
+instead of the separate create/close calls.
+"""
+import argparse
+import contextlib
+import http.client
+import json
+import logging
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Truck on the deck while a worker is weighing
+FEED_WEIGHT = 15000.0
+FEED_RATE_HZ = 20.0
+
+
+def summarize(samples):
+    if not samples:
+        return {'count': 0}
+    samples = sorted(samples)
+    return {
+        'count': len(samples),
+        'p50_ms': round(statistics.median(samples) * 1000, 3),
+        'p99_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 3),
+        'mean_ms': round(statistics.fmean(samples) * 1000, 3),
+        'max_ms': round(samples[-1] * 1000, 3),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class ScaleFeed:
+    """Pushes a steady reading into the app's ScaleReader, like a loaded deck."""
+
+    def __init__(self, scale, weight=FEED_WEIGHT, rate_hz=FEED_RATE_HZ):
+        self.scale = scale
+        self.weight = weight
+        self.interval = 1.0 / rate_hz
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.scale.connected = True
+        self.thread = threading.Thread(target=self._run, name='scale-feed', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2)
+
+    def _run(self):
+        while self.running:
+            self.scale.add_sample(self.weight)
+            time.sleep(self.interval)
+
+
+class Client:
+    """Keep-alive JSON client for one worker thread."""
+
+    def __init__(self, port):
+        self.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+
+    def request(self, method, path, body=None):
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        self.conn.request(method, path, json.dumps(body) if body is not None else None, headers)
+        response = self.conn.getresponse()
+        data = json.loads(response.read() or b'null')
+        if response.status >= 400:
+            raise RuntimeError(f"{method} {path} -> {response.status}: {data}")
+        return data
+
+    def close(self):
+        self.conn.close()
+
+
+def seed_database(webapp, customers, history, rng):
+    from models import db, Customer, WeightTicket
+    from reports import rebuild_rollups
+
+    with webapp.app.app_context():
+        db.session.execute(db.insert(Customer), [
+            {'id': i, 'name': f'Truck {i}', 'rfid_card': f'{i:010d}'} for i in range(1, customers + 1)
+        ])
+        start = datetime.utcnow() - timedelta(days=365)
+        step = timedelta(days=365) / max(history, 1)
+        rows = []
+        for i in range(history):
+            created = start + step * i
+            gross = rng.uniform(8000, 40000)
+            tare = rng.uniform(3000, 7000)
+            rows.append({'customer_id': rng.randint(1, customers), 'gross_weight': gross, 'tare_weight': tare,
+                         'net_weight': gross - tare, 'status': 'closed', 'created_at': created,
+                         'closed_at': created + timedelta(minutes=30)})
+            if len(rows) == 10000:
+                db.session.execute(db.insert(WeightTicket), rows)
+                rows = []
+        if rows:
+            db.session.execute(db.insert(WeightTicket), rows)
+        db.session.commit()
+        with db.engine.begin() as conn:
+            rebuild_rollups(conn)
+
+
+def wait_for_scan(client, since, card_id, timeout=10.0):
+    # Follow the scan log with our own cursor until our card shows up
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        data = client.request('GET', f'/api/rfid/read?since={since}&timeout=5')
+        for event in data['events']:
+            if event['card_id'] == card_id:
+                return event
+        since = data['last_seq']
+    raise RuntimeError(f"Scan of card {card_id} never reached the scan log")
+
+
+def wait_for_print(client, job_id, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.request('GET', f'/api/print-jobs/{job_id}')
+        if job['status'] == 'done':
+            return job
+        if job['status'] == 'failed':
+            raise RuntimeError(f"Print job {job_id} failed: {job['last_error']}")
+        time.sleep(0.01)
+    raise RuntimeError(f"Print job {job_id} not printed within {timeout} s")
+
+
+def tap(client, device, card_id, timings):
+    since = client.request('GET', '/api/rfid/read')['last_seq']
+    started = time.perf_counter()
+    device.send_card(card_id)
+    event = wait_for_scan(client, since, card_id)
+    timings['scan'].append(time.perf_counter() - started)
+    return event
+
+
+def timed(timings, step, call, *args):
+    started = time.perf_counter()
+    result = call(*args)
+    timings[step].append(time.perf_counter() - started)
+    return result
+
+
+def truck_tickets(client, device, card_id, timings):
+    tap(client, device, card_id, timings)
+    timed(timings, 'lookup', client.request, 'GET', f'/api/customers/by-rfid/{card_id}')
+    ticket = timed(timings, 'create_ticket', client.request, 'POST', '/api/tickets',
+                   {'rfid_card': card_id, 'gross_weight': FEED_WEIGHT})
+    tap(client, device, card_id, timings)
+    closed = timed(timings, 'close_ticket', client.request, 'POST', f"/api/tickets/{ticket['id']}/close",
+                   {'tare_weight': 5000.0})
+    timed(timings, 'print', wait_for_print, client, closed['print_job_id'])
+
+
+def truck_weighings(client, device, card_id, timings):
+    event = tap(client, device, card_id, timings)
+    timed(timings, 'weigh_open', client.request, 'POST', '/api/weighings', {'scan_seq': event['seq']})
+    event = tap(client, device, card_id, timings)
+    result = timed(timings, 'weigh_close', client.request, 'POST', '/api/weighings', {'scan_seq': event['seq']})
+    timed(timings, 'print', wait_for_print, client, result['print_job_id'])
+
+
+def worker(port, device, cards, trucks, flow, timings, errors, lock):
+    client = Client(port)
+    run_truck = truck_weighings if flow == 'weighings' else truck_tickets
+    local = {step: [] for step in timings}
+    try:
+        for n in range(trucks):
+            card_id = cards[n % len(cards)]
+            started = time.perf_counter()
+            try:
+                run_truck(client, device, card_id, local)
+                local['lifecycle'].append(time.perf_counter() - started)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+    finally:
+        client.close()
+        with lock:
+            for step, samples in local.items():
+                timings[step].extend(samples)
+
+
+def run(args):
+    tmp = tempfile.mkdtemp(prefix='endustry-load-')
+    try:
+        return _run(args, tmp)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _run(args, tmp):
+    # Read by app.config.from_prefixed_env() when the app module is imported
+    os.environ['FLASK_SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'load.db')}"
+    os.environ['FLASK_PRINTER_BACKEND'] = 'fake'
+    os.environ['FLASK_SLOW_REQUEST_MS'] = 'null'
+    os.environ.pop('FLASK_HARDWARE_BROKER', None)
+    os.environ.pop('FLASK_LANES', None)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    import app as webapp
+    from migrations import upgrade
+    from rfid_reader import FakeInputDevice
+    from werkzeug.serving import make_server
+
+    rng = random.Random(args.seed)
+    upgrade(webapp.app)
+    started = time.perf_counter()
+    seed_database(webapp, args.customers, args.history, rng)
+    seed_seconds = time.perf_counter() - started
+
+    webapp.printer.conn.delay = args.print_delay
+    lane = webapp.lanes.default
+    lane.scans.debounce = 0  # Workers reuse cards faster than a real truck could
+    # The feed never changes, so trucks weigh out at once and at their gross weight
+    lane.weighing.min_open_seconds = 0
+    lane.weighing.min_net = 0
+    feed = ScaleFeed(lane.scale)
+    feed.start()
+    if args.flow == 'weighings' and lane.scale.wait_stable(10) is None:
+        raise RuntimeError("Simulated scale never settled")
+
+    devices = [FakeInputDevice(name=f"Fake RFID Reader {i}", path=f"/dev/input/fake{i}")
+               for i in range(args.concurrency)]
+    reader = webapp.RFIDReader(hotplug=False)
+    reader.find_reader = lambda: None  # Only the fake devices, never real /dev/input nodes
+    for device in devices:
+        reader.add_device(device)
+    reader.start(webapp.rfid_callback)
+    webapp.spooler.start()
+
+    server = make_server('127.0.0.1', 0, webapp.app, threaded=True)
+    server_thread = threading.Thread(target=server.serve_forever, name='http', daemon=True)
+    server_thread.start()
+
+    # Each worker gets its own customers so no two trucks hold the same card
+    cards = [f'{i:010d}' for i in range(1, args.customers + 1)]
+    per_worker = [cards[i::args.concurrency] for i in range(args.concurrency)]
+    trucks = [args.trucks // args.concurrency + (1 if i < args.trucks % args.concurrency else 0)
+              for i in range(args.concurrency)]
+    steps = ['scan', 'lifecycle', 'print'] + (['weigh_open', 'weigh_close'] if args.flow == 'weighings'
+                                               else ['lookup', 'create_ticket', 'close_ticket'])
+    timings = {step: [] for step in steps}
+    errors = []
+    lock = threading.Lock()
+    threads = [threading.Thread(target=worker, args=(server.server_port, devices[i], per_worker[i], trucks[i],
+                                                      args.flow, timings, errors, lock))
+               for i in range(args.concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    server.shutdown()
+    reader.stop()
+    webapp.spooler.stop()
+    feed.stop()
+
+    completed = len(timings['lifecycle'])
+    return {
+        'revision': git_revision(),
+        'flow': args.flow,
+        'concurrency': args.concurrency,
+        'trucks': args.trucks,
+        'customers': args.customers,
+        'history_tickets': args.history,
+        'print_delay_s': args.print_delay,
+        'seed_seconds': round(seed_seconds, 2),
+        'elapsed_seconds': round(elapsed, 3),
+        'completed': completed,
+        'errors': len(errors),
+        'error_samples': errors[:5],
+        'trucks_per_second': round(completed / elapsed, 2) if elapsed else None,
+        'latency': {step: summarize(samples) for step, samples in timings.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--flow', choices=('tickets', 'weighings'), default='tickets')
+    parser.add_argument('--concurrency', type=int, default=4, help='trucks in flight at once')
+    parser.add_argument('--trucks', type=int, default=200, help='lifecycles to run in total')
+    parser.add_argument('--customers', type=int, default=300)
+    parser.add_argument('--history', type=int, default=10000, help='closed tickets already in the database')
+    parser.add_argument('--print-delay', type=float, default=0.0, help='seconds the fake printer takes per job')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+    if args.customers < args.concurrency:
+        parser.error('--customers must be at least --concurrency')
+
+    # The app and printer log to stdout; keep it clean for the report
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run(args)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{report['flow']}: {report['completed']} trucks in {report['elapsed_seconds']} s "
+          f"({report['trucks_per_second']}/s) at concurrency {report['concurrency']}, {report['errors']} errors")
+    print(f"{'step':<16}{'p50':>10}{'p99':>10}{'max':>10}")
+    for step, stats in report['latency'].items():
+        if stats['count']:
+            print(f"{step:<16}{stats['p50_ms']:>8.1f}ms{stats['p99_ms']:>8.1f}ms{stats['max_ms']:>8.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
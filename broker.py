@@ -0,0 +1,261 @@
+import functools
+import json
+import os
+import socket
+import socketserver
+import threading
+import traceback
+
+import metrics
+from models import db
+from scale import Sample
+from weighing import WeighingError
+
+# Seconds a call may take on top of any wait it asks the broker to do
+DEFAULT_CALL_TIMEOUT = 5.0
+
+
+class BrokerError(Exception):
+    pass
+
+
+class HardwareBroker:
+    """Owns the scale, RFID readers and printer for every web worker.
+
+    Listens on a Unix socket; each request is one JSON object per line,
+    ``{"op": "scans.wait", "args": {...}}``, answered by one line with
+    ``{"result": ...}`` or ``{"error": ..., "status": ...}``. Each client
+    connection gets its own thread, so a long wait on one does not hold up
+    the others. Ticket weighing runs here too, which keeps tap decisions
+    serialized across all workers. Scale, scan and weighing operations take
+    an optional ``lane`` argument; without it they use the default lane.
+    """
+
+    def __init__(self, path, app, lanes, spooler, health=None):
+        self.path = path
+        self.app = app
+        self.lanes = lanes
+        self.spooler = spooler
+        self.health = health
+        self.server = None
+        self.ops = {
+            'scale.status': lambda lane: lane.scale.status(),
+            'scale.latest': lambda lane: _sample(lane.scale.latest()),
+            'scale.latest_stable': lambda lane, max_age=None: _sample(lane.scale.latest_stable(max_age)),
+            'scale.wait_stable': lambda lane, timeout: _sample(lane.scale.wait_stable(timeout)),
+            'scale.window': lambda lane, seconds: [list(s) for s in lane.scale.window(seconds)],
+            'scans.last_seq': lambda lane: lane.scans.last_seq,
+            'scans.oldest_seq': lambda lane: lane.scans.oldest_seq(),
+            'scans.since': lambda lane, seq, limit=None: lane.scans.since(seq, limit),
+            'scans.wait': lambda lane, seq, timeout, limit=None: lane.scans.wait(seq, timeout, limit),
+            'scans.publish': lambda lane, card_id: lane.scans.publish(card_id),
+            'scans.latest': lambda lane: lane.scans.latest(),
+            'weighing.weigh': self._weigh,
+        }
+        # Operations that are not about one lane
+        self.global_ops = {
+            'printer.wake': lambda: spooler.wake(),
+            'health': self._health,
+            # Print, weighing and sync metrics are recorded here, not in the workers
+            'metrics': lambda: metrics.REGISTRY.collect(kinds=('counter', 'histogram'), label='process="broker"'),
+        }
+
+    def _health(self):
+        with self.app.app_context():
+            try:
+                return self.health() if self.health else {}
+            finally:
+                db.session.remove()
+
+    def _weigh(self, lane, card_id, scan_seq=None):
+        with self.app.app_context():
+            try:
+                return lane.weighing.weigh(card_id, scan_seq)
+            finally:
+                db.session.remove()
+
+    def handle(self, request):
+        op = request.get('op')
+        args = dict(request.get('args', {}))
+        if op in self.global_ops:
+            handler = self.global_ops[op]
+        elif op in self.ops:
+            lane = self.lanes.get(args.pop('lane', None))
+            if lane is None:
+                return {'error': "Unknown lane", 'status': 404}
+            handler = functools.partial(self.ops[op], lane)
+        else:
+            return {'error': f"Unknown operation {op!r}", 'status': 400}
+        try:
+            return {'result': handler(**args)}
+        except WeighingError as e:
+            return {'error': str(e), 'status': e.status}
+        except Exception as e:
+            traceback.print_exc()
+            return {'error': str(e), 'status': 500}
+
+    def serve_forever(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # Left behind by a previous run
+        broker = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        request = json.loads(line)
+                    except ValueError:
+                        response = {'error': 'Malformed request', 'status': 400}
+                    else:
+                        response = broker.handle(request)
+                    self.wfile.write(json.dumps(response, separators=(',', ':')).encode('utf-8') + b'\n')
+
+        class Server(socketserver.ThreadingUnixStreamServer):
+            daemon_threads = True
+
+        self.server = Server(self.path, Handler)
+        os.chmod(self.path, 0o660)
+        print(f"Hardware broker listening on {self.path}")
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def shutdown(self):
+        if self.server:
+            self.server.shutdown()
+
+
+def _sample(sample):
+    return list(sample) if sample is not None else None
+
+
+class BrokerClient:
+    """Web-worker side of the broker socket; one connection per thread."""
+
+    def __init__(self, path, timeout=DEFAULT_CALL_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.path)
+        self.local.sock = sock
+        self.local.file = sock.makefile('rb')
+        return sock
+
+    def _disconnect(self):
+        sock = getattr(self.local, 'sock', None)
+        if sock is not None:
+            self.local.file.close()
+            sock.close()
+        self.local.sock = None
+
+    def call(self, op, wait=0.0, **args):
+        message = json.dumps({'op': op, 'args': args}, separators=(',', ':')).encode('utf-8') + b'\n'
+        # One retry on a fresh connection covers a broker restart between calls. Only a
+        # request that never reached the broker is resent: once sent it may have been
+        # applied (a weighing, a published scan), so a lost or late reply is an error.
+        for attempt in range(2):
+            sent = False
+            try:
+                sock = getattr(self.local, 'sock', None) or self._connect()
+                sock.settimeout(self.timeout + wait)
+                sock.sendall(message)
+                sent = True
+                line = self.local.file.readline()
+                if not line:
+                    raise ConnectionResetError("Broker closed the connection")
+                break
+            except OSError as e:
+                self._disconnect()
+                if sent or attempt:
+                    raise BrokerError(f"Hardware broker unavailable at {self.path}: {e}")
+        response = json.loads(line)
+        if 'error' in response:
+            if op == 'weighing.weigh' and response.get('status', 500) < 500:
+                raise WeighingError(response['error'], response['status'])
+            raise BrokerError(response['error'])
+        return response['result']
+
+    def wake_printer(self):
+        self.call('printer.wake')
+
+    def health(self):
+        return self.call('health')
+
+
+class RemoteScale:
+    """ScaleReader interface backed by the broker, for one lane."""
+
+    def __init__(self, client, lane=None):
+        self.client = client
+        self.lane = lane
+
+    def start(self):
+        pass  # The broker runs the reader
+
+    def stop(self):
+        pass
+
+    def status(self):
+        return self.client.call('scale.status', lane=self.lane)
+
+    def latest(self):
+        return _to_sample(self.client.call('scale.latest', lane=self.lane))
+
+    def latest_stable(self, max_age=None):
+        return _to_sample(self.client.call('scale.latest_stable', lane=self.lane, max_age=max_age))
+
+    def wait_stable(self, timeout):
+        return _to_sample(self.client.call('scale.wait_stable', lane=self.lane, wait=timeout, timeout=timeout))
+
+    def window(self, seconds):
+        return [Sample(*s) for s in self.client.call('scale.window', lane=self.lane, seconds=seconds)]
+
+
+def _to_sample(data):
+    return Sample(*data) if data is not None else None
+
+
+class RemoteScanLog:
+    """ScanLog interface backed by the broker, for one lane."""
+
+    def __init__(self, client, lane=None):
+        self.client = client
+        self.lane = lane
+
+    @property
+    def last_seq(self):
+        return self.client.call('scans.last_seq', lane=self.lane)
+
+    def oldest_seq(self):
+        return self.client.call('scans.oldest_seq', lane=self.lane)
+
+    def since(self, seq, limit=None):
+        return self.client.call('scans.since', lane=self.lane, seq=seq, limit=limit)
+
+    def wait(self, seq, timeout, limit=None):
+        return self.client.call('scans.wait', lane=self.lane, wait=timeout, seq=seq, timeout=timeout, limit=limit)
+
+    def latest(self):
+        return self.client.call('scans.latest', lane=self.lane)
+
+    def publish(self, card_id):
+        return self.client.call('scans.publish', lane=self.lane, card_id=card_id)
+
+
+class RemoteWeighing:
+    """WeighingWorkflow interface; the decision runs inside the broker."""
+
+    def __init__(self, client, stable_timeout, lane=None):
+        self.client = client
+        self.stable_timeout = stable_timeout
+        self.lane = lane
+
+    def weigh(self, card_id, scan_seq=None):
+        return self.client.call('weighing.weigh', wait=self.stable_timeout, lane=self.lane,
+                                card_id=card_id, scan_seq=scan_seq)
@@ -0,0 +1,142 @@
+import collections
+import threading
+import time
+
+from sqlalchemy import event, inspect
+
+from models import db, Customer, WeightTicket
+
+# Cards kept in memory; the least recently scanned are evicted first
+DEFAULT_CACHE_SIZE = 1024
+# Sentinel for cards that are known not to belong to any customer
+_UNKNOWN = object()
+# Unknown cards are re-checked after this many seconds, so customers added by
+# another process (CLI import, another worker) are found without a restart
+UNKNOWN_TTL = 10.0
+
+
+class CustomerCache:
+    """Bounded LRU index from RFID card to customer and open ticket.
+
+    A card tap resolves from memory after the first lookup. Entries are
+    plain dicts, never ORM objects, so they are safe to share between
+    request threads. Any committed change to a customer or one of their
+    tickets drops the affected cards, and a lookup that raced with such a
+    commit is not stored. Only this process's commits are seen; with
+    several writers, ``ttl`` bounds how long an entry can be stale.
+    """
+
+    def __init__(self, size=DEFAULT_CACHE_SIZE, ttl=None):
+        self.size = size
+        self.ttl = ttl
+        self.entries = collections.OrderedDict()
+        self.stored_at = {}
+        self.cards_by_customer = {}
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, card_id):
+        # Returns {'customer': {...}, 'open_ticket': {...} or None}, or None for unknown cards
+        with self.lock:
+            entry = self.entries.get(card_id)
+            if entry is not None and self._expired(card_id, entry):
+                self._drop(card_id)
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(card_id)
+                self.hits += 1
+                return None if entry is _UNKNOWN else entry
+            self.misses += 1
+            generation = self.generation
+
+        entry = self._load(card_id)
+
+        with self.lock:
+            # A commit in the meantime may have made what we read stale
+            if generation == self.generation:
+                self._store(card_id, entry)
+        return None if entry is _UNKNOWN else entry
+
+    def _expired(self, card_id, entry):
+        ttl = self.ttl
+        if entry is _UNKNOWN:
+            ttl = UNKNOWN_TTL if ttl is None else min(ttl, UNKNOWN_TTL)
+        return ttl is not None and time.monotonic() - self.stored_at[card_id] > ttl
+
+    def _load(self, card_id):
+        customer = Customer.query.filter_by(rfid_card=card_id).first()
+        if customer is None:
+            return _UNKNOWN
+        open_ticket = WeightTicket.query.filter_by(customer_id=customer.id, status='open') \
+            .order_by(WeightTicket.id.desc()).first()
+        return {
+            'customer': customer.to_dict(),
+            'open_ticket': open_ticket.to_dict() if open_ticket else None
+        }
+
+    def _store(self, card_id, entry):
+        self.entries[card_id] = entry
+        self.entries.move_to_end(card_id)
+        self.stored_at[card_id] = time.monotonic()
+        if entry is not _UNKNOWN:
+            self.cards_by_customer[entry['customer']['id']] = card_id
+        while len(self.entries) > self.size:
+            self._drop(next(iter(self.entries)))
+
+    def _drop(self, card_id):
+        entry = self.entries.pop(card_id, None)
+        self.stored_at.pop(card_id, None)
+        if entry is not None and entry is not _UNKNOWN:
+            self.cards_by_customer.pop(entry['customer']['id'], None)
+
+    def invalidate(self, cards=(), customer_ids=()):
+        with self.lock:
+            self.generation += 1
+            cards = set(cards)
+            for customer_id in customer_ids:
+                card_id = self.cards_by_customer.pop(customer_id, None)
+                if card_id is not None:
+                    cards.add(card_id)
+            for card_id in cards:
+                self._drop(card_id)
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+            self.stored_at.clear()
+            self.cards_by_customer.clear()
+
+    def stats(self):
+        with self.lock:
+            return {'size': len(self.entries), 'max_size': self.size, 'hits': self.hits, 'misses': self.misses}
+
+    def watch(self, session=None):
+        # Invalidate on commit rather than flush, so a rollback leaves the cache alone
+        session = session or db.session
+        event.listen(session, 'after_flush', self._collect_changes)
+        event.listen(session, 'after_commit', self._apply_changes)
+        event.listen(session, 'after_rollback', self._discard_changes)
+
+    def _collect_changes(self, session, flush_context):
+        cards, customer_ids = session.info.setdefault('customer_cache_changes', (set(), set()))
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(obj, Customer):
+                customer_ids.add(obj.id)
+                # Covers a new card replacing a cached "unknown card" entry
+                cards.add(obj.rfid_card)
+                old_cards = inspect(obj).attrs.rfid_card.history.deleted
+                cards.update(card for card in old_cards if card)
+            elif isinstance(obj, WeightTicket):
+                customer_ids.add(obj.customer_id)
+                customer_ids.update(inspect(obj).attrs.customer_id.history.deleted)
+
+    def _apply_changes(self, session):
+        changes = session.info.pop('customer_cache_changes', None)
+        if changes:
+            self.invalidate(*changes)
+
+    def _discard_changes(self, session):
+        session.info.pop('customer_cache_changes', None)
@@ -0,0 +1,147 @@
+import csv
+import io
+import json
+
+from sqlalchemy import insert, update, or_
+
+from models import db, Customer
+from sync import journal_customers
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def parse_import(data, fmt):
+    """Rows (dicts) from CSV text or a JSON list / {"customers": [...]} document.
+
+    Columns are name and rfid_card, plus an optional id selecting the
+    customer to update.
+    """
+    if fmt == 'json':
+        try:
+            payload = json.loads(data) if isinstance(data, (str, bytes)) else data
+        except ValueError as e:
+            raise ImportFormatError(f"Invalid JSON: {e}")
+        if isinstance(payload, dict):
+            payload = payload.get('customers')
+        if not isinstance(payload, list) or not all(isinstance(row, dict) for row in payload):
+            raise ImportFormatError("JSON must be a list of customer objects")
+        return payload
+    if fmt == 'csv':
+        if isinstance(data, bytes):
+            data = data.decode('utf-8-sig')
+        reader = csv.DictReader(io.StringIO(data))
+        if not reader.fieldnames or not {'name', 'rfid_card'} <= set(reader.fieldnames):
+            raise ImportFormatError("CSV needs a header row with name and rfid_card columns")
+        return list(reader)
+    raise ImportFormatError(f"Unsupported format {fmt!r}; use csv or json")
+
+
+def _clean(row):
+    def text(key):
+        value = row.get(key)
+        return str(value).strip() if value is not None else ''
+
+    customer_id = text('id')
+    if customer_id:
+        try:
+            customer_id = int(customer_id)
+        except ValueError:
+            raise ValueError(f"Invalid id {customer_id!r}")
+    if not text('name') or not text('rfid_card'):
+        raise ValueError("Name and RFID card are required")
+    if len(text('name')) > 100 or len(text('rfid_card')) > 50:
+        raise ValueError("Name or RFID card is too long")
+    return customer_id or None, text('name'), text('rfid_card')
+
+
+def import_customers(rows, dry_run=False):
+    """Create or update customers in one transaction and report on every row.
+
+    A row with an ``id`` updates that customer; otherwise a row whose card
+    is already registered updates that customer's name, and any other row
+    creates a customer. Rows that would take a card owned by someone else,
+    repeat a card from an earlier row or fail validation are reported and
+    skipped; the rest are written with one executemany per statement.
+    """
+    results = []
+    parsed = []
+    for number, row in enumerate(rows, start=1):
+        try:
+            parsed.append((number,) + _clean(row))
+        except ValueError as e:
+            results.append({'row': number, 'status': 'error', 'error': str(e)})
+
+    # Every existing customer the file could touch, in one query
+    cards = {card for _, _, _, card in parsed}
+    ids = {customer_id for _, customer_id, _, _ in parsed if customer_id}
+    existing = db.session.query(Customer.id, Customer.name, Customer.rfid_card).filter(
+        or_(Customer.rfid_card.in_(cards), Customer.id.in_(ids))
+    ).all() if parsed else []
+    by_card = {row.rfid_card: row for row in existing}
+    by_id = {row.id: row for row in existing}
+
+    inserts = []
+    updates = []
+    seen_cards = {}
+    touched = {}
+    for number, customer_id, name, card in parsed:
+        if card in seen_cards:
+            results.append({'row': number, 'status': 'error', 'rfid_card': card,
+                            'error': f"RFID card repeats row {seen_cards[card]}"})
+            continue
+        seen_cards[card] = number
+
+        owner = by_card.get(card)
+        if customer_id:
+            current = by_id.get(customer_id)
+            if current is None:
+                results.append({'row': number, 'status': 'error', 'id': customer_id,
+                                'error': f"Customer {customer_id} not found"})
+                continue
+        else:
+            current = owner
+
+        if owner is not None and current is not None and owner.id != current.id:
+            results.append({'row': number, 'status': 'error', 'id': current.id, 'rfid_card': card,
+                            'error': f"RFID card already assigned to customer {owner.id} ({owner.name})"})
+            continue
+
+        if current is not None and current.id in touched:
+            results.append({'row': number, 'status': 'error', 'id': current.id, 'rfid_card': card,
+                            'error': f"Customer {current.id} already changed by row {touched[current.id]}"})
+            continue
+
+        if current is None:
+            inserts.append((number, {'name': name, 'rfid_card': card}))
+        elif current.name == name and current.rfid_card == card:
+            results.append({'row': number, 'status': 'unchanged', 'id': current.id, 'rfid_card': card})
+        else:
+            touched[current.id] = number
+            updates.append((number, {'id': current.id, 'name': name, 'rfid_card': card}))
+            results.append({'row': number, 'status': 'updated', 'id': current.id, 'rfid_card': card})
+
+    created = []
+    try:
+        if updates:
+            db.session.execute(update(Customer), [values for _, values in updates])
+        if inserts:
+            created = db.session.execute(
+                insert(Customer).returning(Customer.id, Customer.rfid_card, sort_by_parameter_order=True),
+                [values for _, values in inserts]
+            ).all()
+            for (number, values), row in zip(inserts, created):
+                results.append({'row': number, 'status': 'created', 'id': row.id, 'rfid_card': values['rfid_card']})
+        if dry_run:
+            db.session.rollback()
+        else:
+            journal_customers([values['id'] for _, values in updates] + [row.id for row in created])
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    results.sort(key=lambda result: result['row'])
+    summary = {status: sum(1 for result in results if result['status'] == status)
+               for status in ('created', 'updated', 'unchanged', 'error')}
+    return {'dry_run': dry_run, 'summary': summary, 'rows': results}
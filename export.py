@@ -0,0 +1,89 @@
+import csv
+import io
+import json
+import zlib
+
+from models import db, Customer, WeightTicket
+
+# Rows fetched per query; memory use is bounded by this, not by the date range
+DEFAULT_CHUNK_SIZE = 500
+
+EXPORT_COLUMNS = (
+    ('id', WeightTicket.id),
+    ('customer_id', WeightTicket.customer_id),
+    ('customer_name', Customer.name),
+    ('rfid_card', Customer.rfid_card),
+    ('status', WeightTicket.status),
+    ('lane', WeightTicket.lane),
+    ('gross_weight', WeightTicket.gross_weight),
+    ('tare_weight', WeightTicket.tare_weight),
+    ('net_weight', WeightTicket.net_weight),
+    ('created_at', WeightTicket.created_at),
+    ('closed_at', WeightTicket.closed_at),
+)
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def iter_ticket_chunks(query, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Keyset chunks in id order; each chunk is its own short read transaction
+    # so an export never pins a snapshot or holds up writers
+    query = query.join(Customer, WeightTicket.customer_id == Customer.id) \
+        .with_entities(*[column for _, column in EXPORT_COLUMNS]) \
+        .order_by(WeightTicket.id)
+    last_id = 0
+    while True:
+        rows = query.filter(WeightTicket.id > last_id).limit(chunk_size).all()
+        db.session.rollback()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1][0]
+
+
+def _serialize(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def encode_csv(chunks, names=None):
+    # names: column header, EXPORT_COLUMNS by default; weight_trace reuses this
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names or [name for name, _ in EXPORT_COLUMNS])
+    for rows in chunks:
+        writer.writerows([[_serialize(value) for value in row] for row in rows])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    # Header-only exports still produce a valid file
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def encode_ndjson(chunks, names=None):
+    names = names or [name for name, _ in EXPORT_COLUMNS]
+    for rows in chunks:
+        yield ''.join(
+            json.dumps(dict(zip(names, map(_serialize, row))), separators=(',', ':')) + '\n'
+            for row in rows
+        ).encode('utf-8')
+
+
+def gzip_stream(blocks, level=6):
+    # wbits=31 writes a gzip header; sync flushes keep the download moving
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for block in blocks:
+        data = compressor.compress(block) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_tickets(query, fmt='csv', compress=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    encode = encode_csv if fmt == 'csv' else encode_ndjson
+    blocks = encode(iter_ticket_chunks(query, chunk_size))
+    return gzip_stream(blocks) if compress else blocks
@@ -0,0 +1,31 @@
+"""gunicorn settings for the web workers behind the hardware broker.
+
+    export FLASK_HARDWARE_BROKER=/run/endustry/hardware.sock
+    flask --app app run-broker &
+    gunicorn app:app
+
+One worker process per core spreads requests over the Pi's cores; the
+hardware stays in the broker, so any number of workers can share it.
+
+Every open kiosk page holds one /events (SSE) request for as long as it is
+up. A sync worker would be tied up by each of them, so two kiosks could
+take every worker and leave none for the API. gthread workers serve each
+request on a thread instead, so a site can hold ``workers * threads``
+requests at once: size that for the kiosks you expect plus headroom for
+API calls. A page whose EventSource keeps failing falls back to
+/events/poll, which only holds a thread for one poll at a time.
+
+Each /metrics scrape reaches one worker. Its own series carry
+process="web-<pid>" and the broker's are merged in, so aggregate with
+``sum without (process) (...)``. Override anything on the command line,
+e.g. GUNICORN_CMD_ARGS="--workers 2 --threads 16".
+"""
+import multiprocessing
+
+bind = '0.0.0.0:5000'
+worker_class = 'gthread'
+workers = multiprocessing.cpu_count()
+# Per worker: kiosks' SSE streams plus API requests served at once
+threads = 8
+# gthread workers heartbeat from the main thread, so long SSE requests do not trip this
+timeout = 30
@@ -0,0 +1,124 @@
+import collections
+import os
+
+from live import LiveChannel
+from rfid_reader import is_rfid_device
+
+# Lane used when LANES is not configured, and for the unscoped /api routes
+DEFAULT_LANE = 'main'
+
+LaneConfig = collections.namedtuple('LaneConfig', ['name', 'scale_port', 'scale_baudrate', 'printer', 'readers'])
+
+
+def lane_configs(config):
+    """LaneConfig for every configured lane, in configuration order.
+
+    ``LANES`` maps a lane name to ``scale_port``, ``scale_baudrate``,
+    ``printer`` and ``readers`` (device paths such as
+    /dev/input/by-path/..., or fragments of the reader's name). Missing
+    keys fall back to SCALE_PORT, SCALE_BAUDRATE and PRINTER_NAME. Without
+    ``LANES`` there is one lane, ``main``, that takes every reader.
+    """
+    lanes = config.get('LANES') or {DEFAULT_LANE: {}}
+    result = []
+    for name, lane in lanes.items():
+        readers = lane.get('readers') or ()
+        if isinstance(readers, str):
+            readers = (readers,)
+        result.append(LaneConfig(
+            name=str(name),
+            scale_port=lane.get('scale_port', config['SCALE_PORT']),
+            scale_baudrate=lane.get('scale_baudrate', config['SCALE_BAUDRATE']),
+            printer=lane.get('printer') or config['PRINTER_NAME'],
+            readers=tuple(readers),
+        ))
+    return result
+
+
+class Lane:
+    """One weighbridge: its scale, its scan log and the printer its receipts go to."""
+
+    def __init__(self, config, scale, scans):
+        self.name = config.name
+        self.config = config
+        self.scale = scale
+        self.scans = scans
+        self.printer = config.printer
+        self.readers = {os.path.realpath(reader) if reader.startswith('/') else reader
+                        for reader in config.readers}
+        self.live = LiveChannel(scale, scans)
+        self.weighing = None
+
+    def owns(self, device):
+        if os.path.realpath(device.path) in self.readers:
+            return True
+        name = device.name.upper()
+        return any(not reader.startswith('/') and reader.upper() in name for reader in self.readers)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'printer': self.printer,
+            'readers': list(self.config.readers),
+            'scale': self.scale.status(),
+            'last_seq': self.scans.last_seq,
+        }
+
+
+class Lanes:
+    """The lanes of this instance by name, and which lane each RFID reader feeds.
+
+    A reader matching one lane's ``readers`` belongs to that lane; readers
+    matching none go to the lane that lists no readers, if there is one.
+    Scans from any other reader are dropped, so a stray reader can never
+    open a ticket on the wrong weighbridge.
+    """
+
+    def __init__(self, lanes):
+        self.lanes = collections.OrderedDict((lane.name, lane) for lane in lanes)
+        self.default = next(iter(self.lanes.values()))
+        self.catch_all = next((lane for lane in lanes if not lane.readers), None)
+        self._by_device = {}
+
+    def __iter__(self):
+        return iter(self.lanes.values())
+
+    def __len__(self):
+        return len(self.lanes)
+
+    def get(self, name=None):
+        # None is the default lane; unknown names are None
+        if name is None:
+            return self.default
+        return self.lanes.get(name)
+
+    def matches(self, device):
+        # RFIDReader match: any "RFID" device, plus readers a lane names explicitly
+        return is_rfid_device(device) or any(lane.owns(device) for lane in self)
+
+    def for_device(self, device):
+        key = (device.path, device.name)
+        if key not in self._by_device:
+            lane = next((lane for lane in self if lane.owns(device)), self.catch_all)
+            if lane is None:
+                print(f"RFID reader {device.name} ({device.path}) is not assigned to a lane; ignoring its scans")
+            self._by_device[key] = lane
+        return self._by_device[key]
+
+    def publish(self, card_id, device):
+        # RFIDReader callback: the scan lands in the log of the reader's lane
+        lane = self.for_device(device)
+        if lane is not None:
+            return lane.scans.publish(card_id)
+
+    def reader_health(self, reader):
+        # Attached readers per lane; a lane with none cannot take taps
+        devices = {lane.name: [] for lane in self}
+        health = reader.health()
+        for device in list(reader.devices.values()):
+            lane = self.for_device(device)
+            if lane is not None:
+                devices[lane.name].append({'name': device.name, 'path': device.path})
+        return {name: {'ok': health['running'] and bool(attached), 'running': health['running'],
+                       'devices': attached, 'hotplug': health['hotplug']}
+                for name, attached in devices.items()}
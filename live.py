@@ -0,0 +1,99 @@
+import json
+import time
+
+WEIGHT_FIELDS = ('connected', 'weight', 'stable', 'motion', 'overload', 'timestamp')
+
+
+class LiveChannel:
+    """Pushes scale and RFID changes to browsers (SSE, with long-poll fallback).
+
+    Weight updates are change-only: a new value is sent when it moves by at
+    least ``weight_deadband`` kg or the connected/stable flags flip, and at
+    most once per ``min_interval`` seconds per client. Card scans are sent
+    as soon as they land in the scan log.
+    """
+
+    def __init__(self, scale, scans, min_interval=0.25, weight_deadband=1.0, keepalive=15.0):
+        self.scale = scale
+        self.scans = scans
+        self.min_interval = min_interval
+        self.weight_deadband = weight_deadband
+        self.keepalive = keepalive
+
+    def weight_snapshot(self):
+        status = self.scale.status()
+        return {field: status.get(field) for field in WEIGHT_FIELDS}
+
+    def _weight_changed(self, previous, current):
+        if previous is None:
+            return True
+        for flag in ('connected', 'stable', 'overload'):
+            if bool(previous.get(flag)) != bool(current.get(flag)):
+                return True
+        if previous.get('weight') is None or current.get('weight') is None:
+            return previous.get('weight') != current.get('weight')
+        return abs(previous['weight'] - current['weight']) >= self.weight_deadband
+
+    def new_cursor(self, card_seq=None):
+        last_seq = self.scans.last_seq
+        seq = last_seq if card_seq is None or card_seq > last_seq else card_seq
+        return {'card': seq, 'weight': None, 'weight_sent_at': 0.0}
+
+    def next_events(self, cursor, timeout):
+        # Blocks until there is something new for this cursor or timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            events = [('rfid', scan) for scan in self.scans.since(cursor['card'])]
+            if events:
+                cursor['card'] = events[-1][1]['seq']
+            now = time.monotonic()
+            next_weight_at = cursor['weight_sent_at'] + self.min_interval
+            if now >= next_weight_at:
+                snapshot = self.weight_snapshot()
+                if self._weight_changed(cursor['weight'], snapshot):
+                    events.append(('weight', snapshot))
+                    cursor['weight'] = snapshot
+                    cursor['weight_sent_at'] = now
+                next_weight_at = now + self.min_interval
+            if events:
+                return events
+            remaining = deadline - now
+            if remaining <= 0:
+                return []
+            self.scans.wait(cursor['card'], min(max(next_weight_at - now, 0.01), remaining))
+
+    def stream(self, last_event_id=None):
+        cursor = self.new_cursor(last_event_id)
+        yield "retry: 3000\n\n"
+        while True:
+            events = self.next_events(cursor, self.keepalive)
+            if not events:
+                yield ": keepalive\n\n"
+                continue
+            for name, data in events:
+                yield f"event: {name}\nid: {cursor['card']}\ndata: {json.dumps(data)}\n\n"
+
+    def encode_cursor(self, cursor):
+        weight = cursor['weight'] or {}
+        return json.dumps({
+            'card': cursor['card'],
+            'weight': weight.get('weight'),
+            'connected': bool(weight.get('connected')),
+            'stable': bool(weight.get('stable')),
+            'overload': bool(weight.get('overload')),
+            'sent': time.monotonic() if cursor['weight'] else 0.0,
+        }, separators=(',', ':'))
+
+    def decode_cursor(self, token):
+        if not token:
+            return self.new_cursor()
+        data = json.loads(token)
+        cursor = self.new_cursor(int(data['card']))
+        cursor['weight'] = {
+            'weight': data.get('weight'),
+            'connected': data.get('connected'),
+            'stable': data.get('stable'),
+            'overload': data.get('overload'),
+        }
+        cursor['weight_sent_at'] = float(data.get('sent', 0.0))
+        return cursor
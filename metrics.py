@@ -0,0 +1,244 @@
+import bisect
+import collections
+import itertools
+import threading
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+# Latency buckets in seconds, from a fast SELECT up to a slow weighing
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUEUE_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _add_label(labels, extra):
+    # '{kind="ticket"}' + 'process="broker"' -> '{kind="ticket",process="broker"}'
+    if not extra:
+        return labels
+    return labels[:-1] + ',' + extra + '}' if labels else '{' + extra + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            items = sorted(self.values.items())
+        for label_values, value in items:
+            yield self.name + '_total', _format_labels(self.labels, label_values), value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.series = {}  # label values -> [bucket counts..., sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self.lock:
+            items = sorted((labels, list(series)) for labels, series in self.series.items())
+        for label_values, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield self.name + '_bucket', _format_labels(self.labels, label_values, le), cumulative
+            yield self.name + '_bucket', _format_labels(self.labels, label_values, 'le="+Inf"'), series[-1]
+            yield self.name + '_sum', _format_labels(self.labels, label_values), series[-2]
+            yield self.name + '_count', _format_labels(self.labels, label_values), series[-1]
+
+
+class Gauge:
+    """Value read at scrape time from a callback.
+
+    With ``labels``, the callback returns {label values tuple: value}.
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, help, read, labels=()):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.labels = tuple(labels)
+
+    def samples(self):
+        try:
+            value = self.read()
+        except Exception as e:
+            print(f"Error reading metric {self.name}: {e}")
+            return
+        if self.labels:
+            for label_values, labeled in sorted(value.items()):
+                yield self.name, _format_labels(self.labels, label_values), labeled
+        elif value is not None:
+            yield self.name, '', value
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name, help, read, labels=()):
+        return self.register(Gauge(name, help, read, labels))
+
+    def collect(self, kinds=None, label=''):
+        """Families as [name, help, kind, [[sample, labels, value], ...]].
+
+        Plain lists, so the broker can send its own over the socket. ``label``
+        (e.g. 'process="broker"') is added to every counter and histogram
+        sample; gauges are read at scrape time and are left as they are.
+        """
+        families = []
+        for metric in self.metrics:
+            if kinds and metric.kind not in kinds:
+                continue
+            extra = label if metric.kind != 'gauge' else ''
+            families.append([metric.name, metric.help, metric.kind,
+                             [[name, _add_label(labels, extra), value] for name, labels, value in metric.samples()]])
+        return families
+
+    def render(self, label='', extra=()):
+        # Prometheus text exposition format 0.0.4; families from another process
+        # (extra, from its collect()) are merged into the local ones of the same name
+        families = collections.OrderedDict()
+        for name, help, kind, samples in itertools.chain(self.collect(label=label), extra):
+            families.setdefault(name, (help, kind, []))[2].extend(samples)
+        lines = []
+        for name, (help, kind, samples) in families.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample, labels, value in samples:
+                lines.append(f"{sample}{labels} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'endustry_http_request_duration_seconds', 'HTTP request latency by route.', ('method', 'route', 'status'))
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    'endustry_db_query_duration_seconds', 'SQL statement latency by statement type.', ('statement',))
+DB_ERRORS = REGISTRY.counter(
+    'endustry_db_errors', 'SQL statements that raised.', ('statement',))
+PRINT_QUEUE_SECONDS = REGISTRY.histogram(
+    'endustry_print_job_queue_seconds', 'Time from enqueue to the printer accepting a job.', ('kind',),
+    buckets=QUEUE_BUCKETS)
+PRINT_SEND_SECONDS = REGISTRY.histogram(
+    'endustry_print_send_duration_seconds', 'Time to hand one job to CUPS.', ('outcome',))
+PRINT_JOBS = REGISTRY.counter(
+    'endustry_print_jobs', 'Print attempts by outcome.', ('kind', 'outcome'))
+SCALE_SETTLE_SECONDS = REGISTRY.histogram(
+    'endustry_weighing_settle_seconds', 'Time a card tap waited for a stable weight.', ('lane', 'outcome'))
+SCAN_TO_TICKET_SECONDS = REGISTRY.histogram(
+    'endustry_scan_to_ticket_seconds', 'Time from card read to the ticket being committed.', ('lane', 'action'))
+SYNC_BATCHES = REGISTRY.counter(
+    'endustry_sync_batches', 'Head-office sync batches by outcome.', ('outcome',))
+SYNC_CHANGES = REGISTRY.counter(
+    'endustry_sync_changes', 'Changes acknowledged by head office.')
+SYNC_SECONDS = REGISTRY.histogram(
+    'endustry_sync_post_duration_seconds', 'Time to post one sync batch.')
+
+
+def _statement_type(statement):
+    return statement.lstrip().split(None, 1)[0].upper() if statement else 'UNKNOWN'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    DB_QUERY_SECONDS.observe(elapsed, _statement_type(statement))
+    if has_request_context():
+        g.metrics_queries = g.get('metrics_queries', 0) + 1
+        g.metrics_db_seconds = g.get('metrics_db_seconds', 0.0) + elapsed
+
+
+def _handle_error(context):
+    started = context.connection.info.get('query_started') if context.connection is not None else None
+    if started:
+        started.pop()
+    DB_ERRORS.inc(_statement_type(context.statement))
+
+
+def init_app(app, db, slow_request_ms=None):
+    """Time every request and SQL statement; log requests slower than slow_request_ms."""
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(db.engine, 'handle_error', _handle_error)
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        # Label by URL rule, not path, so /api/tickets/<id> stays one series
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(elapsed, request.method, route, response.status_code)
+        if slow_request_ms is not None and elapsed * 1000 >= slow_request_ms:
+            print(f"Slow request: {request.method} {request.full_path.rstrip('?')} -> {response.status_code} "
+                  f"in {elapsed * 1000:.0f} ms ({g.get('metrics_queries', 0)} queries, "
+                  f"{g.get('metrics_db_seconds', 0.0) * 1000:.0f} ms in SQL)")
+        return response
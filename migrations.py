@@ -0,0 +1,101 @@
+from sqlalchemy import event, inspect
+
+from models import db, WeightTicket, PrintJob
+from reports import rebuild_rollups
+
+# Applied to every new SQLite connection
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),  # Readers no longer block the writer (and vice versa)
+    ('synchronous', 'NORMAL'),  # Safe with WAL; fsync at checkpoints, not every commit
+    ('cache_size', '-16000'),  # 16 MB page cache
+    ('busy_timeout', '5000'),  # Wait up to 5 s for a lock instead of failing
+    ('temp_store', 'MEMORY'),
+)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS:
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
+
+
+def configure_sqlite(app):
+    # Register the pragma profile on the app's engine (call once, after db.init_app)
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', _set_sqlite_pragmas)
+
+
+def _create_indexes(conn, table, names):
+    for index in table.indexes:
+        if index.name in names:
+            index.create(conn, checkfirst=True)
+
+
+def _weight_ticket_indexes(conn):
+    # Named, so later indexes on columns this version lacks are left to their own step
+    _create_indexes(conn, WeightTicket.__table__, {
+        'ix_weight_ticket_customer_created', 'ix_weight_ticket_created',
+        'ix_weight_ticket_status_id', 'ix_weight_ticket_open_customer'})
+    # Refresh planner statistics for the new indexes
+    conn.exec_driver_sql("PRAGMA optimize")
+
+
+def _backfill_rollups(conn):
+    # daily_tonnage itself is created by create_all() before the steps run
+    rebuild_rollups(conn)
+
+
+def _add_column(conn, table, column):
+    # SQLite can add a nullable column in place, without copying the table
+    if column.name not in {c['name'] for c in inspect(conn).get_columns(table.name)}:
+        conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} "
+                             f"{column.type.compile(dialect=conn.dialect)}")
+
+
+def _lane_columns(conn):
+    _add_column(conn, WeightTicket.__table__, WeightTicket.__table__.c.lane)
+    _add_column(conn, PrintJob.__table__, PrintJob.__table__.c.printer)
+    _create_indexes(conn, WeightTicket.__table__, {'ix_weight_ticket_lane_status_id'})
+
+
+# (version, description, step). Steps run in order on databases whose
+# PRAGMA user_version is below their number; never edit a released step,
+# append a new one instead.
+MIGRATIONS = [
+    (1, "baseline schema", lambda conn: None),
+    (2, "weight_ticket customer/date, status and open-ticket indexes", _weight_ticket_indexes),
+    (3, "daily_tonnage rollups backfilled from closed tickets", _backfill_rollups),
+    (4, "weight_ticket.lane and print_job.printer", _lane_columns),
+    # weight_trace is a new table, created by create_all() before the steps run
+    (5, "weight_trace table", lambda conn: None),
+    # Likewise sync_outbox
+    (6, "sync_outbox table", lambda conn: None),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def upgrade(app):
+    with app.app_context():
+        with db.engine.begin() as conn:
+            fresh = not inspect(conn).has_table(WeightTicket.__tablename__)
+            # New tables (and everything on a fresh database) come from the models
+            db.metadata.create_all(conn)
+            if fresh:
+                conn.exec_driver_sql(f"PRAGMA user_version = {LATEST_VERSION}")
+                return LATEST_VERSION
+
+            version = schema_version(conn)
+            for number, description, step in MIGRATIONS:
+                if number <= version:
+                    continue
+                print(f"Applying migration {number}: {description}")
+                step(conn)
+                conn.exec_driver_sql(f"PRAGMA user_version = {number}")
+                version = number
+            return version
@@ -10,6 +10,14 @@ class Customer(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     tickets = db.relationship('WeightTicket', backref='customer', lazy=True)
 
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'rfid_card': self.rfid_card,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
 class WeightTicket(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False)
@@ -19,9 +27,118 @@ class WeightTicket(db.Model):
     status = db.Column(db.String(20), default='open')  # 'open' or 'closed'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     closed_at = db.Column(db.DateTime)
+    lane = db.Column(db.String(50))  # Lane the truck was weighed in on; None before lanes existed
+    traces = db.relationship('WeightTrace', backref='ticket', lazy=True, cascade='all, delete-orphan',
+                             order_by='WeightTrace.id')
+
+    __table_args__ = (
+        # Customer history by date range (get_customer_tickets)
+        db.Index('ix_weight_ticket_customer_created', 'customer_id', 'created_at'),
+        # Date-range listings and exports across all customers
+        db.Index('ix_weight_ticket_created', 'created_at'),
+        # Keyset pages of open/closed tickets
+        db.Index('ix_weight_ticket_status_id', 'status', 'id'),
+        # "Does this card have an open ticket?" only ever looks at open rows
+        db.Index('ix_weight_ticket_open_customer', 'customer_id', sqlite_where=db.text("status = 'open'")),
+        # Per-lane listings (?lane=)
+        db.Index('ix_weight_ticket_lane_status_id', 'lane', 'status', 'id'),
+    )
 
     def close_ticket(self, tare_weight):
         self.tare_weight = tare_weight
         self.net_weight = self.gross_weight - self.tare_weight
         self.status = 'closed'
-        self.closed_at = datetime.utcnow()
\ No newline at end of file
+        self.closed_at = datetime.utcnow()
+
+    def to_dict(self, include_customer=False):
+        data = {
+            'id': self.id,
+            'gross_weight': self.gross_weight,
+            'tare_weight': self.tare_weight,
+            'net_weight': self.net_weight,
+            'status': self.status,
+            'lane': self.lane,
+            'created_at': self.created_at.isoformat(),
+            'closed_at': self.closed_at.isoformat() if self.closed_at else None
+        }
+        if include_customer:
+            data['customer_id'] = self.customer_id
+            data['customer_name'] = self.customer.name
+            data['rfid_card'] = self.customer.rfid_card
+        return data
+
+class DailyTonnage(db.Model):
+    # Closed tickets rolled up per customer and day (UTC date of closed_at); maintained by reports.py
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    ticket_count = db.Column(db.Integer, nullable=False, default=0)
+    net_total = db.Column(db.Float, nullable=False, default=0.0)
+    net_min = db.Column(db.Float)
+    net_max = db.Column(db.Float)
+
+    __table_args__ = (
+        db.Index('ix_daily_tonnage_day', 'day'),
+    )
+
+class WeightTrace(db.Model):
+    # Scale readings around one weighing, delta-encoded and compressed by weight_trace.py
+    id = db.Column(db.Integer, primary_key=True)
+    ticket_id = db.Column(db.Integer, db.ForeignKey('weight_ticket.id'), nullable=False, index=True)
+    phase = db.Column(db.String(10), nullable=False)  # 'gross' or 'tare'
+    lane = db.Column(db.String(50))
+    started_at = db.Column(db.DateTime)
+    sample_count = db.Column(db.Integer, nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'ticket_id': self.ticket_id,
+            'phase': self.phase,
+            'lane': self.lane,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'sample_count': self.sample_count,
+            'size_bytes': len(self.data)
+        }
+
+class SyncOutbox(db.Model):
+    # Changes waiting to be shipped to head office by sync.py; rows are deleted once acknowledged
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)  # 'ticket' or 'customer'
+    entity_id = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(10), nullable=False)  # 'upsert' or 'delete'
+    payload = db.Column(db.Text)  # JSON row for upserts
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # AUTOINCREMENT: ids are never reused after acknowledged rows are deleted,
+    # so (site, id) identifies a change for good
+    __table_args__ = {'sqlite_autoincrement': True}
+
+class PrintJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # 'ticket' or 'label'
+    title = db.Column(db.String(100), nullable=False)
+    dedupe_key = db.Column(db.String(100), index=True)
+    payload = db.Column(db.LargeBinary, nullable=False)  # Raw ESC/POS bytes
+    options = db.Column(db.Text)  # JSON-encoded CUPS options
+    printer = db.Column(db.String(100))  # CUPS queue; None is the default printer
+    status = db.Column(db.String(20), default='queued', index=True)  # 'queued', 'printing', 'done' or 'failed'
+    attempts = db.Column(db.Integer, default=0)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'title': self.title,
+            'printer': self.printer,
+            'status': self.status,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
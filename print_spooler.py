@@ -0,0 +1,176 @@
+import json
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+import metrics
+from models import db, PrintJob
+
+# Retry delays grow as BASE_RETRY_DELAY * 2^attempt, capped at MAX_RETRY_DELAY
+BASE_RETRY_DELAY = 2.0
+MAX_RETRY_DELAY = 300.0
+MAX_ATTEMPTS = 8
+# How often the worker looks for due jobs when nothing wakes it
+IDLE_POLL_INTERVAL = 5.0
+
+
+class PrintSpooler:
+    """Durable print queue drained by a single background worker.
+
+    Jobs are rows in the print_job table, so receipts survive a restart or
+    an offline printer. Requests only enqueue; the worker hands the raw
+    ESC/POS bytes to CUPS and retries failures with exponential backoff.
+    ``printers`` maps CUPS queue names to the other printers jobs may name
+    (one per lane); jobs without one go to ``printer``.
+    """
+
+    def __init__(self, app, printer, max_attempts=MAX_ATTEMPTS, notify=None, printers=None):
+        self.app = app
+        self.printer = printer
+        self.printers = dict(printers or {})
+        self.max_attempts = max_attempts
+        # Called on wake() when the worker runs in another process (the hardware broker)
+        self.notify = notify
+        self.running = False
+        self.thread = None
+        self.wakeup = threading.Event()
+
+    def enqueue(self, data, title, options, kind, dedupe_key=None, commit=True, printer=None):
+        # Reuse a job for the same document that has not printed yet (double clicks).
+        # Finished jobs never match: pressing Print again after a jam must print again.
+        if dedupe_key:
+            existing = PrintJob.query.filter(
+                PrintJob.dedupe_key == dedupe_key,
+                PrintJob.status.in_(['queued', 'printing'])
+            ).order_by(PrintJob.id.desc()).first()
+            if existing:
+                return existing
+
+        job = PrintJob(kind=kind, title=title, dedupe_key=dedupe_key, payload=data,
+                       options=json.dumps(options), printer=printer, status='queued')
+        db.session.add(job)
+        if commit:
+            db.session.commit()
+            self.wake()
+        return job
+
+    def submit_ticket(self, ticket_data, commit=True, printer=None):
+        data, title, options = self.printer.build_ticket(ticket_data)
+        return self.enqueue(data, title, options, 'ticket', f"ticket:{ticket_data['id']}", commit, printer)
+
+    def submit_customer_label(self, customer_data, commit=True, printer=None):
+        data, title, options = self.printer.build_customer_label(customer_data)
+        return self.enqueue(data, title, options, 'label', f"label:{customer_data['id']}", commit, printer)
+
+    def printer_for(self, job):
+        # Jobs naming a printer that is no longer configured fall back to the default
+        return self.printers.get(job.printer, self.printer) if job.printer else self.printer
+
+    def retry(self, job):
+        job.status = 'queued'
+        job.attempts = 0
+        job.next_attempt_at = datetime.utcnow()
+        db.session.commit()
+        self.wake()
+
+    def wake(self):
+        self.wakeup.set()
+        if self.notify:
+            try:
+                self.notify()
+            except Exception as e:
+                # The worker still finds the job on its next idle poll
+                print(f"Could not wake print spooler: {e}")
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='print-spooler')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wake()
+        if self.thread:
+            self.thread.join(timeout=10)
+
+    def health(self):
+        # Queue depth and the age of the oldest waiting job (needs an app context)
+        counts = dict(db.session.query(PrintJob.status, db.func.count()).filter(
+            PrintJob.status.in_(['queued', 'printing', 'failed'])).group_by(PrintJob.status).all())
+        oldest = db.session.query(db.func.min(PrintJob.created_at)).filter(PrintJob.status == 'queued').scalar()
+        oldest_age = (datetime.utcnow() - oldest).total_seconds() if oldest else None
+        return {
+            'ok': self.running and (oldest_age is None or oldest_age < MAX_RETRY_DELAY),
+            'running': self.running,
+            'queued': counts.get('queued', 0),
+            'printing': counts.get('printing', 0),
+            'failed': counts.get('failed', 0),
+            'oldest_queued_seconds': round(oldest_age, 1) if oldest_age is not None else None,
+        }
+
+    def _run(self):
+        with self.app.app_context():
+            # Jobs left 'printing' by a crash are retried
+            PrintJob.query.filter_by(status='printing').update({'status': 'queued'})
+            db.session.commit()
+            while self.running:
+                try:
+                    job = self._next_due_job()
+                    if job is None:
+                        self.wakeup.wait(self._idle_timeout())
+                        self.wakeup.clear()
+                        continue
+                    self._process(job)
+                except Exception as e:
+                    print(f"Error in print spooler: {e}")
+                    traceback.print_exc()
+                    db.session.rollback()
+                    self.wakeup.wait(IDLE_POLL_INTERVAL)
+                finally:
+                    db.session.remove()
+
+    def _next_due_job(self):
+        return PrintJob.query.filter(
+            PrintJob.status == 'queued',
+            PrintJob.next_attempt_at <= datetime.utcnow()
+        ).order_by(PrintJob.next_attempt_at, PrintJob.id).first()
+
+    def _idle_timeout(self):
+        upcoming = db.session.query(db.func.min(PrintJob.next_attempt_at)).filter(
+            PrintJob.status == 'queued').scalar()
+        if upcoming is None:
+            return IDLE_POLL_INTERVAL
+        return min(max((upcoming - datetime.utcnow()).total_seconds(), 0.05), IDLE_POLL_INTERVAL)
+
+    def _process(self, job):
+        job.status = 'printing'
+        job.attempts = (job.attempts or 0) + 1
+        db.session.commit()
+        started = time.perf_counter()
+        try:
+            self.printer_for(job).send_raw(job.payload, job.title, json.loads(job.options or '{}'))
+        except Exception as e:
+            metrics.PRINT_SEND_SECONDS.observe(time.perf_counter() - started, 'error')
+            metrics.PRINT_JOBS.inc(job.kind, 'error')
+            print(f"Error printing {job.title} (attempt {job.attempts}): {e}")
+            job.last_error = str(e)
+            if job.attempts >= self.max_attempts:
+                job.status = 'failed'
+                job.finished_at = datetime.utcnow()
+            else:
+                delay = min(BASE_RETRY_DELAY * (2 ** (job.attempts - 1)), MAX_RETRY_DELAY)
+                job.status = 'queued'
+                job.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+            db.session.commit()
+            return
+        metrics.PRINT_SEND_SECONDS.observe(time.perf_counter() - started, 'ok')
+        metrics.PRINT_JOBS.inc(job.kind, 'ok')
+        job.status = 'done'
+        job.last_error = None
+        job.finished_at = datetime.utcnow()
+        metrics.PRINT_QUEUE_SECONDS.observe((job.finished_at - job.created_at).total_seconds(), job.kind)
+        db.session.commit()
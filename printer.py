@@ -1,7 +1,8 @@
 import cups
 from datetime import datetime
-import tempfile
 import os
+import threading
+import time
 
 # ESC/POS Command Constants
 ESC = b'\x1B'
@@ -29,121 +30,231 @@ FEED_LINES = lambda n: ESC + b'd' + bytes([n])
 # Code Page Selection (PC864 Arabic = 28 = 0x1C)
 CODE_PAGE_PC864 = ESC + b't\x1C'
 
+# CUPS document format for data that must reach the printer untouched
+RAW_FORMAT = 'application/vnd.cups-raw'
+# IPP printer-state values
+PRINTER_STATES = {3: 'idle', 4: 'processing', 5: 'stopped'}
+# How often the background monitor re-checks a connected printer
+MONITOR_INTERVAL = 15.0
+
+class FakeCupsConnection:
+    """In-memory stand-in for cups.Connection, for running without a printer.
+
+    Jobs are kept in ``jobs`` and, when ``output_dir`` is set, also written
+    there as .bin files. ``fail_next`` makes the next N jobs raise, and
+    ``delay`` adds seconds per job to mimic a slow printer.
+    """
+
+    def __init__(self, output_dir=None, fail_next=0, delay=0.0):
+        self.output_dir = output_dir
+        self.fail_next = fail_next
+        self.delay = delay
+        self.jobs = []
+        self._open_job = None
+
+    def createJob(self, printer, title, options):
+        if self.fail_next > 0:
+            self.fail_next -= 1
+            raise RuntimeError(f"Printer {printer} is offline")
+        self._open_job = {'id': len(self.jobs) + 1, 'printer': printer, 'title': title,
+                          'options': dict(options), 'data': bytearray()}
+        return self._open_job['id']
+
+    def startDocument(self, printer, job_id, doc_name, format, last_document):
+        pass
+
+    def writeRequestData(self, buffer, length):
+        self._open_job['data'].extend(buffer[:length])
+
+    def finishDocument(self, printer):
+        if self.delay:
+            time.sleep(self.delay)
+        job, self._open_job = self._open_job, None
+        job['data'] = bytes(job['data'])
+        self.jobs.append(job)
+        if self.output_dir:
+            os.makedirs(self.output_dir, exist_ok=True)
+            with open(os.path.join(self.output_dir, f"job-{job['id']}.bin"), 'wb') as f:
+                f.write(job['data'])
+
 class TicketPrinter:
-    def __init__(self, printer_name="EndustryPrinter"):
+    def __init__(self, printer_name="EndustryPrinter", connection=None):
         self.printer_name = printer_name
-        self.conn = cups.Connection()
+        # Opened on first use (or by the monitor): processes that only build
+        # receipts never talk to CUPS, and a CUPS that is still booting does
+        # not stop the app from starting
+        self._conn = connection
+        self._owns_conn = connection is None
+        # pycups connections are not thread-safe; one exchange at a time
+        self.lock = threading.RLock()
+        self.state = None
+        self.last_error = None
+        self.running = False
+        self.thread = None
         # Define default encoding based on printer spec
         self.encoding = 'cp864' 
 
-    def _print_raw(self, data_bytes, job_title, options):
-        try:
-            with tempfile.NamedTemporaryFile(mode='wb', delete=False) as f:
-                f.write(data_bytes)
-                temp_path = f.name
-            
-            print(f"Printing {job_title} to {self.printer_name} with options: {options}")
-            print(f"Raw data (first 100 bytes): {data_bytes[:100]}") # Debug: Show data being sent
-            
-            self.conn.printFile(self.printer_name, temp_path, job_title, options)
-            os.unlink(temp_path)
-            print(f"{job_title} sent to printer.")
-        except Exception as e:
-            print(f"Error printing {job_title}: {e}")
-            # Log the full exception for debugging
-            import traceback
-            traceback.print_exc()
-            raise e # Re-raise the exception
-
-    def print_ticket(self, ticket_data):
-        try:
-            content = bytearray()
-            # Initialize, set code page
-            content.extend(INIT_PRINTER)
-            content.extend(CODE_PAGE_PC864)
-            
-            # Header
-            content.extend(ALIGN_CENTER)
-            content.extend(TXT_2HEIGHT + TXT_2WIDTH + TXT_BOLD)
-            content.extend(b"WEIGHT TICKET" + LF)
-            content.extend(TXT_2HEIGHT + TXT_BOLD)
-            content.extend(f"Ticket #{ticket_data['id']}".encode(self.encoding, 'ignore') + LF)
-            
-            # Info
-            content.extend(TXT_NORMAL + TXT_BOLD)
-            content.extend(ALIGN_LEFT)
-            content.extend(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}".encode(self.encoding, 'ignore') + LF)
-            content.extend(f"Customer: {ticket_data['customer_name']}".encode(self.encoding, 'ignore') + LF)
-            content.extend(b"-" * 32 + LF) # Adjust width as needed
-            
-            # Weights
-            content.extend(TXT_2HEIGHT + TXT_BOLD) # Make weights prominent
-            content.extend(f"Gross: {ticket_data['gross_weight']:.2f} kg".encode(self.encoding, 'ignore') + LF)
-            content.extend(f"Tare:  {ticket_data['tare_weight']:.2f} kg".encode(self.encoding, 'ignore') + LF)
-            content.extend(f"Net:   {ticket_data['net_weight']:.2f} kg".encode(self.encoding, 'ignore') + LF)
-            
-            # Footer
-            content.extend(TXT_NORMAL + TXT_BOLD)
-            content.extend(b"-" * 32 + LF) # Adjust width as needed
-            content.extend(ALIGN_CENTER)
-            content.extend(b"Thank you!" + LF + LF)
-            
-            # Feed and Cut
-            content.extend(FEED_LINES(5))
-            content.extend(PAPER_FULL_CUT) # Use full cut for receipts
-
-            # CUPS options for raw ESC/POS receipt printing (continuous paper)
-            options = {
-                'raw': 'True',
-                # Avoid specifying media for continuous paper unless necessary
-                # 'media': '...', 
-                'page-left': '0',
-                'page-right': '0',
-                'page-top': '0',
-                'page-bottom': '0',
-            }
-            self._print_raw(bytes(content), f"Weight Ticket #{ticket_data['id']}", options)
-            
-        except Exception as e:
-            # Error already printed in _print_raw, just log context
-            print(f"Failed to generate ticket data for ticket ID {ticket_data.get('id', 'N/A')}")
-            # Do not raise again if already handled in _print_raw
-
-    def print_customer_label(self, customer_data):
-        try:
-            content = bytearray()
-            # Initialize, set code page
-            content.extend(INIT_PRINTER)
-            content.extend(CODE_PAGE_PC864)
-            
-            # Assuming ESC/POS commands for label format
-            # Adjust commands based on desired label appearance
-            content.extend(ALIGN_CENTER)
-            content.extend(TXT_2HEIGHT + TXT_2WIDTH + TXT_BOLD)
-            content.extend(customer_data['name'].encode(self.encoding, 'ignore') + LF)
-            
-            content.extend(TXT_NORMAL + TXT_BOLD) # Reset to smaller bold font
-            content.extend(ALIGN_LEFT)
-            content.extend(f"ID: {customer_data['id']}".encode(self.encoding, 'ignore') + LF)
-            content.extend(f"Card: {customer_data['rfid_card']}".encode(self.encoding, 'ignore') + LF)
-            
-            # Feed to space out before cut (adjust as needed for label size)
-            content.extend(FEED_LINES(3)) 
-            # Use cut command appropriate for labels (might be same as receipt)
-            content.extend(PAPER_FULL_CUT_FEED) # Cut and feed might position next label
-
-            # CUPS options for raw ESC/POS label printing
-            options = {
-                'raw': 'True',
-                'media': 'custom_3x2in_3x2in', # Specify label size
-                'page-left': '0',
-                'page-right': '0',
-                'page-top': '0',
-                'page-bottom': '0',
-            }
-            self._print_raw(bytes(content), f"Customer Label {customer_data['id']}", options)
-
-        except Exception as e:
-            # Error already printed in _print_raw, just log context
-            print(f"Failed to generate label data for customer ID {customer_data.get('id', 'N/A')}")
-            # Do not raise again if already handled in _print_raw
\ No newline at end of file
+    @property
+    def conn(self):
+        with self.lock:
+            if self._conn is None:
+                self._conn = cups.Connection()
+            return self._conn
+
+    def reset(self):
+        # Drop a connection CUPS may have closed; the next use reconnects
+        if self._owns_conn:
+            with self.lock:
+                self._conn = None
+
+    def start(self):
+        # Connect and watch the printer in the background, reconnecting with backoff
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._monitor, name='printer-monitor')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=1)
+
+    def _monitor(self):
+        backoff = 1.0
+        while self.running:
+            try:
+                self.refresh_state()
+                backoff = 1.0
+                delay = MONITOR_INTERVAL
+            except Exception as e:
+                self.last_error = str(e)
+                self.state = None
+                self.reset()
+                delay = backoff
+                backoff = min(backoff * 2, 30.0)
+            deadline = time.monotonic() + delay
+            while self.running and time.monotonic() < deadline:
+                time.sleep(0.2)
+
+    def refresh_state(self):
+        with self.lock:
+            conn = self.conn
+            if hasattr(conn, 'getPrinterAttributes'):
+                attributes = conn.getPrinterAttributes(self.printer_name,
+                                                       requested_attributes=['printer-state', 'printer-state-message'])
+                self.state = PRINTER_STATES.get(attributes.get('printer-state'), 'unknown')
+            else:
+                self.state = 'idle'  # In-memory stand-in
+            self.last_error = None
+
+    def health(self):
+        return {
+            'ok': self._conn is not None and self.state in ('idle', 'processing'),
+            'printer': self.printer_name,
+            'connected': self._conn is not None,
+            'state': self.state,
+            'error': self.last_error,
+        }
+
+    def send_raw(self, data_bytes, job_title, options):
+        # Stream the bytes to CUPS from memory; raises on failure so the
+        # spooler can retry
+        with self.lock:
+            try:
+                conn = self.conn
+                job_id = conn.createJob(self.printer_name, job_title, options)
+                conn.startDocument(self.printer_name, job_id, job_title, RAW_FORMAT, 1)
+                conn.writeRequestData(data_bytes, len(data_bytes))
+                conn.finishDocument(self.printer_name)
+            except Exception as e:
+                self.last_error = str(e)
+                self.reset()
+                raise
+            self.last_error = None
+        print(f"{job_title} sent to {self.printer_name} (job {job_id}).")
+        return job_id
+
+    def build_ticket(self, ticket_data):
+        # Returns (data, title, options) for a weight ticket receipt
+        content = bytearray()
+        # Initialize, set code page
+        content.extend(INIT_PRINTER)
+        content.extend(CODE_PAGE_PC864)
+        
+        # Header
+        content.extend(ALIGN_CENTER)
+        content.extend(TXT_2HEIGHT + TXT_2WIDTH + TXT_BOLD)
+        content.extend(b"WEIGHT TICKET" + LF)
+        content.extend(TXT_2HEIGHT + TXT_BOLD)
+        content.extend(f"Ticket #{ticket_data['id']}".encode(self.encoding, 'ignore') + LF)
+        
+        # Info
+        content.extend(TXT_NORMAL + TXT_BOLD)
+        content.extend(ALIGN_LEFT)
+        content.extend(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}".encode(self.encoding, 'ignore') + LF)
+        content.extend(f"Customer: {ticket_data['customer_name']}".encode(self.encoding, 'ignore') + LF)
+        content.extend(b"-" * 32 + LF) # Adjust width as needed
+        
+        # Weights
+        content.extend(TXT_2HEIGHT + TXT_BOLD) # Make weights prominent
+        content.extend(f"Gross: {ticket_data['gross_weight']:.2f} kg".encode(self.encoding, 'ignore') + LF)
+        content.extend(f"Tare:  {ticket_data['tare_weight']:.2f} kg".encode(self.encoding, 'ignore') + LF)
+        content.extend(f"Net:   {ticket_data['net_weight']:.2f} kg".encode(self.encoding, 'ignore') + LF)
+        
+        # Footer
+        content.extend(TXT_NORMAL + TXT_BOLD)
+        content.extend(b"-" * 32 + LF) # Adjust width as needed
+        content.extend(ALIGN_CENTER)
+        content.extend(b"Thank you!" + LF + LF)
+        
+        # Feed and Cut
+        content.extend(FEED_LINES(5))
+        content.extend(PAPER_FULL_CUT) # Use full cut for receipts
+
+        # CUPS options for raw ESC/POS receipt printing (continuous paper)
+        options = {
+            'raw': 'True',
+            # Avoid specifying media for continuous paper unless necessary
+            # 'media': '...', 
+            'page-left': '0',
+            'page-right': '0',
+            'page-top': '0',
+            'page-bottom': '0',
+        }
+        return bytes(content), f"Weight Ticket #{ticket_data['id']}", options
+
+    def build_customer_label(self, customer_data):
+        # Returns (data, title, options) for a customer card label
+        content = bytearray()
+        # Initialize, set code page
+        content.extend(INIT_PRINTER)
+        content.extend(CODE_PAGE_PC864)
+        
+        # Assuming ESC/POS commands for label format
+        # Adjust commands based on desired label appearance
+        content.extend(ALIGN_CENTER)
+        content.extend(TXT_2HEIGHT + TXT_2WIDTH + TXT_BOLD)
+        content.extend(customer_data['name'].encode(self.encoding, 'ignore') + LF)
+        
+        content.extend(TXT_NORMAL + TXT_BOLD) # Reset to smaller bold font
+        content.extend(ALIGN_LEFT)
+        content.extend(f"ID: {customer_data['id']}".encode(self.encoding, 'ignore') + LF)
+        content.extend(f"Card: {customer_data['rfid_card']}".encode(self.encoding, 'ignore') + LF)
+        
+        # Feed to space out before cut (adjust as needed for label size)
+        content.extend(FEED_LINES(3)) 
+        # Use cut command appropriate for labels (might be same as receipt)
+        content.extend(PAPER_FULL_CUT_FEED) # Cut and feed might position next label
+
+        # CUPS options for raw ESC/POS label printing
+        options = {
+            'raw': 'True',
+            'media': 'custom_3x2in_3x2in', # Specify label size
+            'page-left': '0',
+            'page-right': '0',
+            'page-top': '0',
+            'page-bottom': '0',
+        }
+        return bytes(content), f"Customer Label {customer_data['id']}", options
@@ -0,0 +1,165 @@
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import event, inspect, func, delete, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, Customer, WeightTicket, DailyTonnage
+
+# Changes to these on a closed ticket move weight between rollup rows
+ROLLUP_ATTRS = ('status', 'customer_id', 'net_weight', 'closed_at')
+
+rollups = DailyTonnage.__table__
+tickets = WeightTicket.__table__
+
+
+def previous_value(state, attr):
+    # Value as of the last flush, whether or not it changed since
+    history = state.attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return None
+
+
+def _collect(session):
+    # (customer_id, day) -> net weight to add; keys that need a recount
+    deltas = []
+    recount = set()
+    for ticket in session.new:
+        if isinstance(ticket, WeightTicket) and ticket.status == 'closed' and ticket.closed_at:
+            deltas.append((ticket.customer_id, ticket.closed_at.date(), ticket.net_weight or 0.0))
+
+    for ticket in session.dirty:
+        if not isinstance(ticket, WeightTicket):
+            continue
+        state = inspect(ticket)
+        changed = [attr for attr in ROLLUP_ATTRS if state.attrs[attr].history.has_changes()]
+        if not changed:
+            continue
+        was_closed = previous_value(state, 'status') == 'closed'
+        if not was_closed:
+            # The common case: a ticket being closed only adds to one row
+            if ticket.status == 'closed' and ticket.closed_at:
+                deltas.append((ticket.customer_id, ticket.closed_at.date(), ticket.net_weight or 0.0))
+            continue
+        # Editing or reopening a closed ticket can lower a min/max; recount both rows
+        old_closed_at = previous_value(state, 'closed_at')
+        if old_closed_at:
+            recount.add((previous_value(state, 'customer_id'), old_closed_at.date()))
+        if ticket.status == 'closed' and ticket.closed_at:
+            recount.add((ticket.customer_id, ticket.closed_at.date()))
+
+    for ticket in session.deleted:
+        if not isinstance(ticket, WeightTicket):
+            continue
+        state = inspect(ticket)
+        closed_at = previous_value(state, 'closed_at')
+        if previous_value(state, 'status') == 'closed' and closed_at:
+            recount.add((previous_value(state, 'customer_id'), closed_at.date()))
+    return deltas, recount
+
+
+def _add(conn, customer_id, day, net_weight):
+    stmt = sqlite_insert(rollups).values(customer_id=customer_id, day=day, ticket_count=1,
+                                         net_total=net_weight, net_min=net_weight, net_max=net_weight)
+    conn.execute(stmt.on_conflict_do_update(
+        index_elements=[rollups.c.customer_id, rollups.c.day],
+        set_={
+            'ticket_count': rollups.c.ticket_count + 1,
+            'net_total': rollups.c.net_total + stmt.excluded.net_total,
+            'net_min': func.min(func.coalesce(rollups.c.net_min, stmt.excluded.net_min), stmt.excluded.net_min),
+            'net_max': func.max(func.coalesce(rollups.c.net_max, stmt.excluded.net_max), stmt.excluded.net_max),
+        }
+    ))
+
+
+def _aggregate(day_column):
+    return select(
+        tickets.c.customer_id,
+        day_column,
+        func.count(),
+        func.coalesce(func.sum(tickets.c.net_weight), 0.0),
+        func.min(tickets.c.net_weight),
+        func.max(tickets.c.net_weight),
+    ).where(tickets.c.status == 'closed', tickets.c.closed_at.isnot(None))
+
+
+def _recount(conn, customer_id, day):
+    start = datetime.combine(day, time.min)
+    conn.execute(delete(rollups).where(rollups.c.customer_id == customer_id, rollups.c.day == day))
+    source = _aggregate(func.date(tickets.c.closed_at)).where(
+        tickets.c.customer_id == customer_id,
+        tickets.c.closed_at >= start,
+        tickets.c.closed_at < start + timedelta(days=1)
+    ).group_by(tickets.c.customer_id).having(func.count() > 0)
+    conn.execute(insert(rollups).from_select(
+        ['customer_id', 'day', 'ticket_count', 'net_total', 'net_min', 'net_max'], source))
+
+
+def _update_rollups(session, flush_context):
+    deltas, recount = _collect(session)
+    if not deltas and not recount:
+        return
+    # Runs on the flush's connection, so rollups commit or roll back with the tickets
+    conn = session.connection()
+    for customer_id, day, net_weight in deltas:
+        if (customer_id, day) not in recount:
+            _add(conn, customer_id, day, net_weight)
+    for customer_id, day in recount:
+        _recount(conn, customer_id, day)
+
+
+def track_rollups(session=None):
+    event.listen(session or db.session, 'after_flush', _update_rollups)
+
+
+def rebuild_rollups(conn):
+    # Recompute every rollup row from the ticket table
+    conn.execute(delete(rollups))
+    source = _aggregate(func.date(tickets.c.closed_at)) \
+        .group_by(tickets.c.customer_id, func.date(tickets.c.closed_at))
+    conn.execute(insert(rollups).from_select(
+        ['customer_id', 'day', 'ticket_count', 'net_total', 'net_min', 'net_max'], source))
+    return conn.execute(select(func.count()).select_from(rollups)).scalar()
+
+
+def summary(from_date=None, to_date=None, customer_id=None, group_by=None):
+    """Totals for closed tickets between two dates, read from the rollup table only."""
+    filters = []
+    if from_date:
+        filters.append(DailyTonnage.day >= from_date)
+    if to_date:
+        filters.append(DailyTonnage.day <= to_date)
+    if customer_id:
+        filters.append(DailyTonnage.customer_id == customer_id)
+
+    def totals(*columns):
+        return db.session.query(
+            *columns,
+            func.coalesce(func.sum(DailyTonnage.ticket_count), 0),
+            func.coalesce(func.sum(DailyTonnage.net_total), 0.0),
+            func.min(DailyTonnage.net_min),
+            func.max(DailyTonnage.net_max),
+        ).filter(*filters)
+
+    def as_dict(count, total, low, high):
+        return {'ticket_count': count, 'net_total': total, 'net_min': low, 'net_max': high}
+
+    result = {
+        'from': from_date.isoformat() if from_date else None,
+        'to': to_date.isoformat() if to_date else None,
+        'customer_id': customer_id,
+        'totals': as_dict(*totals().one()),
+    }
+    if group_by == 'customer':
+        rows = totals(DailyTonnage.customer_id, Customer.name) \
+            .join(Customer, Customer.id == DailyTonnage.customer_id) \
+            .group_by(DailyTonnage.customer_id, Customer.name) \
+            .order_by(func.sum(DailyTonnage.net_total).desc()).all()
+        result['customers'] = [dict(customer_id=row[0], customer_name=row[1], **as_dict(*row[2:]))
+                               for row in rows]
+    elif group_by == 'day':
+        rows = totals(DailyTonnage.day).group_by(DailyTonnage.day).order_by(DailyTonnage.day).all()
+        result['days'] = [dict(day=row[0].isoformat(), **as_dict(*row[1:])) for row in rows]
+    return result
@@ -0,0 +1,86 @@
+import collections
+import threading
+import time
+
+# Scans kept in memory for clients catching up
+DEFAULT_LOG_SIZE = 256
+# The same card read again within this many seconds is treated as one tap
+DEFAULT_DEBOUNCE = 2.0
+# Scans older than this are history, not a tap to act on: cursorless reads
+# ignore them and /api/weighings refuses them
+MAX_SCAN_AGE = 10.0
+
+
+class ScanLog:
+    """Bounded, sequenced log of card reads that any number of clients can follow.
+
+    Every accepted scan gets a monotonically increasing ``seq``; readers keep
+    their own cursor and ask for "events since N", so a scan is never
+    consumed by whichever client happens to poll first.
+    """
+
+    def __init__(self, size=DEFAULT_LOG_SIZE, debounce=DEFAULT_DEBOUNCE):
+        self.debounce = debounce
+        self.events = collections.deque(maxlen=size)
+        self.cond = threading.Condition()
+        self.last_seq = 0
+        self._last_seen = {}
+
+    def publish(self, card_id):
+        now = time.monotonic()
+        with self.cond:
+            last = self._last_seen.get(card_id)
+            self._last_seen[card_id] = now
+            if last is not None and now - last < self.debounce:
+                return None
+            # Keep the debounce table from growing without bound
+            if len(self._last_seen) > self.events.maxlen:
+                cutoff = now - self.debounce
+                self._last_seen = {card: seen for card, seen in self._last_seen.items() if seen >= cutoff}
+            self.last_seq += 1
+            event = {'seq': self.last_seq, 'card_id': card_id, 'timestamp': time.time()}
+            self.events.append(event)
+            self.cond.notify_all()
+            return event
+
+    def oldest_seq(self):
+        with self.cond:
+            return self.events[0]['seq'] if self.events else self.last_seq + 1
+
+    def since(self, seq, limit=None):
+        with self.cond:
+            return self._since(seq, limit)
+
+    def _since(self, seq, limit):
+        if seq > self.last_seq:
+            # Cursor from before a restart; the log starts over at 1
+            seq = 0
+        if seq == self.last_seq:
+            return []
+        # Sequences are contiguous, so the tail can be sliced without a scan
+        count = min(self.last_seq - seq, len(self.events))
+        result = list(self.events)[-count:]
+        if limit is not None:
+            result = result[:limit]
+        return result
+
+    def latest(self, max_age=MAX_SCAN_AGE):
+        """Newest scan if it is at most max_age seconds old, else None.
+
+        For clients without a cursor (the old /api/rfid/read). Nothing is
+        consumed, so every such client sees the tap; they dedupe by ``seq``.
+        """
+        with self.cond:
+            if self.events and self.events[-1]['timestamp'] >= time.time() - max_age:
+                return self.events[-1]
+            return None
+
+    def wait(self, seq, timeout, limit=None):
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while True:
+                events = self._since(seq, limit)
+                remaining = deadline - time.monotonic()
+                if events or remaining <= 0:
+                    return events
+                self.cond.wait(remaining)
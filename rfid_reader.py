@@ -1,60 +1,262 @@
 import evdev
-from evdev import InputDevice, categorize, ecodes
+from evdev import ecodes
+import collections
+import os
+import selectors
 import threading
 import time
 
+try:
+    import pyudev
+except ImportError:  # Hot-plug falls back to periodic rescans
+    pyudev = None
+
+# Keycode -> digit, built once instead of looking up key names per event
+KEY_DIGITS = {getattr(ecodes, f'KEY_{d}'): str(d) for d in range(10)}
+KEY_DIGITS.update({getattr(ecodes, f'KEY_KP{d}'): str(d) for d in range(10)})
+ENTER_KEYS = frozenset([ecodes.KEY_ENTER, ecodes.KEY_KPENTER])
+# Without udev, look for newly attached readers this often
+RESCAN_INTERVAL = 5.0
+
+
+def is_rfid_device(device):
+    return "RFID" in device.name.upper()
+
+
 class RFIDReader:
-    def __init__(self):
-        self.device = None
+    """Reads any number of keyboard-emulating RFID readers on one selector loop.
+
+    Readers are grabbed exclusively so scans never reach the kiosk's focused
+    window. Devices that appear later are picked up through udev (or a cheap
+    rescan of new /dev/input nodes when pyudev is not installed), and a
+    reader that is unplugged is simply dropped from the loop.
+    """
+
+    def __init__(self, match=is_rfid_device, grab=True, hotplug=True):
+        self.match = match
+        self.grab = grab
+        self.hotplug = hotplug
         self.callback = None
         self.running = False
         self.thread = None
-        self.find_reader()
+        self.selector = selectors.DefaultSelector()
+        self.devices = {}
+        self.buffers = {}
+        self.lock = threading.Lock()
+        self._pending = []
+        self._ignored_paths = set()
+        self._monitor = None
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_r, False)
+        self.selector.register(self._wakeup_r, selectors.EVENT_READ)
+
+    @property
+    def device(self):
+        # First attached reader, for callers that assume a single device
+        return next(iter(self.devices.values()), None)
+
+    def health(self):
+        devices = [{'name': device.name, 'path': device.path} for device in list(self.devices.values())]
+        return {
+            'ok': self.running and bool(devices),
+            'running': self.running,
+            'devices': devices,
+            'hotplug': 'udev' if self._monitor is not None else 'rescan',
+        }
 
     def find_reader(self):
-        devices = [evdev.InputDevice(path) for path in evdev.list_devices()]
-        for device in devices:
-            if "RFID" in device.name.upper():
-                self.device = device
-                break
+        # Only open nodes we have not seen; non-readers are closed right away
+        present = set(evdev.list_devices())
+        self._ignored_paths &= present
+        open_paths = {device.path for device in self.devices.values()}
+        for path in present - open_paths - self._ignored_paths:
+            self._open_path(path)
+
+    def add_device(self, device):
+        # Thread-safe: hand the device to the loop thread
+        with self.lock:
+            self._pending.append(device)
+        if self.running:
+            os.write(self._wakeup_w, b'\0')
+        else:
+            self._attach_pending()
 
     def start(self, callback):
-        if not self.device:
-            raise Exception("RFID Reader not found")
-        
+        # callback(card_id, device); the device tells lanes apart
         self.callback = callback
         self.running = True
-        self.thread = threading.Thread(target=self._read_loop)
+        self.thread = threading.Thread(target=self._read_loop, name='rfid-reader')
         self.thread.daemon = True
         self.thread.start()
 
     def stop(self):
         self.running = False
+        os.write(self._wakeup_w, b'\0')
         if self.thread:
-            self.thread.join()
+            self.thread.join(timeout=5)
+        for device in list(self.devices.values()):
+            self._remove_device(device)
+
+    def _open_path(self, path):
+        try:
+            device = evdev.InputDevice(path)
+        except OSError:
+            return
+        if self.match(device):
+            self._attach(device)
+        else:
+            self._ignored_paths.add(path)
+            device.close()
+
+    def _attach(self, device):
+        if self.grab:
+            try:
+                device.grab()
+            except OSError as e:
+                print(f"Could not grab RFID reader {device.path}: {e}")
+        fd = device.fileno()
+        self.devices[fd] = device
+        self.buffers[fd] = []
+        self.selector.register(fd, selectors.EVENT_READ, device)
+        print(f"RFID reader attached: {device.name} ({device.path})")
+
+    def _attach_pending(self):
+        with self.lock:
+            pending, self._pending = self._pending, []
+        for device in pending:
+            self._attach(device)
+
+    def _remove_device(self, device):
+        fd = device.fileno()
+        if fd in self.devices:
+            self.selector.unregister(fd)
+            del self.devices[fd]
+            del self.buffers[fd]
+        try:
+            device.close()
+        except OSError:
+            pass
+        print(f"RFID reader detached: {device.path}")
+
+    def _start_monitor(self):
+        if not self.hotplug or pyudev is None:
+            return
+        try:
+            context = pyudev.Context()
+            self._monitor = pyudev.Monitor.from_netlink(context)
+            self._monitor.filter_by('input')
+            self._monitor.start()
+            self.selector.register(self._monitor.fileno(), selectors.EVENT_READ)
+        except Exception as e:
+            print(f"udev monitor unavailable, falling back to rescans: {e}")
+            self._monitor = None
+
+    def _handle_udev(self):
+        for udev_device in iter(lambda: self._monitor.poll(0), None):
+            node = udev_device.device_node
+            if udev_device.action == 'add' and node and node.startswith('/dev/input/event'):
+                self._open_path(node)
+            # Removals surface as OSError on the next read
+
+    def _read_device(self, device):
+        try:
+            events = list(device.read())
+        except BlockingIOError:
+            return
+        except OSError:
+            self._remove_device(device)
+            return
+        buffer = self.buffers[device.fileno()]
+        for event in events:
+            if event.type != ecodes.EV_KEY or event.value != 1:  # Key down events only
+                continue
+            if event.code in ENTER_KEYS:
+                if buffer:
+                    card_id = ''.join(buffer)
+                    buffer.clear()
+                    if self.callback:
+                        try:
+                            self.callback(card_id, device)
+                        except Exception as e:
+                            print(f"Error handling RFID scan {card_id}: {e}")
+            else:
+                digit = KEY_DIGITS.get(event.code)
+                if digit is not None:
+                    buffer.append(digit)
 
     def _read_loop(self):
-        rfid_data = []
         try:
+            self._start_monitor()
+            self._attach_pending()
+            self.find_reader()
+            # Rescans stand in for udev, and only when hot-plug is on at all
+            rescan = self.hotplug and self._monitor is None
+            next_rescan = time.monotonic() + RESCAN_INTERVAL
             while self.running:
-                try:
-                    for event in self.device.read_loop():
-                        if event.type == ecodes.EV_KEY and event.value == 1:  # Key down events only
-                            if event.code == 28:  # Enter key
-                                if rfid_data:
-                                    card_id = ''.join(str(x) for x in rfid_data)
-                                    if self.callback:
-                                        self.callback(card_id)
-                                    rfid_data = []
-                            else:
-                                key_lookup = evdev.events.keys[event.code]
-                                try:
-                                    rfid_data.append(int(key_lookup[-1]))
-                                except ValueError:
-                                    pass
-                except OSError:
-                    # Device disconnected
-                    time.sleep(1)
+                timeout = max(0.0, next_rescan - time.monotonic()) if rescan else None
+                for key, _ in self.selector.select(timeout):
+                    # Compare fds: evdev devices do not compare equal to plain markers
+                    if key.fd == self._wakeup_r:
+                        os.read(self._wakeup_r, 64)
+                        self._attach_pending()
+                    elif self._monitor is not None and key.fd == self._monitor.fileno():
+                        self._handle_udev()
+                    else:
+                        self._read_device(key.data)
+                if rescan and time.monotonic() >= next_rescan:
                     self.find_reader()
+                    next_rescan = time.monotonic() + RESCAN_INTERVAL
         except Exception as e:
-            print(f"Error in RFID reader: {e}")
\ No newline at end of file
+            print(f"Error in RFID reader: {e}")
+
+
+InputEvent = collections.namedtuple('InputEvent', ['type', 'code', 'value'])
+
+
+class FakeInputDevice:
+    """Stand-in for evdev.InputDevice so scans can be injected without uinput."""
+
+    def __init__(self, name="Fake RFID Reader", path="/dev/input/fake0"):
+        self.name = name
+        self.path = path
+        self.grabbed = False
+        self.events = collections.deque()
+        self._r, self._w = os.pipe()
+        os.set_blocking(self._r, False)
+
+    def fileno(self):
+        return self._r
+
+    def grab(self):
+        self.grabbed = True
+
+    def ungrab(self):
+        self.grabbed = False
+
+    def inject(self, code, value=1, type=ecodes.EV_KEY):
+        self.events.append(InputEvent(type, code, value))
+        os.write(self._w, b'\0')
+
+    def send_card(self, card_id):
+        for digit in card_id:
+            code = getattr(ecodes, f'KEY_{digit}')
+            self.inject(code, 1)
+            self.inject(code, 0)
+        self.inject(ecodes.KEY_ENTER, 1)
+
+    def read(self):
+        try:
+            os.read(self._r, 4096)
+        except BlockingIOError:
+            pass
+        if not self.events:
+            raise BlockingIOError()
+        while self.events:
+            yield self.events.popleft()
+
+    def close(self):
+        for fd in (self._r, self._w):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
@@ -0,0 +1,293 @@
+import collections
+import math
+import os
+import random
+import re
+import threading
+import time
+
+# Samples kept in memory (~60 s at 10 Hz)
+DEFAULT_BUFFER_SIZE = 600
+# Stability: readings over the last STABLE_WINDOW seconds must stay within
+# STABLE_TOLERANCE kg of each other
+DEFAULT_STABLE_WINDOW = 1.5
+DEFAULT_STABLE_TOLERANCE = 10.0
+# A reading older than this is treated as "no reading" (cable pulled, etc.)
+DEFAULT_STALE_AFTER = 3.0
+
+# Indicator continuous output, e.g. "ST,GS,+0012345kg" or "US,NT,-  12.5 kg"
+FRAME_RE = re.compile(
+    rb'(?:(?P<state>ST|US|OL)\s*,\s*)?(?:(?:GS|NT|TR)\s*,\s*)?'
+    rb'(?P<sign>[+-])?\s*(?P<value>\d+(?:\.\d+)?)\s*(?P<unit>kg|lb|g|t)?',
+    re.IGNORECASE,
+)
+UNIT_TO_KG = {b'kg': 1.0, b'g': 0.001, b't': 1000.0, b'lb': 0.45359237}
+
+Sample = collections.namedtuple('Sample', ['timestamp', 'monotonic', 'weight', 'overload'])
+
+
+def parse_frame(line):
+    """Parse one indicator line into (weight_kg, overload), or None if unreadable."""
+    match = FRAME_RE.search(line)
+    if not match:
+        return None
+    weight = float(match.group('value'))
+    if match.group('sign') == b'-':
+        weight = -weight
+    unit = (match.group('unit') or b'kg').lower()
+    weight *= UNIT_TO_KG[unit]
+    overload = (match.group('state') or b'').upper() == b'OL'
+    return weight, overload
+
+
+class SerialTransport:
+    """Reads the indicator through pyserial.
+
+    ``url`` is anything ``serial.serial_for_url`` accepts: a device such as
+    ``/dev/ttyUSB0``, a pty slave such as ``/dev/pts/3`` or a TCP stand-in
+    such as ``socket://127.0.0.1:7000``.
+    """
+
+    def __init__(self, url, baudrate=9600, timeout=1.0):
+        self.url = url
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.port = None
+
+    def open(self):
+        import serial
+        self.port = serial.serial_for_url(self.url, baudrate=self.baudrate, timeout=self.timeout)
+
+    def readline(self):
+        return self.port.readline()
+
+    def close(self):
+        if self.port:
+            try:
+                self.port.close()
+            finally:
+                self.port = None
+
+    def describe(self):
+        return self.url
+
+
+class SimulatedTransport:
+    """Generates indicator frames in-process for development without a scale.
+
+    Cycles between an empty deck, a truck driving on (motion) and a settled
+    load, so stability detection is exercised the same way as on hardware.
+    """
+
+    def __init__(self, rate_hz=10.0, seed=None):
+        self.interval = 1.0 / rate_hz
+        self.random = random.Random(seed)
+        self._next_at = 0.0
+        self._target = 0.0
+        self._weight = 0.0
+        self._phase_until = 0.0
+
+    def open(self):
+        self._next_at = time.monotonic()
+
+    def readline(self):
+        now = time.monotonic()
+        if self._next_at > now:
+            time.sleep(self._next_at - now)
+        self._next_at += self.interval
+        if time.monotonic() >= self._phase_until:
+            self._target = self.random.choice([0.0, self.random.uniform(3000, 4500), self.random.uniform(8000, 20000)])
+            self._phase_until = time.monotonic() + self.random.uniform(8, 20)
+        # Approach the target, then settle with indicator noise
+        self._weight += (self._target - self._weight) * 0.25
+        reading = self._weight + self.random.gauss(0, 1.5)
+        state = 'ST' if abs(self._target - self._weight) < 5 else 'US'
+        return f"{state},GS,{reading:+09.1f}kg\r\n".encode('ascii')
+
+    def close(self):
+        pass
+
+    def describe(self):
+        return 'simulated'
+
+
+def make_transport(port, baudrate=9600):
+    if not port:
+        return SimulatedTransport()
+    return SerialTransport(port, baudrate=baudrate)
+
+
+class ScaleReader:
+    """Single background reader for the weighbridge indicator.
+
+    Parsed readings go into a fixed-size ring buffer; stability is evaluated
+    as samples arrive so HTTP handlers only ever read memory.
+    """
+
+    def __init__(self, transport, buffer_size=DEFAULT_BUFFER_SIZE,
+                 stable_window=DEFAULT_STABLE_WINDOW, stable_tolerance=DEFAULT_STABLE_TOLERANCE,
+                 stale_after=DEFAULT_STALE_AFTER):
+        self.transport = transport
+        self.stable_window = stable_window
+        self.stable_tolerance = stable_tolerance
+        self.stale_after = stale_after
+        self.samples = collections.deque(maxlen=buffer_size)
+        self.lock = threading.Lock()
+        self.stable_changed = threading.Condition(self.lock)
+        self.running = False
+        self.thread = None
+        self.connected = False
+        self.last_error = None
+        self._stable = False
+        self._last_stable = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._read_loop, name='scale-reader')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=5)
+        self.transport.close()
+
+    def add_sample(self, weight, overload=False, timestamp=None):
+        now = time.monotonic()
+        sample = Sample(timestamp if timestamp is not None else time.time(), now, weight, overload)
+        with self.lock:
+            self.samples.append(sample)
+            self._stable = self._evaluate_stability(now)
+            if self._stable:
+                self._last_stable = sample
+                self.stable_changed.notify_all()
+        return sample
+
+    def _evaluate_stability(self, now):
+        # Walk back from the newest sample until we leave the window
+        low = math.inf
+        high = -math.inf
+        oldest = None
+        for sample in reversed(self.samples):
+            if now - sample.monotonic > self.stable_window:
+                break
+            if sample.overload:
+                return False
+            low = min(low, sample.weight)
+            high = max(high, sample.weight)
+            oldest = sample
+        if oldest is None:
+            return False
+        # Need readings spanning most of the window, not just one frame
+        if now - oldest.monotonic < self.stable_window * 0.8:
+            return False
+        return high - low <= self.stable_tolerance
+
+    def latest(self):
+        with self.lock:
+            if not self.samples:
+                return None
+            sample = self.samples[-1]
+        if time.monotonic() - sample.monotonic > self.stale_after:
+            return None
+        return sample
+
+    def latest_stable(self, max_age=None):
+        max_age = self.stale_after if max_age is None else max_age
+        with self.lock:
+            if not self._stable or self._last_stable is None:
+                return None
+            sample = self._last_stable
+        if time.monotonic() - sample.monotonic > max_age:
+            return None
+        return sample
+
+    def wait_stable(self, timeout):
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            while True:
+                if self._stable and self._last_stable is not None and \
+                        time.monotonic() - self._last_stable.monotonic <= self.stale_after:
+                    return self._last_stable
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.stable_changed.wait(remaining)
+
+    def window(self, seconds):
+        cutoff = time.monotonic() - seconds
+        with self.lock:
+            return [s for s in self.samples if s.monotonic >= cutoff]
+
+    def status(self):
+        sample = self.latest()
+        with self.lock:
+            stable = self._stable
+        return {
+            'connected': self.connected and sample is not None,
+            'weight': sample.weight if sample else None,
+            'stable': bool(sample) and stable,
+            'motion': bool(sample) and not stable,
+            'overload': bool(sample) and sample.overload,
+            'timestamp': sample.timestamp if sample else None,
+            'source': self.transport.describe(),
+            'error': self.last_error,
+        }
+
+    def health(self):
+        status = self.status()
+        status['ok'] = status['connected']
+        status['running'] = self.running
+        return status
+
+    def _read_loop(self):
+        backoff = 1.0
+        while self.running:
+            try:
+                self.transport.open()
+                self.connected = True
+                self.last_error = None
+                backoff = 1.0
+                while self.running:
+                    line = self.transport.readline()
+                    if not line:
+                        # Read timeout; the indicator should be streaming
+                        continue
+                    parsed = parse_frame(line)
+                    if parsed is not None:
+                        self.add_sample(*parsed)
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Error in scale reader ({self.transport.describe()}): {e}")
+            finally:
+                self.connected = False
+                try:
+                    self.transport.close()
+                except Exception:
+                    pass
+            if self.running:
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 10.0)
+
+
+def run_pty_simulator(rate_hz=10.0):
+    # Local stand-in for the indicator: point SCALE_PORT at the printed path
+    master, slave = os.openpty()
+    print(f"Simulated scale on {os.ttyname(slave)}")
+    source = SimulatedTransport(rate_hz=rate_hz)
+    source.open()
+    try:
+        while True:
+            os.write(master, source.readline())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        os.close(master)
+        os.close(slave)
+
+
+if __name__ == '__main__':
+    run_pty_simulator()
@@ -0,0 +1,79 @@
+import threading
+import time
+
+# Taken when this module is first imported, which app.py does before anything heavy
+PROCESS_STARTED = time.monotonic()
+# Stop waiting for components that are not coming up (unplugged hardware)
+READY_WATCH_TIMEOUT = 120.0
+READY_POLL_INTERVAL = 0.1
+
+
+def elapsed():
+    return time.monotonic() - PROCESS_STARTED
+
+
+class StartupTracker:
+    """Records how long each part of the system took to become ready.
+
+    ``mark`` notes a step as it finishes; ``watch`` starts components in
+    parallel and polls their health checks in the background, so the web
+    server can start serving while peripherals are still coming up.
+    """
+
+    def __init__(self):
+        self.marks = {}
+        self.lock = threading.Lock()
+
+    def mark(self, name):
+        with self.lock:
+            if name not in self.marks:
+                self.marks[name] = round(elapsed(), 3)
+                return True
+        return False
+
+    def report(self):
+        with self.lock:
+            ready = dict(self.marks)
+        return {'uptime_seconds': round(elapsed(), 1), 'ready_after_seconds': ready}
+
+    def start_components(self, starters):
+        # Each start() in its own thread: a slow device never delays the others
+        threads = []
+        for name, start in starters.items():
+            thread = threading.Thread(target=self._start_one, args=(name, start), name=f'start-{name}')
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        return threads
+
+    def _start_one(self, name, start):
+        started = time.monotonic()
+        try:
+            start()
+        except Exception as e:
+            print(f"Error starting {name}: {e}")
+            return
+        print(f"Started {name} in {(time.monotonic() - started) * 1000:.0f} ms")
+
+    def watch(self, checks, timeout=READY_WATCH_TIMEOUT):
+        """Poll {name: callable returning bool} until each is ready or timeout."""
+        thread = threading.Thread(target=self._watch, args=(dict(checks), timeout), name='startup-watch')
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def _watch(self, checks, timeout):
+        deadline = time.monotonic() + timeout
+        pending = dict(checks)
+        while pending and time.monotonic() < deadline:
+            for name, check in list(pending.items()):
+                try:
+                    ready = check()
+                except Exception:
+                    ready = False
+                if ready:
+                    self.mark(name)
+                    del pending[name]
+            time.sleep(READY_POLL_INTERVAL)
+        summary = ', '.join(f"{name} {seconds:.2f} s" for name, seconds in self.report()['ready_after_seconds'].items())
+        print(f"Startup: {summary}" + (f"; not ready: {', '.join(pending)}" if pending else ''))
@@ -0,0 +1,207 @@
+/**
+ * Customers page: add, import, print labels and ticket history
+ */
+let scanning = false;
+let customerTicketsModal;
+let addCustomerModal;
+
+document.addEventListener('DOMContentLoaded', function () {
+    // Initialize modals
+    customerTicketsModal = new bootstrap.Modal(document.getElementById('customerTicketsModal'));
+    addCustomerModal = new bootstrap.Modal(document.getElementById('addCustomerModal'));
+
+    // Set today's date as default for date filters
+    const today = new Date().toISOString().split('T')[0];
+    document.getElementById('dateTo').value = today;
+
+    // Set date 3 months ago as default starting date
+    const threeMonthsAgo = new Date();
+    threeMonthsAgo.setMonth(threeMonthsAgo.getMonth() - 3);
+    document.getElementById('dateFrom').value = threeMonthsAgo.toISOString().split('T')[0];
+
+    // Add click handlers for customer rows
+    const customerRows = document.querySelectorAll('.customer-row');
+    customerRows.forEach(row => {
+        row.addEventListener('click', function () {
+            const customerId = this.dataset.customerId;
+            const customerName = this.cells[1].textContent;
+            showCustomerTickets(customerId, customerName);
+        });
+    });
+
+    // Attach submit event to the modal form button instead of the form
+    document.getElementById('submitCustomerForm').addEventListener('click', submitCustomerForm);
+
+    // Bulk import: pick a file, upload it, report per-row problems
+    document.getElementById('importCustomersBtn').addEventListener('click', function () {
+        document.getElementById('importCustomersFile').click();
+    });
+    document.getElementById('importCustomersFile').addEventListener('change', importCustomers);
+
+    // Add filter button handler
+    document.getElementById('filterDateBtn').addEventListener('click', function () {
+        const customerId = document.getElementById('customerTicketsModal').dataset.customerId;
+        const customerName = document.getElementById('customerTicketsName').textContent;
+        if (customerId) {
+            showCustomerTickets(customerId, customerName);
+        }
+    });
+});
+
+document.getElementById('scanRfid').addEventListener('click', async function () {
+    if (scanning) return;
+
+    this.textContent = 'Scanning...';
+    scanning = true;
+
+    // Wait for the next card scan pushed by the server
+    const data = await LiveChannel.once('rfid');
+    document.getElementById('rfidCard').value = data.card_id;
+    scanning = false;
+    this.textContent = 'Scan RFID';
+});
+
+async function printCustomerLabel(id, name, rfidCard) {
+    try {
+        const response = await fetch('/api/customers/' + id + '/print-label', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            }
+        });
+
+        if (!response.ok) {
+            throw new Error('Error printing label');
+        }
+
+        alert('Label queued for printing');
+    } catch (error) {
+        console.error('Error:', error);
+        alert('Error printing label');
+    }
+}
+
+async function submitCustomerForm() {
+    const form = document.getElementById('customerForm');
+    if (!form.checkValidity()) {
+        form.reportValidity();
+        return;
+    }
+
+    const name = document.getElementById('customerName').value;
+    const rfidCard = document.getElementById('rfidCard').value;
+
+    if (!name || !rfidCard) {
+        alert('Please fill in all fields');
+        return;
+    }
+
+    try {
+        const response = await fetch('/api/customers', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                name: name,
+                rfid_card: rfidCard
+            })
+        });
+
+        if (response.ok) {
+            const data = await response.json();
+            await printCustomerLabel(data.id, name, rfidCard);
+            addCustomerModal.hide();
+            location.reload();
+        } else {
+            const data = await response.json().catch(() => ({}));
+            alert(data.error || 'Error adding customer');
+        }
+    } catch (error) {
+        console.error('Error:', error);
+        alert('Error adding customer');
+    }
+}
+
+async function importCustomers() {
+    const file = this.files[0];
+    if (!file) return;
+
+    const formData = new FormData();
+    formData.append('file', file);
+    try {
+        const response = await fetch('/api/customers/import', {
+            method: 'POST',
+            body: formData
+        });
+        const report = await response.json();
+        if (!response.ok) {
+            throw new Error(report.error || 'Import failed');
+        }
+
+        const summary = report.summary;
+        const errors = report.rows.filter(row => row.status === 'error')
+            .slice(0, 10)
+            .map(row => `Row ${row.row}: ${row.error}`);
+        alert(`${summary.created} created, ${summary.updated} updated, ` +
+              `${summary.unchanged} unchanged, ${summary.error} skipped` +
+              (errors.length ? '\n\n' + errors.join('\n') : ''));
+        if (summary.created || summary.updated) {
+            location.reload();
+        }
+    } catch (error) {
+        console.error('Error:', error);
+        alert(error.message || 'Error importing customers');
+    } finally {
+        this.value = '';
+    }
+}
+
+async function showCustomerTickets(customerId, customerName) {
+    document.getElementById('customerTicketsName').textContent = customerName;
+    document.getElementById('customerTicketsModal').dataset.customerId = customerId;
+
+    const dateFrom = document.getElementById('dateFrom').value;
+    const dateTo = document.getElementById('dateTo').value;
+
+    try {
+        const response = await fetch(`/api/customers/${customerId}/tickets?from=${dateFrom}&to=${dateTo}`);
+        if (!response.ok) {
+            throw new Error('Failed to fetch tickets');
+        }
+
+        const tickets = await response.json();
+        const tableBody = document.getElementById('customerTicketsList');
+        tableBody.innerHTML = '';
+
+        if (tickets.length === 0) {
+            document.getElementById('customerTicketsTable').style.display = 'none';
+            document.getElementById('noTicketsMessage').style.display = 'block';
+        } else {
+            document.getElementById('customerTicketsTable').style.display = 'table';
+            document.getElementById('noTicketsMessage').style.display = 'none';
+
+            tickets.forEach(ticket => {
+                const row = document.createElement('tr');
+                const createdDate = new Date(ticket.created_at);
+                const closedDate = ticket.closed_at ? new Date(ticket.closed_at) : null;
+                const formatDate = (date) => date ? date.toLocaleString() : '';
+
+                row.innerHTML = `
+                    <td>${ticket.id}</td>
+                    <td>${formatDate(createdDate)}</td>
+                    <td>${ticket.gross_weight.toFixed(2)} kg</td>
+                    <td>${ticket.tare_weight ? ticket.tare_weight.toFixed(2) : '-'} kg</td>
+                    <td>${ticket.net_weight ? ticket.net_weight.toFixed(2) : '-'} kg</td>
+                    <td><span class="badge ${ticket.status === 'open' ? 'bg-warning' : 'bg-success'}">${ticket.status}</span></td>
+                `;
+                tableBody.appendChild(row);
+            });
+        }
+
+        customerTicketsModal.show();
+    } catch (error) {
+        console.error('Error fetching tickets:', error);
+        alert('Error loading tickets for this customer');
+    }
+}
@@ -0,0 +1,122 @@
+/**
+ * Live Channel module
+ * Receives weight changes and RFID scans pushed by the server
+ * (Server-Sent Events, falling back to long-polling)
+ */
+const LiveChannel = (function() {
+    // Private variables
+    const listeners = { weight: [], rfid: [], status: [] };
+    let eventSource = null;
+    let longPolling = false;
+    let cursor = null;
+    let sseFailures = 0;
+    const MAX_SSE_FAILURES = 3;
+    const RETRY_DELAY_MS = 2000;
+    // '/api/lanes/<name>' on a kiosk opened with ?lane=<name> (set by base.html)
+    const API = window.LANE_API || '/api';
+
+    // Subscribe to 'weight', 'rfid' or 'status' events; returns an unsubscribe function
+    function on(eventName, callback) {
+        listeners[eventName].push(callback);
+        connect();
+
+        return function() {
+            const index = listeners[eventName].indexOf(callback);
+            if (index !== -1) {
+                listeners[eventName].splice(index, 1);
+            }
+        };
+    }
+
+    // Resolve with the next event of the given type
+    function once(eventName) {
+        return new Promise(resolve => {
+            const unsubscribe = on(eventName, function(data) {
+                unsubscribe();
+                resolve(data);
+            });
+        });
+    }
+
+    // Dispatch an event to all subscribers
+    function emit(eventName, data) {
+        listeners[eventName].slice().forEach(callback => {
+            try {
+                callback(data);
+            } catch (error) {
+                console.error(`Error in ${eventName} listener:`, error);
+            }
+        });
+    }
+
+    // Open the connection once, preferring Server-Sent Events
+    function connect() {
+        if (eventSource || longPolling) return;
+
+        if (window.EventSource) {
+            connectEventSource();
+        } else {
+            startLongPolling();
+        }
+    }
+
+    function connectEventSource() {
+        eventSource = new EventSource(`${API}/events`);
+
+        eventSource.onopen = function() {
+            sseFailures = 0;
+            emit('status', true);
+        };
+
+        eventSource.addEventListener('weight', function(e) {
+            emit('weight', JSON.parse(e.data));
+        });
+
+        eventSource.addEventListener('rfid', function(e) {
+            emit('rfid', JSON.parse(e.data));
+        });
+
+        eventSource.onerror = function() {
+            emit('status', false);
+            sseFailures++;
+
+            // EventSource reconnects by itself; give up on it if it keeps failing
+            if (sseFailures >= MAX_SSE_FAILURES) {
+                eventSource.close();
+                eventSource = null;
+                startLongPolling();
+            }
+        };
+    }
+
+    // Long-poll loop used when Server-Sent Events are unavailable
+    async function startLongPolling() {
+        if (longPolling) return;
+        longPolling = true;
+
+        while (longPolling) {
+            try {
+                const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+                const response = await fetch(`${API}/events/poll${query}`);
+                if (!response.ok) {
+                    throw new Error(`HTTP error! status: ${response.status}`);
+                }
+
+                const data = await response.json();
+                cursor = data.cursor;
+                emit('status', true);
+                data.events.forEach(event => emit(event.event, event.data));
+            } catch (error) {
+                console.error('Error in live channel:', error);
+                emit('status', false);
+                await new Promise(resolve => setTimeout(resolve, RETRY_DELAY_MS));
+            }
+        }
+    }
+
+    // Public API
+    return {
+        on: on,
+        once: once
+    };
+})();
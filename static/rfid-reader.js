@@ -3,221 +3,135 @@
  */
 const RFIDReader = (function() {
     // Private variables
-    let lastCardId = null;
-    let simulatedCardId = null;
-    let isPolling = false;
-    let pollInterval = null;
-    const POLL_INTERVAL_MS = 2000; // 2 seconds
-    
-    // Initialize the module
-    function init() {
-        setupEventListeners();
-        updateCardStatus();
+    let config = {}; // Store configuration
+    let lastCardId = null; // Track last processed card ID
+    let unsubscribe = null; // Live channel subscription for card scans
+    let isPolling = false; // Flag to check if listening is active
+
+    // Initialize the module with configuration
+    function init(userConfig) {
+        config = userConfig; // Store the passed configuration
+        updateConnectionStatus(false); // Assume disconnected initially
+        updateCardStatus(null); // Initial status: waiting
+        // Start listening for card reads pushed by the backend
+        LiveChannel.on('status', updateConnectionStatus);
+        startPolling();
+        return this;
     }
-    
-    // Set up event listeners
-    function setupEventListeners() {
-        // Listen for manual card ID input
-        const manualCardInput = document.getElementById('manualCardInput');
-        const submitManualCardBtn = document.getElementById('submitManualCard');
-        
-        if (manualCardInput && submitManualCardBtn) {
-            submitManualCardBtn.addEventListener('click', function() {
-                const cardId = manualCardInput.value.trim();
-                if (cardId) {
-                    simulateCardScan(cardId);
-                    if (UIControls && typeof UIControls.showAlert === 'function') {
-                        UIControls.showAlert(`Manual card ID entered: ${cardId}`, 'info');
-                    }
-                    manualCardInput.value = '';
-                }
-            });
-            
-            // Allow pressing Enter in the input field
-            manualCardInput.addEventListener('keypress', function(e) {
-                if (e.key === 'Enter') {
-                    submitManualCardBtn.click();
-                }
-            });
-        }
-        
-        // Start/stop polling buttons
-        const startPollingBtn = document.getElementById('startRfidPolling');
-        const stopPollingBtn = document.getElementById('stopRfidPolling');
-        
-        if (startPollingBtn) {
-            startPollingBtn.addEventListener('click', function() {
-                startPolling();
-                updatePollingStatus(true);
-            });
-        }
-        
-        if (stopPollingBtn) {
-            stopPollingBtn.addEventListener('click', function() {
-                stopPolling();
-                updatePollingStatus(false);
-            });
-        }
-        
-        // Customer quick select for card simulation
-        const customerSelect = document.getElementById('customerCardSelect');
-        if (customerSelect) {
-            customerSelect.addEventListener('change', function() {
-                const cardId = this.value;
-                if (cardId) {
-                    simulateCardScan(cardId);
-                    this.value = ''; // Reset select after use
-                }
-            });
+
+    // Update connection status UI
+    function updateConnectionStatus(isConnected) {
+        const toggle = document.getElementById(config.toggleId);
+        const statusText = document.getElementById(config.statusTextId);
+        const indicator = document.getElementById(config.indicatorId)?.querySelector('.badge');
+
+        if (toggle) toggle.checked = isConnected;
+        if (statusText) statusText.textContent = isConnected ? 'Connected' : 'Disconnected';
+        if (indicator) {
+            indicator.classList.toggle('bg-success', isConnected);
+            indicator.classList.toggle('bg-danger', !isConnected);
         }
     }
-    
-    // Simulate a card scan with the given ID
-    function simulateCardScan(cardId) {
-        if (!cardId) return;
-        
-        simulatedCardId = cardId;
-        processCardScan(cardId);
-        
-        // Show the card ID in the UI
-        updateCardDisplay(cardId);
-        
-        // Check if there's an open ticket for this card and highlight it
-        const openTicket = TicketManager.getOpenTicketForCard(cardId);
-        if (openTicket) {
-            TicketManager.highlightOpenTicket(openTicket.id);
-            
-            // Switch to the ticket tab if configured
-            if (UIControls && typeof UIControls.switchToTab === 'function') {
-                UIControls.switchToTab('ticketsTab');
+
+    // Update card status message and display
+    function updateCardStatus(cardId, customerName = null, message = null, isError = false) {
+        const statusMessage = document.getElementById(config.statusMessageId);
+        const cardInfo = document.getElementById(config.cardInfoId);
+        const noCardInfo = document.getElementById(config.noCardInfoId);
+        const cardNameEl = document.getElementById(config.cardNameId);
+        const cardIdEl = document.getElementById(config.cardIdId);
+        const cardActionMessageEl = document.getElementById(config.cardActionMessageId);
+
+        if (statusMessage) {
+            statusMessage.textContent = message || (cardId ? 'Card detected' : 'Waiting for card...');
+        }
+
+        if (cardId && customerName) {
+            if (cardInfo) cardInfo.classList.remove('d-none');
+            if (noCardInfo) noCardInfo.style.display = 'none';
+            if (cardNameEl) cardNameEl.textContent = customerName;
+            if (cardIdEl) cardIdEl.textContent = cardId;
+            if (cardActionMessageEl) {
+                 cardActionMessageEl.textContent = 'Ready to process card...';
+                 cardActionMessageEl.parentElement.className = 'alert alert-info py-2 mb-0';
             }
+        } else {
+            if (cardInfo) cardInfo.classList.add('d-none');
+            if (noCardInfo) noCardInfo.style.display = 'block';
+            if (cardNameEl) cardNameEl.textContent = '-';
+            if (cardIdEl) cardIdEl.textContent = '-';
         }
-    }
-    
-    // Start polling for RFID cards
-    function startPolling() {
-        if (isPolling) return;
-        
-        isPolling = true;
-        pollInterval = setInterval(pollForCard, POLL_INTERVAL_MS);
-        
-        // Poll immediately
-        pollForCard();
-    }
-    
-    // Stop polling for RFID cards
-    function stopPolling() {
-        isPolling = false;
-        if (pollInterval) {
-            clearInterval(pollInterval);
-            pollInterval = null;
+
+        if (isError && cardActionMessageEl) {
+             cardActionMessageEl.textContent = message || 'Error processing card.';
+             cardActionMessageEl.parentElement.className = 'alert alert-danger py-2 mb-0';
         }
     }
-    
-    // Poll the server for the current card
-    async function pollForCard() {
+
+    // Fetch customer details for a given card ID
+    async function fetchCustomerDetails(cardId) {
+        // Resolves the card to its customer and open ticket (if any) in one request
         try {
-            const response = await fetch('/api/rfid/current');
-            const data = await response.json();
-            
-            if (data.card_id && data.card_id !== lastCardId) {
-                lastCardId = data.card_id;
-                processCardScan(data.card_id);
+            const response = await fetch(`/api/customers/by-rfid/${encodeURIComponent(cardId)}`);
+            if (!response.ok) {
+                return null; // Unknown card
             }
-            
-            updateCardDisplay(data.card_id || simulatedCardId);
+            const data = await response.json();
+            return { ...data.customer, openTicket: data.open_ticket };
         } catch (error) {
-            console.error('Error polling for RFID card:', error);
-            updateCardDisplay(null, error.message || 'Error polling for card');
-        }
-    }
-    
-    // Process a card scan
-    function processCardScan(cardId) {
-        if (!cardId) return;
-        
-        // Get current weight from the scale
-        const weight = WeightScale ? WeightScale.getCurrentWeight() : 0;
-        
-        // Process the card with the weight
-        if (TicketManager && typeof TicketManager.handleRfidScan === 'function') {
-            TicketManager.handleRfidScan(cardId, weight);
+            console.error('Error looking up card:', error);
+            return null;
         }
     }
-    
-    // Update the card display in the UI
-    function updateCardDisplay(cardId, errorMessage = null) {
-        const cardIdDisplay = document.getElementById('currentCardId');
-        const cardStatusDisplay = document.getElementById('cardStatus');
-        
-        if (cardIdDisplay) {
-            cardIdDisplay.textContent = cardId || 'None';
-        }
-        
-        if (cardStatusDisplay) {
-            if (errorMessage) {
-                cardStatusDisplay.textContent = errorMessage;
-                cardStatusDisplay.className = 'text-danger';
-            } else if (cardId) {
-                // Check if there's an open ticket for this card
-                const openTicket = TicketManager.getOpenTicketForCard(cardId);
-                
-                if (openTicket) {
-                    cardStatusDisplay.textContent = `Open ticket #${openTicket.id} found for this card`;
-                    cardStatusDisplay.className = 'text-success';
-                } else {
-                    cardStatusDisplay.textContent = 'Card ready for new ticket';
-                    cardStatusDisplay.className = 'text-primary';
-                }
-            } else {
-                cardStatusDisplay.textContent = 'No card detected';
-                cardStatusDisplay.className = 'text-muted';
+
+    // Handle a card scan pushed by the server
+    async function handleCardEvent(data) {
+        if (!data.card_id) return;
+        lastCardId = data.card_id; // Update last processed card ID
+        
+        // Fetch customer details
+        const customer = await fetchCustomerDetails(lastCardId);
+        const customerName = customer ? customer.name : 'Unknown Customer';
+
+        // Update UI immediately
+        updateCardStatus(lastCardId, customerName, 'Card detected');
+
+        // Trigger the callback if provided
+        if (config.onCardDetected && typeof config.onCardDetected === 'function') {
+            // Wrap the call to handle potential errors in the callback itself
+            try {
+                await config.onCardDetected(lastCardId, data.seq);
+            } catch (callbackError) {
+                console.error("Error in onCardDetected callback:", callbackError);
+                updateCardStatus(lastCardId, customerName, `Error processing card: ${callbackError.message}`, true);
             }
         }
     }
-    
-    // Update the card status based on the currently selected card
-    function updateCardStatus() {
-        updateCardDisplay(simulatedCardId || lastCardId);
+
+    // Start listening for card scans
+    function startPolling() {
+        if (isPolling) return;
+        isPolling = true;
+        unsubscribe = LiveChannel.on('rfid', handleCardEvent);
+        console.log("RFID listening started.");
     }
-    
-    // Update the polling status in the UI
-    function updatePollingStatus(isActive) {
-        const pollingStatus = document.getElementById('pollingStatus');
-        const startBtn = document.getElementById('startRfidPolling');
-        const stopBtn = document.getElementById('stopRfidPolling');
-        
-        if (pollingStatus) {
-            if (isActive) {
-                pollingStatus.innerHTML = '<span class="badge bg-success">Active</span>';
-            } else {
-                pollingStatus.innerHTML = '<span class="badge bg-secondary">Inactive</span>';
-            }
-        }
-        
-        if (startBtn && stopBtn) {
-            startBtn.disabled = isActive;
-            stopBtn.disabled = !isActive;
+
+    // Stop listening for card scans
+    function stopPolling() {
+        if (!isPolling) return;
+        isPolling = false;
+        if (unsubscribe) {
+            unsubscribe();
+            unsubscribe = null;
         }
+        updateConnectionStatus(false); // Show as disconnected when stopped
+        console.log("RFID listening stopped.");
     }
-    
-    // Get the last detected card ID
-    function getLastCardId() {
-        return lastCardId || simulatedCardId;
-    }
-    
+
     // Public API
     return {
         init: init,
-        startPolling: startPolling,
-        stopPolling: stopPolling,
-        simulateCardScan: simulateCardScan,
-        getLastCardId: getLastCardId,
-        updateCardStatus: updateCardStatus
+        startPolling: startPolling, // Expose if manual control is needed
+        stopPolling: stopPolling   // Expose if manual control is needed
     };
 })();
-
-// Initialize RFID Reader when the DOM is ready
-document.addEventListener('DOMContentLoaded', function() {
-    RFIDReader.init();
-});
\ No newline at end of file
@@ -5,9 +5,9 @@ const TicketManager = (function() {
     // Private variables
     let isProcessing = false;
     
-    // Show feedback in the card action message
+    // Show feedback in the card action message (uses RFIDReader's config now)
     function updateCardActionMessage(message, isSuccess = true) {
-        const messageElement = document.getElementById('cardActionMessage');
+        const messageElement = document.getElementById('cardActionMessage'); // Direct ID access
         if (messageElement) {
             messageElement.textContent = message;
             messageElement.parentElement.className = isSuccess ? 
@@ -15,9 +15,9 @@ const TicketManager = (function() {
         }
     }
     
-    // Show a loading spinner in the given element
+    // Show a loading spinner in the given element (uses UIControls)
     function setLoadingState(elementId, isLoading) {
-        if (UIControls && typeof UIControls.toggleLoadingState === 'function') {
+        if (typeof UIControls !== 'undefined' && typeof UIControls.toggleLoadingState === 'function') {
             UIControls.toggleLoadingState(elementId, isLoading);
         }
     }
@@ -26,11 +26,12 @@ const TicketManager = (function() {
     async function createTicket(rfidCard, weight) {
         if (isProcessing) return;
         isProcessing = true;
+        setLoadingState('quickCreateTicket', true); // Example loading state on a button
         
         try {
             updateCardActionMessage('Creating new ticket...', true);
             
-            const response = await fetch('/api/tickets', {
+            const response = await fetch(`${window.LANE_API || '/api'}/tickets`, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -42,28 +43,25 @@ const TicketManager = (function() {
                 })
             });
             
+            const responseData = await response.json(); // Read response body once
+
             if (!response.ok) {
-                const contentType = response.headers.get("content-type");
-                if (contentType && contentType.indexOf("application/json") !== -1) {
-                    const error = await response.json();
-                    throw new Error(error.error || 'Error creating ticket');
-                } else {
-                    throw new Error(`Server error: ${response.status}`);
-                }
+                 throw new Error(responseData.error || `Server error: ${response.status}`);
             }
             
-            const data = await response.json();
-            
             // Show success message then reload
-            updateCardActionMessage(`Ticket #${data.id || 'new'} created successfully!`, true);
+            updateCardActionMessage(`Ticket #${responseData.id || 'new'} created successfully!`, true);
+            if (typeof UIControls !== 'undefined') UIControls.showAlert(`Ticket #${responseData.id || 'new'} created!`, 'success');
             setTimeout(() => {
                 location.reload();
-            }, 1000);
+            }, 1500); // Slightly longer delay
         } catch (error) {
-            console.error('Error:', error);
+            console.error('Error creating ticket:', error);
             updateCardActionMessage(error.message || 'Error creating ticket', false);
+             if (typeof UIControls !== 'undefined') UIControls.showAlert(error.message || 'Error creating ticket', 'danger');
         } finally {
             isProcessing = false;
+            setLoadingState('quickCreateTicket', false);
         }
     }
 
@@ -71,7 +69,9 @@ const TicketManager = (function() {
     async function closeTicket(ticketId, tareWeight) {
         if (isProcessing) return;
         isProcessing = true;
-        
+        setLoadingState('quickCloseTicket', true); // Example loading state
+        setLoadingState('submitManualWeight', true); // Also for modal button
+
         try {
             updateCardActionMessage(`Closing ticket #${ticketId}...`, true);
             
@@ -86,35 +86,32 @@ const TicketManager = (function() {
                 })
             });
             
+            const responseData = await response.json(); // Read response body once
+
             if (!response.ok) {
-                const contentType = response.headers.get("content-type");
-                if (contentType && contentType.indexOf("application/json") !== -1) {
-                    const error = await response.json();
-                    throw new Error(error.error || 'Error closing ticket');
-                } else {
-                    throw new Error(`Server error: ${response.status}`);
-                }
+                throw new Error(responseData.error || `Server error: ${response.status}`);
             }
 
-            const data = await response.json();
-            
             // Show success message then reload
             updateCardActionMessage(`Ticket #${ticketId} closed successfully!`, true);
+            if (typeof UIControls !== 'undefined') UIControls.showAlert(`Ticket #${ticketId} closed, receipt queued!`, 'success');
             setTimeout(() => {
                 location.reload();
-            }, 1000);
+            }, 1500);
         } catch (error) {
-            console.error('Error:', error);
+            console.error('Error closing ticket:', error);
             updateCardActionMessage(error.message || 'Error closing ticket', false);
+            if (typeof UIControls !== 'undefined') UIControls.showAlert(error.message || 'Error closing ticket', 'danger');
         } finally {
             isProcessing = false;
+            setLoadingState('quickCloseTicket', false);
+            setLoadingState('submitManualWeight', false);
         }
     }
 
     // Delete a ticket
     async function deleteTicket(ticketId) {
-        setLoadingState('confirmDeleteBtn', true);
-        
+        // Loading state is handled in UIControls confirmation modal setup
         try {
             const response = await fetch(`/api/tickets/${ticketId}`, {
                 method: 'DELETE',
@@ -129,25 +126,33 @@ const TicketManager = (function() {
                 throw new Error(data.error || `Server error: ${response.status}`);
             }
 
-            return true;
+            return true; // Indicate success
         } catch (error) {
-            console.error('Error:', error);
-            if (UIControls && typeof UIControls.showAlert === 'function') {
+            console.error('Error deleting ticket:', error);
+            if (typeof UIControls !== 'undefined') {
                 UIControls.showAlert(error.message || 'Error deleting ticket', 'danger');
             } else {
                 alert(error.message || 'Error deleting ticket');
             }
-            return false;
-        } finally {
-            setLoadingState('confirmDeleteBtn', false);
+            return false; // Indicate failure
         }
+        // Loading state reset is handled in UIControls confirmation modal setup
     }
 
     // Print a ticket receipt
     async function printReceipt(ticketId) {
+        // Find the specific print button for this ticket ID to show loading
+        const printButton = document.querySelector(`button[onclick="printTicketReceipt('${ticketId}')"]`);
+        const buttonId = `printBtn_${ticketId}`;
+        if (printButton && !printButton.id) {
+             printButton.id = buttonId; // Assign temporary ID if needed
+        }
+        
+        setLoadingState(printButton ? printButton.id : null, true);
+
         try {
-            if (UIControls && typeof UIControls.showAlert === 'function') {
-                UIControls.showAlert('Sending print job...', 'info', 1000);
+            if (typeof UIControls !== 'undefined') {
+                UIControls.showAlert('Sending print job...', 'info', 1500); // Shorter duration
             }
             
             const response = await fetch(`/api/tickets/${ticketId}/print`, {
@@ -163,51 +168,108 @@ const TicketManager = (function() {
                 throw new Error(data.error || `Error printing ticket: ${response.status}`);
             }
             
-            if (UIControls && typeof UIControls.showAlert === 'function') {
-                UIControls.showAlert(data.message || `Ticket #${ticketId} printed successfully`, 'success');
+            if (typeof UIControls !== 'undefined') {
+                UIControls.showAlert(data.message || `Ticket #${ticketId} queued for printing`, 'info');
             } else {
-                alert(data.message || `Ticket #${ticketId} printed successfully`);
+                alert(data.message || `Ticket #${ticketId} queued for printing`);
             }
             
+            watchPrintJob(data.print_job_id);
             return true;
         } catch (error) {
-            console.error('Error:', error);
-            if (UIControls && typeof UIControls.showAlert === 'function') {
+            console.error('Error printing ticket:', error);
+            if (typeof UIControls !== 'undefined') {
                 UIControls.showAlert(error.message || 'Error printing ticket', 'danger');
             } else {
                 alert(error.message || 'Error printing ticket');
             }
             return false;
+        } finally {
+             setLoadingState(printButton ? printButton.id : null, false);
+        }
+    }
+
+    // Follow a queued print job until the printer has taken it (or it fails)
+    async function watchPrintJob(jobId, attempts = 30) {
+        if (!jobId) return null;
+        
+        for (let i = 0; i < attempts; i++) {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            try {
+                const response = await fetch(`/api/print-jobs/${jobId}`);
+                const job = await response.json();
+                if (!response.ok) {
+                    throw new Error(job.error || `Server error: ${response.status}`);
+                }
+                
+                if (job.status === 'done' || job.status === 'failed') {
+                    if (typeof UIControls !== 'undefined') {
+                        if (job.status === 'done') {
+                            UIControls.showAlert(`${job.title} printed`, 'success');
+                        } else {
+                            UIControls.showAlert(`${job.title} failed to print: ${job.last_error || 'unknown error'}`, 'danger');
+                        }
+                    }
+                    return job;
+                }
+            } catch (error) {
+                console.error('Error checking print job:', error);
+                return null;
+            }
+        }
+        
+        if (typeof UIControls !== 'undefined') {
+            UIControls.showAlert('Print job is still waiting for the printer', 'warning');
         }
+        return null;
     }
 
-    // Handle RFID scan and process ticket accordingly
-    async function handleRfidScan(cardId, weight) {
+    // Handle RFID scan: the server opens or closes the ticket with the scale's stable weight
+    async function handleRfidScan(cardId, scanSeq) {
+        if (isProcessing) return;
+        isProcessing = true;
         try {
-            updateCardActionMessage('Processing card...', true);
+            updateCardActionMessage('Weighing...', true);
             
             if (!cardId) {
-                throw new Error('Invalid card ID');
+                throw new Error('Invalid card ID received');
             }
             
-            if (isNaN(weight) || weight <= 0) {
-                throw new Error('Invalid weight reading. Please check the scale.');
-            }
+            // scan_seq lets every open tab submit the same tap; only the first one acts
+            const response = await fetch(`${window.LANE_API || '/api'}/weighings`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Accept': 'application/json'
+                },
+                body: JSON.stringify({
+                    rfid_card: cardId,
+                    scan_seq: Number.isInteger(scanSeq) ? scanSeq : null
+                })
+            });
             
-            // Check if there's an open ticket for this card
-            const openTicket = document.querySelector(`.ticket-card[data-customer-rfid="${cardId}"]`);
+            const responseData = await response.json();
             
-            if (openTicket) {
-                // Close the existing ticket
-                const ticketId = openTicket.dataset.ticketId;
-                await closeTicket(ticketId, weight);
-            } else {
-                // Create a new ticket
-                await createTicket(cardId, weight);
+            if (!response.ok) {
+                throw new Error(responseData.error || `Server error: ${response.status}`);
             }
+            
+            const ticket = responseData.ticket;
+            const message = responseData.action === 'closed'
+                ? `Ticket #${ticket.id} closed at ${responseData.weight} kg, receipt queued!`
+                : `Ticket #${ticket.id} opened at ${responseData.weight} kg`;
+            updateCardActionMessage(message, true);
+            if (typeof UIControls !== 'undefined') UIControls.showAlert(message, 'success');
+            setTimeout(() => {
+                location.reload();
+            }, 1500);
         } catch (error) {
-            console.error('Error:', error);
+            console.error('Error handling RFID scan:', error);
             updateCardActionMessage(error.message || 'Error processing ticket', false);
+            // Optionally show alert via UIControls
+            if (typeof UIControls !== 'undefined') UIControls.showAlert(error.message || 'Error processing ticket', 'danger');
+        } finally {
+            isProcessing = false;
         }
     }
     
@@ -230,17 +292,17 @@ const TicketManager = (function() {
     function highlightOpenTicket(ticketId) {
         if (!ticketId) return;
         
-        // Remove highlight from all tickets
+        // Remove highlight from all tickets first
         document.querySelectorAll('.ticket-card').forEach(card => {
-            card.classList.remove('border-primary');
-            card.classList.remove('shadow');
+            card.classList.remove('border-primary', 'shadow-lg'); // Use stronger shadow
+            card.style.transform = 'scale(1)';
         });
         
         // Add highlight to the specified ticket
         const ticket = document.querySelector(`.ticket-card[data-ticket-id="${ticketId}"]`);
         if (ticket) {
-            ticket.classList.add('border-primary');
-            ticket.classList.add('shadow');
+            ticket.classList.add('border-primary', 'shadow-lg');
+            ticket.style.transform = 'scale(1.03)'; // Slightly enlarge
             
             // Scroll the ticket into view if needed
             ticket.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
@@ -253,8 +315,9 @@ const TicketManager = (function() {
         closeTicket: closeTicket,
         deleteTicket: deleteTicket,
         printReceipt: printReceipt,
+        watchPrintJob: watchPrintJob,
         handleRfidScan: handleRfidScan,
         getOpenTicketForCard: getOpenTicketForCard,
         highlightOpenTicket: highlightOpenTicket
     };
-})();
\ No newline at end of file
+})();
@@ -0,0 +1,378 @@
+/**
+ * Tickets page: wires the scale, RFID reader and ticket modules to the page
+ */
+// Global variables
+let deleteTicketModal;
+let manualWeightModal;
+let manualTicketModal; // Added for the manual creation modal
+let deleteTicketId = null;
+let isGridView = true; // Default to grid view for open tickets
+
+// Initialize on document load
+document.addEventListener('DOMContentLoaded', function() {
+    // Initialize modals
+    deleteTicketModal = new bootstrap.Modal(document.getElementById('deleteConfirmationModal'));
+    manualWeightModal = new bootstrap.Modal(document.getElementById('manualWeightModal'));
+    manualTicketModal = new bootstrap.Modal(document.getElementById('manualTicketModal')); // Initialize manual ticket modal
+
+    // Initialize the Weight Scale module
+    WeightScale.init(
+        'weightConnected',   // Toggle ID
+        'weightStatusText',  // Status text ID
+        'currentWeight',     // Weight display ID
+        'weightDisplayContainer' // Display container ID
+    );
+    
+    // Initialize the RFID Reader module with updated configuration
+    RFIDReader.init({
+        toggleId: 'rfidConnected',
+        statusTextId: 'rfidStatusText',
+        indicatorId: 'rfidIndicator',
+        statusMessageId: 'rfidStatusMessage',
+        cardInfoId: 'scannedCardInfo',
+        cardNameId: 'scannedCustomerName',
+        cardIdId: 'scannedCardId',
+        noCardInfoId: 'noCardInfo', // Pass ID for the 'waiting' message container
+        cardActionMessageId: 'cardActionMessage', // Pass ID for action messages
+        onCardDetected: async function(cardId, scanSeq) {
+            // This function is called by RFIDReader module when a new card is polled
+            console.log(`Card detected by RFIDReader: ${cardId}`);
+            
+            // Update action message (handled inside RFIDReader.updateCardStatus now)
+            // document.getElementById('cardActionMessage').textContent = 'Processing card...';
+            // document.getElementById('noCardInfo').style.display = 'none';
+            
+            // Open or close the ticket server-side with the scale's stable weight
+            await TicketManager.handleRfidScan(cardId, scanSeq);
+        }
+    });
+
+    // Initialize UIControls (handles tabs, data-actions)
+    UIControls.init();
+    
+    // --- Event listeners specific to tickets.html ---
+
+    // Customer selection in "Customer Info" tab
+    document.getElementById('quickCustomerSelect').addEventListener('change', function() {
+        const selectedOption = this.options[this.selectedIndex];
+        const customerInfo = document.getElementById('selectedCustomerInfo');
+        
+        if (this.value) {
+            document.getElementById('selectedCustomerName').textContent = selectedOption.text;
+            document.getElementById('selectedCustomerRfid').textContent = this.value;
+            customerInfo.classList.remove('d-none');
+            // Highlight corresponding open ticket if exists
+            if (typeof TicketManager !== 'undefined') {
+                 const openTicket = TicketManager.getOpenTicketForCard(this.value);
+                 TicketManager.highlightOpenTicket(openTicket ? openTicket.id : null);
+            }
+        } else {
+            customerInfo.classList.add('d-none');
+             if (typeof TicketManager !== 'undefined') {
+                 TicketManager.highlightOpenTicket(null); // Clear highlight
+             }
+        }
+    });
+    
+    // Quick action buttons in "Quick Actions" tab
+    document.getElementById('quickCreateTicket').addEventListener('click', function() {
+        const customerSelect = document.getElementById('quickCustomerSelect');
+        if (customerSelect.value) {
+            createTicketWithCurrentWeight(customerSelect.value);
+        } else {
+            UIControls.showAlert('Please select a customer first in the "Customer Info" tab.', 'warning');
+        }
+    });
+    
+    document.getElementById('quickCloseTicket').addEventListener('click', function() {
+        const customerSelect = document.getElementById('quickCustomerSelect');
+        if (!customerSelect.value) {
+             UIControls.showAlert('Please select a customer first in the "Customer Info" tab.', 'warning');
+            return;
+        }
+        
+        const openTicket = TicketManager.getOpenTicketForCard(customerSelect.value);
+        if (openTicket) {
+            const ticketId = openTicket.id;
+            closeTicketWithCurrentWeight(ticketId);
+        } else {
+             UIControls.showAlert('No open ticket found for the selected customer.', 'info');
+        }
+    });
+    
+    // Delete confirmation button in modal
+    document.getElementById('confirmDeleteBtn').addEventListener('click', function() {
+        if (deleteTicketId) {
+            // Use TicketManager.deleteTicket and handle promise
+            UIControls.toggleLoadingState('confirmDeleteBtn', true); // Show loading on confirm button
+            TicketManager.deleteTicket(deleteTicketId).then(success => {
+                if (success) {
+                    deleteTicketModal.hide();
+                    UIControls.showAlert(`Ticket #${deleteTicketId} deleted successfully.`, 'success');
+                    // Reload after a short delay to show message
+                    setTimeout(() => location.reload(), 1000);
+                }
+                // Error alert is handled within deleteTicket
+            }).finally(() => {
+                 UIControls.toggleLoadingState('confirmDeleteBtn', false); // Hide loading
+            });
+        }
+    });
+    
+    // Manual weight input modal submission
+    document.getElementById('submitManualWeight').addEventListener('click', submitManualWeight); // Keep using existing function
+    
+    // Toggle view mode button
+    document.getElementById('toggleViewMode').addEventListener('click', toggleOpenTicketsView); // Keep using existing function
+    
+    // Manual ticket creation via quick inline panel
+    document.getElementById('createQuickTicket').addEventListener('click', createQuickTicket); // Keep using existing function
+    
+    // Button to show the quick inline manual input panel
+    document.querySelector('button[data-bs-target="#manualTicketModal"]').addEventListener('click', function(event) {
+        // This button originally toggled the modal, let's change it to show the inline panel
+        event.preventDefault(); // Prevent modal from showing
+        toggleManualInputPanel(true); // Show the inline panel
+        UIControls.switchToTab('status-tab'); // Switch back to status tab if needed
+    });
+    
+    // Cancel button for the quick inline manual input panel
+    document.getElementById('cancelManualInput').addEventListener('click', function() {
+        toggleManualInputPanel(false); // Hide the inline panel
+    });
+    
+    // Manual ticket creation from the modal
+    document.getElementById('submitManualTicket').addEventListener('click', async function() {
+        const form = document.getElementById('manualTicketForm');
+        if (!form.checkValidity()) {
+            form.reportValidity();
+            return;
+        }
+        
+        const rfidCard = document.getElementById('customerSelect').value;
+        const weight = parseFloat(document.getElementById('manualWeight').value);
+
+        if (!rfidCard) {
+             UIControls.showAlert('Please select a customer.', 'warning');
+             return;
+        }
+         if (isNaN(weight) || weight <= 0) {
+             UIControls.showAlert('Please enter a valid positive weight.', 'warning');
+             return;
+        }
+        
+        // Use TicketManager to create ticket
+        UIControls.toggleLoadingState('submitManualTicket', true);
+        try {
+            // createTicket handles reload on success
+            await TicketManager.createTicket(rfidCard, weight); 
+            // Hide modal only if creation was successful (reload happens anyway)
+            // manualTicketModal.hide(); // Might hide too early before reload
+            form.reset(); // Reset form fields
+        } catch (error) {
+             // Error already handled by createTicket (shows alert)
+             console.error("Manual ticket creation failed:", error);
+        } finally {
+             UIControls.toggleLoadingState('submitManualTicket', false);
+        }
+    });
+
+    // Load the next page of closed tickets
+    document.getElementById('loadMoreTickets').addEventListener('click', loadMoreClosedTickets);
+
+    // Apply initial view mode
+    applyViewMode(isGridView); // Call function to set initial state
+});
+
+// --- Helper functions specific to tickets.html ---
+
+function toggleManualInputPanel(show) {
+    const statusPanel = document.getElementById('statusPanel');
+    const manualInputPanel = document.getElementById('manualInputPanel');
+    
+    if (show) {
+        if (statusPanel) statusPanel.style.display = 'none';
+        if (manualInputPanel) manualInputPanel.style.display = 'block';
+        // Focus the customer select when shown
+        document.getElementById('manualCustomerSelect')?.focus();
+    } else {
+        if (statusPanel) statusPanel.style.display = 'block'; // Or 'flex' if it was originally
+        if (manualInputPanel) manualInputPanel.style.display = 'none';
+        // Clear inputs when hiding
+        document.getElementById('manualCustomerSelect').value = '';
+        document.getElementById('quickInitialWeight').value = '';
+    }
+}
+
+// Refactored view mode logic
+function applyViewMode(isGrid) {
+     const openTickets = document.getElementById('openTickets');
+     const ticketContainers = document.querySelectorAll('.ticket-container');
+     const toggleButton = document.getElementById('toggleViewMode');
+
+     if (!openTickets || !toggleButton) return; // Elements not found
+
+     if (isGrid) {
+        // Grid view
+        openTickets.classList.add('d-flex', 'flex-wrap');
+        openTickets.classList.remove('flex-column'); // Ensure column class is removed
+        ticketContainers.forEach(container => {
+            container.classList.remove('col-12');
+            container.classList.add('col-md-4', 'col-lg-3'); // Adjust grid columns
+        });
+        toggleButton.innerHTML = '<i class="bi bi-list"></i> List View';
+    } else {
+        // List view
+        openTickets.classList.remove('d-flex', 'flex-wrap');
+        openTickets.classList.add('flex-column'); // Use flex-column for list stacking
+        ticketContainers.forEach(container => {
+            container.classList.remove('col-md-4', 'col-lg-3');
+            container.classList.add('col-12');
+        });
+        toggleButton.innerHTML = '<i class="bi bi-grid"></i> Grid View';
+    }
+}
+
+function toggleOpenTicketsView() {
+    isGridView = !isGridView;
+    applyViewMode(isGridView);
+}
+
+
+function createQuickTicket() {
+    const rfidCard = document.getElementById('manualCustomerSelect').value;
+    const weightInput = document.getElementById('quickInitialWeight');
+    const weight = parseFloat(weightInput.value);
+    
+    if (!rfidCard) {
+        UIControls.showAlert('Please select a customer.', 'warning');
+        return;
+    }
+    
+    if (isNaN(weight) || weight <= 0) {
+         UIControls.showAlert('Please enter a valid positive weight.', 'warning');
+         weightInput.focus();
+        return;
+    }
+    
+    // Use TicketManager, it handles alerts and reload
+    TicketManager.createTicket(rfidCard, weight);
+    // Hide panel after initiating creation (reload will happen on success)
+    toggleManualInputPanel(false);
+}
+
+function createTicketWithCurrentWeight(rfidCard) {
+    const weight = WeightScale.getLastWeight();
+    if (isNaN(weight) || weight <= 0) {
+        UIControls.showAlert('Invalid weight reading from scale. Cannot create ticket.', 'danger');
+        return;
+    }
+    
+    // Use TicketManager
+    TicketManager.createTicket(rfidCard, weight);
+}
+
+function closeTicketWithCurrentWeight(ticketId) {
+    const weight = WeightScale.getLastWeight();
+    if (isNaN(weight) || weight <= 0) {
+         UIControls.showAlert('Invalid weight reading from scale. Cannot close ticket.', 'danger');
+        return;
+    }
+    
+    // Use TicketManager
+    TicketManager.closeTicket(ticketId, weight);
+}
+
+// Function to show the manual weight modal (called by button onclick)
+function showManualWeightInput(ticketId) {
+    document.getElementById('manualWeightTicketId').value = ticketId;
+    const weightInput = document.getElementById('manualTareWeight');
+    weightInput.value = ''; // Clear previous input
+    manualWeightModal.show();
+    // Focus input when modal is shown
+    weightInput.focus();
+}
+
+// Function to submit manual weight from modal
+async function submitManualWeight() {
+    const ticketId = document.getElementById('manualWeightTicketId').value;
+    const weightInput = document.getElementById('manualTareWeight');
+    const tareWeight = parseFloat(weightInput.value);
+    
+    if (isNaN(tareWeight) || tareWeight <= 0) {
+        UIControls.showAlert('Please enter a valid positive weight.', 'warning');
+        weightInput.focus();
+        return;
+    }
+    
+    // Use TicketManager, it handles alerts, reload, and hides modal implicitly via reload
+    await TicketManager.closeTicket(ticketId, tareWeight);
+    // Hide modal manually in case reload fails or is delayed
+    manualWeightModal.hide();
+}
+
+// Function to initiate printing (called by button onclick)
+function printTicketReceipt(ticketId) {
+    // Use TicketManager
+    TicketManager.printReceipt(ticketId);
+}
+
+// Fetch the next page of closed tickets (same filters as the page) and append it
+async function loadMoreClosedTickets() {
+    const button = document.getElementById('loadMoreTickets');
+    const params = new URLSearchParams(new FormData(document.getElementById('closedTicketsFilter')));
+    params.set('status', 'closed');
+    params.set('before', button.dataset.nextCursor);
+
+    UIControls.toggleLoadingState('loadMoreTickets', true);
+    try {
+        const response = await fetch(`/api/tickets?${params.toString()}`);
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error || `Server error: ${response.status}`);
+        }
+
+        const tableBody = document.getElementById('closedTickets');
+        data.tickets.forEach(ticket => {
+            const row = document.createElement('tr');
+            const closedAt = ticket.closed_at ? ticket.closed_at.replace('T', ' ').slice(0, 19) : '';
+            row.innerHTML = `
+                <td class="fw-medium">${ticket.id}</td>
+                <td></td>
+                <td>${ticket.gross_weight.toFixed(2)} kg</td>
+                <td>${ticket.tare_weight.toFixed(2)} kg</td>
+                <td class="fw-bold">${ticket.net_weight.toFixed(2)} kg</td>
+                <td>${closedAt}</td>
+                <td>
+                    <button type="button" class="btn btn-sm btn-primary me-1" 
+                            onclick="printTicketReceipt('${ticket.id}')">
+                        <i class="bi bi-printer"></i>
+                    </button>
+                    <button type="button" class="btn btn-sm btn-danger" 
+                            onclick="confirmDeleteTicket('${ticket.id}')">
+                        <i class="bi bi-trash"></i>
+                    </button>
+                </td>
+            `;
+            row.cells[1].textContent = ticket.customer_name;
+            tableBody.appendChild(row);
+        });
+
+        button.dataset.nextCursor = data.next_cursor || '';
+        if (!data.next_cursor) {
+            button.style.display = 'none';
+        }
+    } catch (error) {
+        console.error('Error loading tickets:', error);
+        UIControls.showAlert(error.message || 'Error loading tickets', 'danger');
+    } finally {
+        UIControls.toggleLoadingState('loadMoreTickets', false);
+    }
+}
+
+// Function to show delete confirmation modal (called by button onclick)
+function confirmDeleteTicket(ticketId) {
+    deleteTicketId = ticketId; // Store the ID for the confirmation button
+    document.getElementById('deleteTicketId').textContent = ticketId; // Update modal text
+    deleteTicketModal.show();
+}
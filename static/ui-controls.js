@@ -11,8 +11,8 @@ const UIControls = (function() {
         // Set up tab switching functionality
         setupTabs();
         
-        // Set up event listeners for action buttons
-        setupEventListeners();
+        // Set up event listeners for action buttons (data-action)
+        setupActionEventListeners(); // Renamed for clarity
     }
     
     // Set up tab switching functionality
@@ -22,96 +22,82 @@ const UIControls = (function() {
         tabs.forEach(tab => {
             tab.addEventListener('shown.bs.tab', function(e) {
                 activeTab = e.target.id;
-                
                 // Save the active tab in localStorage for persistence
-                localStorage.setItem('activeTab', activeTab);
+                try {
+                    localStorage.setItem('activeTab', activeTab);
+                } catch (e) {
+                    console.warn("Could not save active tab to localStorage:", e);
+                }
             });
         });
         
         // Restore active tab from localStorage if available
-        const savedTab = localStorage.getItem('activeTab');
-        if (savedTab) {
-            const tabElement = document.getElementById(savedTab);
-            if (tabElement) {
-                const tab = new bootstrap.Tab(tabElement);
-                tab.show();
+        try {
+            const savedTab = localStorage.getItem('activeTab');
+            if (savedTab) {
+                const tabElement = document.getElementById(savedTab);
+                if (tabElement && bootstrap.Tab.getInstance(tabElement)) {
+                     bootstrap.Tab.getInstance(tabElement).show();
+                } else if (tabElement) {
+                     new bootstrap.Tab(tabElement).show();
+                }
             }
+        } catch (e) {
+             console.warn("Could not restore active tab from localStorage:", e);
         }
     }
     
-    // Set up event listeners
-    function setupEventListeners() {
-        // Quick action button events
-        document.querySelectorAll('[data-action]').forEach(btn => {
-            btn.addEventListener('click', function() {
-                const action = this.getAttribute('data-action');
-                const params = {};
-                
-                // Extract data attributes as parameters
-                Object.keys(this.dataset).forEach(key => {
-                    if (key !== 'action') {
-                        params[key] = this.dataset[key];
-                    }
-                });
+    // Set up event listeners for elements with data-action attribute
+    function setupActionEventListeners() {
+        // Use event delegation on a parent container if possible, e.g., document.body
+        document.body.addEventListener('click', function(event) {
+            const button = event.target.closest('[data-action]'); // Find closest button with data-action
+            if (button) {
+                const action = button.getAttribute('data-action');
+                const params = { ...button.dataset }; // Copy dataset
+                delete params.action; // Remove action itself from params
                 
-                handleAction(action, params, this);
-            });
+                handleAction(action, params, button);
+            }
         });
-        
-        // Quick customer select change
+
+        // Keep specific listeners if needed, but data-action is more generic
+        // Example: Quick customer select change (if not handled by data-action)
         const quickCustomerSelect = document.getElementById('quickCustomerSelect');
         if (quickCustomerSelect) {
             quickCustomerSelect.addEventListener('change', function() {
                 const cardId = this.value;
-                if (cardId) {
+                if (cardId && typeof TicketManager !== 'undefined') {
                     const openTicket = TicketManager.getOpenTicketForCard(cardId);
                     if (openTicket) {
                         TicketManager.highlightOpenTicket(openTicket.id);
+                    } else {
+                         // Optionally clear highlight if no open ticket
+                         TicketManager.highlightOpenTicket(null);
                     }
+                } else if (typeof TicketManager !== 'undefined') {
+                     TicketManager.highlightOpenTicket(null); // Clear highlight if no customer selected
                 }
             });
         }
     }
     
-    // Handle UI actions
+    // Handle UI actions triggered by data-action attribute
     function handleAction(action, params, element) {
+        console.log(`Handling action: ${action}`, params); // Debug log
         switch (action) {
             case 'print-ticket':
-                if (params.ticketId) {
-                    toggleLoadingState(element.id, true);
-                    TicketManager.printReceipt(params.ticketId)
-                        .finally(() => toggleLoadingState(element.id, false));
+                if (params.ticketId && typeof TicketManager !== 'undefined') {
+                    // Loading state handled within printReceipt now
+                    TicketManager.printReceipt(params.ticketId);
                 }
                 break;
                 
             case 'delete-ticket':
-                if (params.ticketId) {
-                    // Show confirmation modal
-                    const modal = document.getElementById('deleteConfirmModal');
-                    if (modal) {
-                        const bsModal = new bootstrap.Modal(modal);
-                        
-                        // Set ticket ID in confirm button
-                        const confirmBtn = document.getElementById('confirmDeleteBtn');
-                        if (confirmBtn) {
-                            confirmBtn.dataset.ticketId = params.ticketId;
-                            
-                            // Set up one-time event handler for confirmation
-                            confirmBtn.onclick = function() {
-                                toggleLoadingState('confirmDeleteBtn', true);
-                                TicketManager.deleteTicket(params.ticketId)
-                                    .then(success => {
-                                        if (success) {
-                                            bsModal.hide();
-                                            showAlert('Ticket deleted successfully', 'success');
-                                            setTimeout(() => location.reload(), 1000);
-                                        }
-                                    })
-                                    .finally(() => toggleLoadingState('confirmDeleteBtn', false));
-                            };
-                        }
-                        
-                        bsModal.show();
+                if (params.ticketId && typeof TicketManager !== 'undefined') {
+                    // Use the existing confirmDeleteTicket function which shows the modal
+                    if (typeof confirmDeleteTicket === 'function') {
+                        confirmDeleteTicket(params.ticketId);
                     }
                 }
                 break;
@@ -121,9 +107,23 @@ const UIControls = (function() {
                     switchToTab(params.tabId);
                 }
                 break;
-                
+
+            case 'show-manual-weight':
+                 if (params.ticketId && typeof showManualWeightInput === 'function') {
+                     showManualWeightInput(params.ticketId);
+                 }
+                 break;
+
+            case 'toggle-view':
+                 if (typeof toggleOpenTicketsView === 'function') {
+                     toggleOpenTicketsView();
+                 }
+                 break;
+                 
+            // Add more actions as needed
+
             default:
-                console.warn(`Unknown action: ${action}`);
+                console.warn(`Unknown UI action: ${action}`);
         }
     }
     
@@ -131,29 +131,38 @@ const UIControls = (function() {
     function switchToTab(tabId) {
         const tabElement = document.getElementById(tabId);
         if (tabElement) {
-            const tab = new bootstrap.Tab(tabElement);
-            tab.show();
+             const tabInstance = bootstrap.Tab.getInstance(tabElement) || new bootstrap.Tab(tabElement);
+             tabInstance.show();
+        } else {
+            console.warn(`Tab element not found: ${tabId}`);
         }
     }
     
     // Toggle a loading spinner on an element
     function toggleLoadingState(elementId, isLoading) {
         const element = document.getElementById(elementId);
-        if (!element) return;
+        if (!element) {
+            // console.warn(`Element not found for loading state: ${elementId}`);
+            return;
+        }
         
         const originalContent = element.getAttribute('data-original-content') || element.innerHTML;
         
         if (isLoading) {
-            // Save original content
-            element.setAttribute('data-original-content', originalContent);
-            
-            // Add spinner
-            element.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> Loading...';
-            element.disabled = true;
+            // Save original content only if not already loading
+            if (!element.disabled) {
+                 element.setAttribute('data-original-content', originalContent);
+                 // Add spinner
+                 element.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> Working...';
+                 element.disabled = true;
+            }
         } else {
-            // Restore original content
-            element.innerHTML = originalContent;
-            element.disabled = false;
+            // Restore original content only if currently loading
+            if (element.disabled) {
+                 element.innerHTML = element.getAttribute('data-original-content') || 'Action'; // Fallback text
+                 element.disabled = false;
+                 element.removeAttribute('data-original-content'); // Clean up attribute
+            }
         }
     }
     
@@ -161,47 +170,51 @@ const UIControls = (function() {
     function showAlert(message, type = 'info', duration = 3000) {
         if (!message) return;
         
-        // Clear any existing alerts
-        clearTimeout(alertTimeout);
+        // Clear any existing timeout for auto-dismissal
+        if (alertTimeout) clearTimeout(alertTimeout);
         
-        // Create or update the alert container
+        // Get or create the alert container
         let alertContainer = document.getElementById('alertContainer');
         if (!alertContainer) {
             alertContainer = document.createElement('div');
             alertContainer.id = 'alertContainer';
+            // Styling for top-right corner
             alertContainer.style.position = 'fixed';
-            alertContainer.style.top = '10px';
-            alertContainer.style.right = '10px';
-            alertContainer.style.zIndex = '9999';
+            alertContainer.style.top = '20px'; // More space from top
+            alertContainer.style.right = '20px';
+            alertContainer.style.zIndex = '1056'; // Ensure it's above modals (Bootstrap modal z-index is 1055)
+            alertContainer.style.maxWidth = '350px'; // Limit width
             document.body.appendChild(alertContainer);
         }
         
         // Create the alert element
         const alertEl = document.createElement('div');
-        alertEl.className = `alert alert-${type} alert-dismissible fade show`;
+        alertEl.className = `alert alert-${type} alert-dismissible fade show m-2`; // Added margin
         alertEl.role = 'alert';
-        alertEl.style.minWidth = '250px';
-        alertEl.style.boxShadow = '0 4px 8px rgba(0,0,0,0.1)';
+        alertEl.style.boxShadow = '0 4px 8px rgba(0,0,0,0.15)'; // Slightly stronger shadow
         
         alertEl.innerHTML = `
             ${message}
             <button type="button" class="btn-close" data-bs-dismiss="alert" aria-label="Close"></button>
         `;
         
-        // Add to container
-        alertContainer.appendChild(alertEl);
+        // Prepend to container so newest alerts are on top
+        alertContainer.prepend(alertEl);
         
-        // Set up the Bootstrap alert
+        // Initialize Bootstrap alert component
         const bsAlert = new bootstrap.Alert(alertEl);
         
-        // Auto dismiss after duration
-        alertTimeout = setTimeout(() => {
-            bsAlert.close();
-        }, duration);
+        // Auto dismiss after duration (if duration is positive)
+        if (duration > 0) {
+            alertTimeout = setTimeout(() => {
+                bsAlert.close();
+            }, duration);
+        }
         
-        // Remove from DOM after hidden
+        // Optional: Remove from DOM after fade out transition completes
         alertEl.addEventListener('closed.bs.alert', function() {
-            alertContainer.removeChild(alertEl);
+            alertEl.remove(); // Use remove() for modern browsers
+            // If container is empty, remove it? Maybe not, keep it for future alerts.
         });
     }
     
@@ -213,8 +226,3 @@ const UIControls = (function() {
         switchToTab: switchToTab
     };
 })();
-
-// Initialize UI Controls when the DOM is ready
-document.addEventListener('DOMContentLoaded', function() {
-    UIControls.init();
-});
\ No newline at end of file
@@ -9,15 +9,15 @@ const WeightScale = (function() {
     let weightDisplayId = '';
     let containerDisplayId = '';
     let lastWeight = 0;
-    let monitorInterval = null;
+    let unsubscribe = null;
     let connectionAttempts = 0;
     
     // Initialize the module
-    function init(weightToggleId, weightStatusId, currentWeightId, containerDisplayId) {
+    function init(weightToggleId, weightStatusId, currentWeightId, weightContainerDisplayId) {
         toggleId = weightToggleId;
         statusTextId = weightStatusId;
         weightDisplayId = currentWeightId;
-        containerDisplayId = containerDisplayId;
+        containerDisplayId = weightContainerDisplayId; // Corrected variable name
         
         // Initialize to disconnected state
         updateConnectionStatus(false);
@@ -30,12 +30,13 @@ const WeightScale = (function() {
     
     // Start monitoring the weight scale
     function startMonitoring() {
-        if (monitorInterval) {
-            clearInterval(monitorInterval);
+        if (unsubscribe) {
+            unsubscribe();
         }
         
-        // Poll the weight scale every second
-        monitorInterval = setInterval(readWeight, 1000);
+        // Weight changes are pushed by the server
+        unsubscribe = LiveChannel.on('weight', handleWeightEvent);
+        LiveChannel.on('status', handleChannelStatus);
     }
     
     // Update connection status UI
@@ -56,32 +57,30 @@ const WeightScale = (function() {
         }
     }
     
-    // Read weight from the scale
-    async function readWeight() {
-        try {
-            const response = await fetch('/api/weight/read');
-            if (!response.ok) {
-                throw new Error(`HTTP error! status: ${response.status}`);
-            }
-            
-            // Update connection status - we're connected if we got here
-            updateConnectionStatus(true);
+    // Handle a weight update pushed by the server
+    function handleWeightEvent(data) {
+        connectionAttempts = 0;
+        updateConnectionStatus(data.connected);
+        
+        if (data.weight !== null && data.weight !== undefined) { // Check if weight property exists
+            updateWeightDisplay(data.weight);
+        } else if (!data.connected) {
+            showErrorInDisplay();
+        }
+    }
+    
+    // Handle the live channel connecting or dropping
+    function handleChannelStatus(isConnected) {
+        if (isConnected) {
             connectionAttempts = 0;
-            
-            const data = await response.json();
-            
-            if (data.weight) {
-                updateWeightDisplay(data.weight);
-            }
-        } catch (error) {
-            console.error('Error reading weight:', error);
-            
-            // Update connection status on repeated failures
-            connectionAttempts++;
-            if (connectionAttempts >= 3) {
-                updateConnectionStatus(false);
-                showErrorInDisplay();
-            }
+            return;
+        }
+        
+        // Update connection status on repeated failures
+        connectionAttempts++;
+        if (connectionAttempts >= 3) {
+            updateConnectionStatus(false);
+            showErrorInDisplay();
         }
     }
     
@@ -98,23 +97,24 @@ const WeightScale = (function() {
         weightElement.textContent = roundedWeight;
         
         // Add a subtle flash effect to show the reading is live
-        weightElement.classList.add('text-light');
-        setTimeout(() => {
-            weightElement.classList.remove('text-light');
-            weightElement.classList.add('text-success');
-        }, 100);
+        const container = document.getElementById(containerDisplayId);
+        if (container) {
+            container.classList.add('reading-update');
+            setTimeout(() => {
+                container.classList.remove('reading-update');
+            }, 200); // Match CSS transition duration if any
+        }
     }
     
     // Show error in the digital display
     function showErrorInDisplay() {
         const digitalDisplay = document.getElementById(containerDisplayId);
         if (digitalDisplay) {
-            digitalDisplay.innerHTML = `
-                <div class="alert alert-danger py-2 mb-0">
-                    <i class="bi bi-exclamation-triangle-fill me-2"></i>
-                    Error connecting to weight scale
-                </div>
-            `;
+            // Preserve structure but show error
+            const weightElement = document.getElementById(weightDisplayId);
+            if (weightElement) weightElement.textContent = 'ERR';
+            // Optionally add an error message elsewhere or change styles
+            console.error("Error connecting to weight scale shown in UI");
         }
     }
     
@@ -128,4 +128,4 @@ const WeightScale = (function() {
         init: init,
         getLastWeight: getLastWeight
     };
-})();
\ No newline at end of file
+})();
@@ -0,0 +1,240 @@
+import gzip
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+from sqlalchemy import event, inspect, delete, insert, select, func
+
+import metrics
+from models import db, Customer, WeightTicket, SyncOutbox
+from reports import previous_value
+
+# Changes per POST; a batch is one gzip-compressed JSON document
+DEFAULT_BATCH_SIZE = 500
+# How often the shipper looks for new changes when the outbox was empty
+DEFAULT_INTERVAL = 15.0
+# Retry delays grow as BASE_RETRY_DELAY * 2^failures, capped at MAX_RETRY_DELAY
+BASE_RETRY_DELAY = 5.0
+MAX_RETRY_DELAY = 600.0
+# Seconds a POST may take before it counts as a failure
+DEFAULT_TIMEOUT = 30.0
+
+outbox = SyncOutbox.__table__
+
+
+def ticket_payload(ticket):
+    data = ticket.to_dict()
+    data['customer_id'] = ticket.customer_id
+    return data
+
+
+def _entry(entity, entity_id, op, payload=None):
+    return {'entity': entity, 'entity_id': entity_id, 'op': op,
+            'payload': json.dumps(payload, separators=(',', ':')) if payload is not None else None,
+            'created_at': datetime.utcnow()}
+
+
+def _collect(session):
+    # Closed tickets and every customer change; open tickets stay local
+    entries = []
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Customer):
+            if obj in session.new or session.is_modified(obj, include_collections=False):
+                entries.append(_entry('customer', obj.id, 'upsert', obj.to_dict()))
+        elif isinstance(obj, WeightTicket):
+            if obj.status == 'closed':
+                if obj in session.new or session.is_modified(obj, include_collections=False):
+                    entries.append(_entry('ticket', obj.id, 'upsert', ticket_payload(obj)))
+            elif obj not in session.new and previous_value(inspect(obj), 'status') == 'closed':
+                # Reopened: head office should no longer count it
+                entries.append(_entry('ticket', obj.id, 'delete'))
+
+    for obj in session.deleted:
+        if isinstance(obj, Customer):
+            entries.append(_entry('customer', obj.id, 'delete'))
+        elif isinstance(obj, WeightTicket) and previous_value(inspect(obj), 'status') == 'closed':
+            entries.append(_entry('ticket', obj.id, 'delete'))
+    return entries
+
+
+def _journal_changes(session, flush_context):
+    entries = _collect(session)
+    if entries:
+        # Same connection as the flush: the outbox commits or rolls back with the change
+        session.connection().execute(insert(outbox), entries)
+
+
+def track_sync(session=None):
+    event.listen(session or db.session, 'after_flush', _journal_changes)
+
+
+def tracking(session=None):
+    return event.contains(session or db.session, 'after_flush', _journal_changes)
+
+
+def journal_customers(customer_ids, session=None):
+    """Journal customers written with bulk statements, which bypass the flush hook."""
+    session = session or db.session
+    if not tracking(session):
+        return
+    customers = session.query(Customer).filter(Customer.id.in_(customer_ids)).all() if customer_ids else []
+    if customers:
+        session.execute(insert(outbox), [_entry('customer', c.id, 'upsert', c.to_dict()) for c in customers])
+
+
+def backfill(session=None, chunk_size=DEFAULT_BATCH_SIZE):
+    """Journal every customer and closed ticket, e.g. when sync is first switched on."""
+    session = session or db.session
+    count = 0
+    for model, entity, payload, criteria in (
+            (Customer, 'customer', Customer.to_dict, ()),
+            (WeightTicket, 'ticket', ticket_payload, (WeightTicket.status == 'closed',))):
+        last_id = 0
+        while True:
+            rows = session.query(model).filter(model.id > last_id, *criteria) \
+                .order_by(model.id).limit(chunk_size).all()
+            if not rows:
+                break
+            session.execute(insert(outbox), [_entry(entity, row.id, 'upsert', payload(row)) for row in rows])
+            session.commit()
+            count += len(rows)
+            last_id = rows[-1].id
+            session.expunge_all()
+    return count
+
+
+class SyncShipper:
+    """Ships the outbox to head office in idempotent, compressed batches.
+
+    Journaling happens in the writer's own transaction (see track_sync);
+    this background thread only reads the outbox, so a slow or missing
+    network never holds up a weighing. Each batch carries the site and the
+    outbox id range as ``batch_id``, and every change its outbox ``seq``,
+    so a batch resent after a lost response is recognised by the receiver.
+    Acknowledged rows are deleted; the oldest remaining row is the
+    checkpoint, so shipping resumes where it stopped after a restart or an
+    outage, retrying with exponential backoff meanwhile.
+    """
+
+    def __init__(self, app, url, site, batch_size=DEFAULT_BATCH_SIZE, interval=DEFAULT_INTERVAL,
+                 timeout=DEFAULT_TIMEOUT, token=None):
+        self.app = app
+        self.url = url
+        self.site = site
+        self.batch_size = batch_size
+        self.interval = interval
+        self.timeout = timeout
+        self.token = token
+        self.running = False
+        self.thread = None
+        self.wakeup = threading.Event()
+        self.failures = 0
+        self.last_error = None
+        self.last_success = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='sync-shipper')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+        if self.thread:
+            self.thread.join(timeout=self.timeout + 5)
+
+    def wake(self):
+        self.wakeup.set()
+
+    def pending(self):
+        return db.session.query(func.count(SyncOutbox.id)).scalar()
+
+    def health(self):
+        # Needs an app context
+        oldest = db.session.query(func.min(SyncOutbox.created_at)).scalar()
+        lag = (datetime.utcnow() - oldest).total_seconds() if oldest else None
+        return {
+            'ok': self.running and self.failures == 0,
+            'running': self.running,
+            'url': self.url,
+            'pending': self.pending(),
+            'oldest_pending_seconds': round(lag, 1) if lag is not None else None,
+            'failures': self.failures,
+            'error': self.last_error,
+            'last_success': self.last_success.isoformat() if self.last_success else None,
+        }
+
+    def _run(self):
+        with self.app.app_context():
+            while self.running:
+                try:
+                    shipped = self.ship_once()
+                except Exception as e:
+                    self.failures += 1
+                    self.last_error = str(e)
+                    metrics.SYNC_BATCHES.inc('error')
+                    delay = min(BASE_RETRY_DELAY * (2 ** (self.failures - 1)), MAX_RETRY_DELAY)
+                    print(f"Sync to {self.url} failed (attempt {self.failures}, retrying in {delay:.0f} s): {e}")
+                    db.session.rollback()
+                    self.wakeup.wait(delay)
+                    self.wakeup.clear()
+                    continue
+                finally:
+                    db.session.remove()
+                if shipped < self.batch_size:
+                    # Caught up; a full batch means more is waiting, so go again at once
+                    self.wakeup.wait(self.interval)
+                    self.wakeup.clear()
+
+    def ship_once(self):
+        """Send the oldest batch; returns the number of changes acknowledged."""
+        rows = db.session.execute(
+            select(outbox).order_by(outbox.c.id).limit(self.batch_size)).all()
+        db.session.rollback()  # Do not hold a read snapshot open during the POST
+        if not rows:
+            return 0
+        batch = {
+            'site': self.site,
+            'batch_id': f'{self.site}:{rows[0].id}-{rows[-1].id}',
+            'changes': [{
+                'seq': row.id,
+                'entity': row.entity,
+                'id': row.entity_id,
+                'op': row.op,
+                'data': json.loads(row.payload) if row.payload else None,
+                'changed_at': row.created_at.isoformat() if row.created_at else None,
+            } for row in rows],
+        }
+        started = time.perf_counter()
+        self._post(batch)
+        metrics.SYNC_SECONDS.observe(time.perf_counter() - started)
+        db.session.execute(delete(outbox).where(outbox.c.id <= rows[-1].id))
+        db.session.commit()
+        metrics.SYNC_BATCHES.inc('ok')
+        metrics.SYNC_CHANGES.inc(amount=len(rows))
+        self.failures = 0
+        self.last_error = None
+        self.last_success = datetime.utcnow()
+        return len(rows)
+
+    def _post(self, batch):
+        body = gzip.compress(json.dumps(batch, separators=(',', ':')).encode('utf-8'))
+        headers = {
+            'Content-Type': 'application/json',
+            'Content-Encoding': 'gzip',
+            'Idempotency-Key': batch['batch_id'],
+        }
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        request = urllib.request.Request(self.url, data=body, headers=headers, method='POST')
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"HTTP {e.code}: {e.read()[:200].decode('utf-8', 'replace')}")
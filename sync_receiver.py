@@ -0,0 +1,135 @@
+"""Stand-in for the head-office sync endpoint, for testing sites locally.
+
+    python sync_receiver.py --port 8700 --db head_office.db [--fail-rate 0.3]
+
+then point SYNC_URL at http://127.0.0.1:8700/batches. Batches are applied
+to a SQLite file keyed by (site, entity, id); a change only replaces a
+row when its ``seq`` is newer, and a batch_id already seen is
+acknowledged without being applied again, so resends are harmless.
+GET / shows what has arrived per site.
+"""
+import argparse
+import gzip
+import json
+import random
+import sqlite3
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS batch (
+    batch_id TEXT PRIMARY KEY,
+    site TEXT NOT NULL,
+    changes INTEGER NOT NULL,
+    received_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS record (
+    site TEXT NOT NULL,
+    entity TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    data TEXT,
+    changed_at TEXT,
+    PRIMARY KEY (site, entity, id)
+);
+"""
+
+
+class Receiver:
+    def __init__(self, path, fail_rate=0.0, token=None):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.fail_rate = fail_rate
+        self.token = token
+
+    def apply(self, batch):
+        # Returns (applied, duplicate); one transaction per batch
+        with self.lock, self.conn:
+            seen = self.conn.execute("SELECT 1 FROM batch WHERE batch_id = ?", (batch['batch_id'],)).fetchone()
+            if seen:
+                return 0, True
+            applied = 0
+            for change in batch['changes']:
+                cursor = self.conn.execute(
+                    "INSERT INTO record (site, entity, id, seq, deleted, data, changed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (site, entity, id) DO UPDATE SET seq = excluded.seq, "
+                    "deleted = excluded.deleted, data = excluded.data, changed_at = excluded.changed_at "
+                    "WHERE excluded.seq > record.seq",
+                    (batch['site'], change['entity'], change['id'], change['seq'], int(change['op'] == 'delete'),
+                     json.dumps(change['data']) if change.get('data') is not None else None,
+                     change.get('changed_at')))
+                applied += cursor.rowcount
+            self.conn.execute("INSERT INTO batch (batch_id, site, changes, received_at) VALUES (?, ?, ?, ?)",
+                              (batch['batch_id'], batch['site'], len(batch['changes']),
+                               datetime.utcnow().isoformat()))
+            return applied, False
+
+    def summary(self):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT site, entity, SUM(deleted = 0), SUM(deleted), MAX(seq) FROM record GROUP BY site, entity"
+            ).fetchall()
+            batches = self.conn.execute("SELECT site, COUNT(*) FROM batch GROUP BY site").fetchall()
+        sites = {site: {'batches': count} for site, count in batches}
+        for site, entity, live, deleted, last_seq in rows:
+            sites.setdefault(site, {})[entity] = {'rows': live, 'deleted': deleted, 'last_seq': last_seq}
+        return sites
+
+
+def make_handler(receiver):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self._reply(200, receiver.summary())
+
+        def do_POST(self):
+            if receiver.token and self.headers.get('Authorization') != f'Bearer {receiver.token}':
+                return self._reply(401, {'error': 'Bad token'})
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if random.random() < receiver.fail_rate:
+                # Simulated outage: the site must keep the batch and retry
+                return self._reply(503, {'error': 'Simulated failure'})
+            try:
+                if self.headers.get('Content-Encoding') == 'gzip':
+                    body = gzip.decompress(body)
+                batch = json.loads(body)
+                applied, duplicate = receiver.apply(batch)
+            except (ValueError, KeyError, OSError) as e:
+                return self._reply(400, {'error': str(e)})
+            self._reply(200, {'batch_id': batch['batch_id'], 'applied': applied, 'duplicate': duplicate})
+
+        def log_message(self, format, *args):
+            print(f"{self.address_string()} {format % args}")
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8700)
+    parser.add_argument('--db', default='head_office.db')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of batches answered with 503.')
+    parser.add_argument('--token', help='Require this bearer token (SYNC_TOKEN on the site).')
+    args = parser.parse_args()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(Receiver(args.db, args.fail_rate, args.token)))
+    print(f"Sync receiver on http://{args.host}:{args.port}/batches, storing in {args.db}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip('cups')
+
+from flask import Flask
+
+import print_spooler
+from models import db, PrintJob
+from print_spooler import PrintSpooler
+from printer import FakeCupsConnection, TicketPrinter
+
+TICKET = {'id': 7, 'customer_name': 'Acme Haulage', 'gross_weight': 15000.0, 'tare_weight': 5000.0,
+          'net_weight': 10000.0, 'closed_at': None}
+
+
+@pytest.fixture
+def app(tmp_path):
+    # A file, not :memory:, so the worker thread gets its own connection as in production
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'spool.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def connection():
+    return FakeCupsConnection()
+
+
+@pytest.fixture
+def spooler(app, connection):
+    spooler = PrintSpooler(app, TicketPrinter('Default', connection=connection), max_attempts=3)
+    yield spooler
+    spooler.stop()
+
+
+def make_due(job):
+    job.next_attempt_at = datetime.utcnow()
+    db.session.commit()
+
+
+def test_job_is_printed(spooler, connection):
+    job = spooler.submit_ticket(TICKET)
+    assert job.status == 'queued'
+    spooler._process(spooler._next_due_job())
+    assert job.status == 'done' and job.attempts == 1
+    assert [printed['title'] for printed in connection.jobs] == ['Weight Ticket #7']
+    assert connection.jobs[0]['data'] == job.payload
+
+
+def test_failure_is_retried_with_backoff(spooler, connection):
+    connection.fail_next = 1
+    job = spooler.submit_ticket(TICKET)
+    spooler._process(job)
+    assert job.status == 'queued'
+    assert 'offline' in job.last_error
+    assert job.next_attempt_at >= datetime.utcnow() + timedelta(seconds=print_spooler.BASE_RETRY_DELAY - 1)
+    assert spooler._next_due_job() is None  # Not due until the backoff has passed
+
+    make_due(job)
+    spooler._process(spooler._next_due_job())
+    assert job.status == 'done' and job.attempts == 2 and job.last_error is None
+    assert len(connection.jobs) == 1
+
+
+def test_gives_up_after_max_attempts_and_can_be_retried(spooler, connection):
+    connection.fail_next = 3
+    job = spooler.submit_ticket(TICKET)
+    for _ in range(3):
+        make_due(job)
+        spooler._process(job)
+    assert job.status == 'failed' and job.attempts == 3 and job.finished_at
+
+    spooler.retry(job)
+    assert job.status == 'queued' and job.attempts == 0
+    spooler._process(spooler._next_due_job())
+    assert job.status == 'done'
+
+
+def test_duplicate_submissions_reuse_the_pending_job(spooler):
+    first = spooler.submit_ticket(TICKET)
+    assert spooler.submit_ticket(TICKET).id == first.id
+    assert spooler.submit_customer_label({'id': 7, 'name': 'Acme', 'rfid_card': '1'}).id != first.id
+    assert PrintJob.query.count() == 2
+
+
+def test_reprint_after_the_job_printed_prints_again(spooler, connection):
+    first = spooler.submit_ticket(TICKET)
+    spooler._process(first)
+    again = spooler.submit_ticket(TICKET)
+    assert again.id != first.id and again.status == 'queued'
+
+
+def test_jobs_go_to_their_lane_printer(app, connection):
+    outbound = FakeCupsConnection()
+    printers = {'Outbound': TicketPrinter('Outbound', connection=outbound)}
+    spooler = PrintSpooler(app, TicketPrinter('Default', connection=connection), printers=printers)
+    spooler._process(spooler.submit_ticket(TICKET, printer='Outbound'))
+    spooler._process(spooler.submit_customer_label({'id': 1, 'name': 'Acme', 'rfid_card': '1'}, printer='Gone'))
+    assert [job['printer'] for job in outbound.jobs] == ['Outbound']
+    assert [job['printer'] for job in connection.jobs] == ['Default']
+
+
+def test_worker_drains_the_queue(spooler, connection):
+    spooler.start()
+    job_id = spooler.submit_ticket(TICKET).id
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        db.session.expire_all()
+        if db.session.get(PrintJob, job_id).status == 'done':
+            break
+        time.sleep(0.02)
+    assert db.session.get(PrintJob, job_id).status == 'done'
+    assert spooler.health()['queued'] == 0
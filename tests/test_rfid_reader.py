@@ -0,0 +1,124 @@
+import queue
+import time
+
+import pytest
+
+pytest.importorskip('evdev')
+
+import rfid_reader
+from rfid_events import ScanLog
+from rfid_reader import FakeInputDevice, RFIDReader
+
+
+class UnpluggableDevice(FakeInputDevice):
+    def unplug(self):
+        self.unplugged = True
+        self.inject(0)  # Wake the selector so the loop reads and fails
+
+    def read(self):
+        if getattr(self, 'unplugged', False):
+            raise OSError(19, 'No such device')
+        return super().read()
+
+
+@pytest.fixture
+def scans():
+    return queue.Queue()
+
+
+@pytest.fixture
+def reader(scans):
+    reader = RFIDReader(hotplug=False)
+    reader.find_reader = lambda: None  # Only fake devices, never real /dev/input nodes
+    yield reader
+    reader.stop()
+
+
+def start(reader, scans):
+    reader.start(lambda card_id, device: scans.put((card_id, device)))
+
+
+def next_scan(scans):
+    return scans.get(timeout=2)
+
+
+def test_card_read_reaches_callback_with_its_device(reader, scans):
+    device = FakeInputDevice()
+    reader.add_device(device)
+    start(reader, scans)
+    device.send_card('0012345678')
+    assert next_scan(scans) == ('0012345678', device)
+    assert device.grabbed
+
+
+def test_readers_are_read_independently(reader, scans):
+    east = FakeInputDevice(name='East RFID', path='/dev/input/fake1')
+    west = FakeInputDevice(name='West RFID', path='/dev/input/fake2')
+    reader.add_device(east)
+    reader.add_device(west)
+    start(reader, scans)
+    east.send_card('111')
+    assert next_scan(scans) == ('111', east)
+    west.send_card('222')
+    assert next_scan(scans) == ('222', west)
+
+
+def test_device_added_while_running_is_picked_up(reader, scans):
+    start(reader, scans)
+    device = FakeInputDevice()
+    reader.add_device(device)
+    device.send_card('42')
+    assert next_scan(scans) == ('42', device)
+    assert reader.health()['devices'] == [{'name': device.name, 'path': device.path}]
+
+
+def test_unplugged_device_is_dropped_and_others_keep_working(reader, scans):
+    gone = UnpluggableDevice(path='/dev/input/fake1')
+    stays = FakeInputDevice(path='/dev/input/fake2')
+    reader.add_device(gone)
+    reader.add_device(stays)
+    start(reader, scans)
+    gone.unplug()
+    deadline = time.monotonic() + 2
+    while len(reader.devices) > 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert list(reader.devices.values()) == [stays]
+    stays.send_card('7')
+    assert next_scan(scans) == ('7', stays)
+
+
+@pytest.mark.parametrize('hotplug', [False, True])
+def test_rescans_only_with_hotplug(monkeypatch, scans, hotplug):
+    monkeypatch.setattr(rfid_reader, 'RESCAN_INTERVAL', 0.02)
+    monkeypatch.setattr(rfid_reader, 'pyudev', None)
+    reader = RFIDReader(hotplug=hotplug)
+    calls = []
+    reader.find_reader = lambda: calls.append(time.monotonic())
+    start(reader, scans)
+    time.sleep(0.3)
+    reader.stop()
+    if hotplug:
+        assert len(calls) > 3
+    else:
+        assert len(calls) == 1  # The scan at startup only
+
+
+def test_scan_log_debounces_repeated_reads():
+    log = ScanLog(debounce=0.1)
+    first = log.publish('A')
+    assert first['seq'] == 1
+    assert log.publish('A') is None
+    assert log.publish('B')['seq'] == 2
+    time.sleep(0.15)
+    assert log.publish('A')['seq'] == 3
+    assert [event['card_id'] for event in log.since(0)] == ['A', 'B', 'A']
+
+
+def test_scan_log_latest_is_not_consumed_and_ages_out():
+    log = ScanLog(debounce=0)
+    assert log.latest() is None
+    event = log.publish('A')
+    assert log.latest() == event
+    assert log.latest() == event
+    event['timestamp'] -= 60
+    assert log.latest(max_age=10) is None
@@ -0,0 +1,92 @@
+import threading
+import time
+
+from scale import ScaleReader, SimulatedTransport, parse_frame
+
+WINDOW = 0.2
+
+
+def feed(scale, weights, interval=0.02, overload=False):
+    for weight in weights:
+        scale.add_sample(weight, overload)
+        time.sleep(interval)
+
+
+def make_scale():
+    return ScaleReader(SimulatedTransport(), stable_window=WINDOW, stable_tolerance=10.0)
+
+
+def test_parse_frame():
+    assert parse_frame(b"ST,GS,+0012345kg\r\n") == (12345.0, False)
+    assert parse_frame(b"US,NT,-  12.5 kg") == (-12.5, False)
+    assert parse_frame(b"OL,GS,+0099999kg") == (99999.0, True)
+    assert parse_frame(b"2.5t") == (2500.0, False)
+    assert parse_frame(b"garbage") is None
+
+
+def test_steady_readings_across_the_window_are_stable():
+    scale = make_scale()
+    feed(scale, [15000.0, 15004.0, 14998.0] * 5)
+    sample = scale.latest_stable()
+    assert sample is not None
+    assert sample.weight == 14998.0
+    assert scale.status()['stable']
+
+
+def test_readings_must_span_the_window():
+    scale = make_scale()
+    feed(scale, [15000.0] * 3, interval=0.01)
+    assert scale.latest_stable() is None
+    assert scale.status()['motion']
+
+
+def test_spread_beyond_tolerance_is_motion():
+    scale = make_scale()
+    feed(scale, [15000.0, 15020.0] * 8)
+    assert scale.latest_stable() is None
+
+
+def test_overload_is_never_stable():
+    scale = make_scale()
+    feed(scale, [15000.0] * 15, overload=True)
+    assert scale.latest_stable() is None
+    assert scale.status()['overload']
+
+
+def test_stability_is_lost_when_the_load_moves():
+    scale = make_scale()
+    feed(scale, [15000.0] * 15)
+    assert scale.latest_stable() is not None
+    scale.add_sample(9000.0)
+    assert scale.latest_stable() is None
+
+
+def test_wait_stable_wakes_when_the_deck_settles():
+    scale = make_scale()
+    assert scale.wait_stable(0.05) is None
+    thread = threading.Thread(target=feed, args=(scale, [8000.0] * 20))
+    thread.start()
+    try:
+        sample = scale.wait_stable(2.0)
+    finally:
+        thread.join()
+    assert sample is not None and sample.weight == 8000.0
+
+
+def test_window_returns_recent_samples_only():
+    scale = make_scale()
+    feed(scale, [1.0, 2.0, 3.0], interval=0.2)  # Taken 0.6, 0.4 and 0.2 s ago
+    assert [s.weight for s in scale.window(0.5)] == [2.0, 3.0]
+
+
+def test_reader_settles_on_simulated_indicator():
+    # Simulated deck at a fast frame rate: the reader thread parses frames and finds a settled load
+    scale = ScaleReader(SimulatedTransport(rate_hz=100.0, seed=1), stable_window=0.5)
+    scale.start()
+    try:
+        sample = scale.wait_stable(10.0)
+        assert sample is not None
+        assert scale.status()['connected']
+        assert scale.status()['source'] == 'simulated'
+    finally:
+        scale.stop()
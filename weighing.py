@@ -0,0 +1,171 @@
+import collections
+import threading
+import time
+from datetime import datetime
+
+import metrics
+import weight_trace
+from models import db, WeightTicket, WeightTrace
+
+# How long a tap waits for the scale to settle before giving up
+DEFAULT_STABLE_TIMEOUT = 5.0
+# Readings at or below this are an empty deck (or deck noise), not a truck
+DEFAULT_MIN_WEIGHT = 200.0
+# A close must weigh at least this much less than the gross (None: the scale's
+# stability tolerance), so a tap before unloading cannot close at net zero or below
+DEFAULT_MIN_NET = None
+# Seconds a ticket must have been open before a tap can close it
+DEFAULT_MIN_OPEN_SECONDS = 30.0
+# Results remembered per scan so repeated submissions return the first outcome
+RESULT_HISTORY = 256
+# Seconds of readings stored with each weighing, and the most samples per second kept
+DEFAULT_TRACE_SECONDS = 20.0
+DEFAULT_TRACE_MAX_HZ = 5.0
+
+
+class WeighingError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def receipt_data(ticket):
+    return {
+        'id': ticket.id,
+        'customer_name': ticket.customer.name,
+        'gross_weight': ticket.gross_weight,
+        'tare_weight': ticket.tare_weight,
+        'net_weight': ticket.net_weight,
+        'closed_at': ticket.closed_at
+    }
+
+
+class WeighingWorkflow:
+    """Turns a card tap into an opened or closed ticket in one transaction.
+
+    The first tap for a customer opens a ticket with the stable gross
+    weight; the next tap closes it with the tare weight and queues the
+    receipt in the same commit. Decisions are serialized, and a scan
+    already handled (same ``scan_seq``) returns its original result, so
+    several kiosks reacting to the same tap cannot open or close twice.
+
+    With several lanes there is one workflow per lane (its own scale, scan
+    sequence and receipt printer), all sharing one ``lock`` so a truck that
+    opened its ticket on one lane can close it on another.
+
+    The scale readings leading up to each capture (``trace_seconds`` of
+    them, thinned to ``trace_max_hz``) are stored with the ticket in the
+    same commit, so a disputed weight can be plotted later.
+    """
+
+    def __init__(self, scale, spooler, customers, stable_timeout=DEFAULT_STABLE_TIMEOUT,
+                 min_weight=DEFAULT_MIN_WEIGHT, lane=None, printer=None, lock=None,
+                 trace_seconds=DEFAULT_TRACE_SECONDS, trace_max_hz=DEFAULT_TRACE_MAX_HZ,
+                 min_net=DEFAULT_MIN_NET, min_open_seconds=DEFAULT_MIN_OPEN_SECONDS):
+        self.scale = scale
+        self.spooler = spooler
+        self.customers = customers
+        self.stable_timeout = stable_timeout
+        self.min_weight = min_weight
+        self.lane = lane
+        self.printer = printer
+        self.lock = lock or threading.Lock()
+        self.trace_seconds = trace_seconds
+        self.trace_max_hz = trace_max_hz
+        self.min_net = min_net
+        self.min_open_seconds = min_open_seconds
+        self.results = collections.OrderedDict()
+
+    def weigh(self, card_id, scan_seq=None):
+        if scan_seq is not None:
+            with self.lock:
+                if scan_seq in self.results:
+                    return dict(self.results[scan_seq], replayed=True)
+
+        entry = self.customers.lookup(card_id)
+        if entry is None:
+            raise WeighingError("Customer not found", 404)
+
+        # Settle outside the lock so a slow scale does not hold up other lanes
+        started = time.perf_counter()
+        sample = self.scale.wait_stable(self.stable_timeout)
+        metrics.SCALE_SETTLE_SECONDS.observe(time.perf_counter() - started, self.lane or '',
+                                             'stable' if sample else 'timeout')
+        if sample is None:
+            raise WeighingError("Scale did not settle; try again", 409)
+        if sample.overload:
+            raise WeighingError("Scale is overloaded", 409)
+        if sample.weight <= self.min_weight:
+            raise WeighingError("No load on the scale", 409)
+        trace = self._trace()
+
+        with self.lock:
+            # Another request may have handled this scan while we waited
+            if scan_seq is not None and scan_seq in self.results:
+                return dict(self.results[scan_seq], replayed=True)
+            try:
+                result = self._apply(entry['customer']['id'], sample.weight, trace)
+            except Exception:
+                db.session.rollback()
+                raise
+            if scan_seq is not None:
+                result['scan_seq'] = scan_seq
+                self.results[scan_seq] = result
+                while len(self.results) > RESULT_HISTORY:
+                    self.results.popitem(last=False)
+        if result['print_job_id']:
+            self.spooler.wake()
+        return result
+
+    def _trace(self):
+        # Never fail a weighing over its audit trail
+        if not self.trace_seconds:
+            return None
+        try:
+            samples = self.scale.window(self.trace_seconds)
+            return weight_trace.downsample(samples, self.trace_max_hz) if samples else None
+        except Exception as e:
+            print(f"Could not capture weight trace: {e}")
+            return None
+
+    def _check_close(self, ticket, weight):
+        # Sanity checks on the tare; the ticket stays open so the truck can tap again
+        open_seconds = (datetime.utcnow() - ticket.created_at).total_seconds() if ticket.created_at else None
+        if open_seconds is not None and open_seconds < self.min_open_seconds:
+            raise WeighingError(f"Ticket #{ticket.id} was opened {open_seconds:.0f} s ago; "
+                                f"tap again after unloading", 409)
+        min_net = self.min_net if self.min_net is not None else self.scale.stable_tolerance
+        if ticket.gross_weight - weight < min_net:
+            raise WeighingError(f"Scale reads {weight:.0f} kg, not below the {ticket.gross_weight:.0f} kg "
+                                f"gross of ticket #{ticket.id}; unload before weighing out", 409)
+
+    def _apply(self, customer_id, weight, trace=None):
+        ticket = WeightTicket.query.filter_by(customer_id=customer_id, status='open') \
+            .order_by(WeightTicket.id.desc()).first()
+        job = None
+        if ticket is None:
+            ticket = WeightTicket(customer_id=customer_id, gross_weight=weight, lane=self.lane)
+            db.session.add(ticket)
+            action = 'opened'
+            phase = 'gross'
+        else:
+            self._check_close(ticket, weight)
+            ticket.close_ticket(weight)
+            db.session.flush()
+            # The receipt comes out where the truck leaves
+            job = self.spooler.submit_ticket(receipt_data(ticket), commit=False, printer=self.printer)
+            action = 'closed'
+            phase = 'tare'
+        if trace:
+            ticket.traces.append(WeightTrace(phase=phase, lane=self.lane, sample_count=len(trace),
+                                             started_at=datetime.utcfromtimestamp(trace[0].timestamp),
+                                             data=weight_trace.encode(trace)))
+        db.session.commit()
+        return {
+            'replayed': False,
+            'lane': self.lane,
+            'action': action,
+            'weight': weight,
+            'ticket': ticket.to_dict(include_customer=True),
+            'print_job_id': job.id if job else None
+        }
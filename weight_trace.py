@@ -0,0 +1,109 @@
+import array
+import struct
+import zlib
+
+from export import encode_csv, encode_ndjson, gzip_stream
+
+# Blob layout: header, then a zlib stream of varints. Each sample is the
+# time since the previous one (ms) and the weight change (in RESOLUTION
+# steps, shifted left one bit to carry the overload flag), both zigzag
+# encoded so small negative steps stay one or two bytes.
+TRACE_VERSION = 1
+HEADER = struct.Struct('<BdId')  # version, first timestamp, sample count, resolution (kg)
+# Finer than any weighbridge division, so nothing the indicator showed is lost
+RESOLUTION = 0.1
+
+TRACE_COLUMNS = ('phase', 'lane', 'timestamp', 'seconds', 'weight', 'overload')
+
+
+def downsample(samples, max_hz):
+    """Keep at most max_hz samples per second, always including the last (captured) one."""
+    if not max_hz or len(samples) < 2:
+        return list(samples)
+    # A little slack so indicator jitter does not skip every other sample
+    spacing = 0.9 / max_hz
+    kept = [samples[0]]
+    for sample in samples[1:-1]:
+        if sample.timestamp - kept[-1].timestamp >= spacing:
+            kept.append(sample)
+    kept.append(samples[-1])
+    return kept
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def _write_varint(out, value):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def encode(samples, resolution=RESOLUTION):
+    """Pack scale Samples (timestamp, monotonic, weight, overload) into a blob."""
+    if not samples:
+        raise ValueError("A trace needs at least one sample")
+    start = samples[0].timestamp
+    deltas = array.array('q')
+    last_ms = 0
+    last_weight = 0
+    for sample in samples:
+        ms = round((sample.timestamp - start) * 1000)
+        weight = round(sample.weight / resolution)
+        deltas.append(_zigzag(ms - last_ms))
+        deltas.append((_zigzag(weight - last_weight) << 1) | bool(sample.overload))
+        last_ms, last_weight = ms, weight
+    body = array.array('B')
+    for value in deltas:
+        _write_varint(body, value)
+    return HEADER.pack(TRACE_VERSION, start, len(samples), resolution) + zlib.compress(body.tobytes(), 9)
+
+
+def decode(blob):
+    """(timestamps, weights, overloads) arrays from a blob made by encode()."""
+    version, start, count, resolution = HEADER.unpack_from(blob)
+    if version != TRACE_VERSION:
+        raise ValueError(f"Unsupported trace version {version}")
+    body = zlib.decompress(blob[HEADER.size:])
+    values = array.array('q')
+    value = shift = 0
+    for byte in body:
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            values.append(value)
+            value = shift = 0
+
+    timestamps = array.array('d')
+    weights = array.array('d')
+    overloads = array.array('b')
+    ms = weight = 0
+    for i in range(0, 2 * count, 2):
+        ms += _unzigzag(values[i])
+        weight += _unzigzag(values[i + 1] >> 1)
+        timestamps.append(start + ms / 1000.0)
+        weights.append(round(weight * resolution, 3))
+        overloads.append(values[i + 1] & 1)
+    return timestamps, weights, overloads
+
+
+def iter_rows(traces):
+    # One list of rows per stored trace, in TRACE_COLUMNS order
+    for trace in traces:
+        timestamps, weights, overloads = decode(trace.data)
+        start = timestamps[0] if timestamps else 0.0
+        yield [[trace.phase, trace.lane, timestamp, round(timestamp - start, 3), weight, bool(overload)]
+               for timestamp, weight, overload in zip(timestamps, weights, overloads)]
+
+
+def stream(traces, fmt='ndjson', compress=False):
+    """Encoded blocks (one per trace) for a streamed response, in the ticket export's formats."""
+    encode = encode_csv if fmt == 'csv' else encode_ndjson
+    blocks = encode(iter_rows(traces), TRACE_COLUMNS)
+    return gzip_stream(blocks) if compress else blocks